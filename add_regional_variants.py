@@ -1,88 +1,238 @@
-import json
 import os
+import json
 
+from catalog_files import find_catalogs, loads, write_catalog
+from run_manifest import source_hash
 
-def copy_translations(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-
-    language_variants = {
-        "en": [
-            ("en-AU", "English (Australia)"),
-            ("en-IN", "English (India)"),
-            ("en-GB", "English (United Kingdom)")
-        ],
-        "es": [
-            ("es-419", "Spanish (Latin America)")
-        ],
-        "pt": [
-            ("pt-BR", "Portuguese (Brazil)"),
-            ("pt-PT", "Portuguese (Portugal)")
-        ],
-        "fr": [
-            ("fr-CA", "French (Canada)")
-        ]
+
+# Base language -> regional variants that get a copy of its translations
+LANGUAGE_VARIANTS = {
+    "en": [
+        "en-AU",   # English (Australia)
+        "en-IN",   # English (India)
+        "en-GB",   # English (United Kingdom)
+    ],
+    "es": [
+        "es-419",  # Spanish (Latin America)
+    ],
+    "pt": [
+        "pt-BR",   # Portuguese (Brazil)
+        "pt-PT",   # Portuguese (Portugal)
+    ],
+    "fr": [
+        "fr-CA",   # French (Canada)
+    ],
+}
+
+
+def load_variants(path):
+    """
+    Read a regional variants file: {"base language": ["variant", ...]}.
+
+    Raises:
+        ValueError: The file is not a valid variants file
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            variants = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Variants file {path} is not valid JSON: {e}") from e
+
+    if not isinstance(variants, dict) or not all(
+            isinstance(codes, list) and all(isinstance(code, str) for code in codes) for codes in variants.values()):
+        raise ValueError(f"Variants file {path} must map each base language to a list of variant codes")
+    return variants
+
+
+def localization_values(localization):
+    """The text of a localization (a string, or {plural form: string}), or None when it has none."""
+    if not isinstance(localization, dict):
+        return None
+    if 'stringUnit' in localization:
+        return localization['stringUnit'].get('value') or None
+    if 'variations' in localization:
+        values = {form: variation.get('stringUnit', {}).get('value', '')
+                  for form, variation in localization['variations'].get('plural', {}).items()}
+        return values if any(values.values()) else None
+    return None
+
+
+def copy_localization(base_translation):
+    """A regional variant's copy of a base-language localization."""
+    if 'variations' in base_translation:
+        # Handle plural variations
+        return {
+            "variations": {
+                "plural": {
+                    plural_key: {
+                        "stringUnit": plural_value["stringUnit"].copy()
+                    }
+                    for plural_key, plural_value in base_translation["variations"]["plural"].items()
+                }
+            }
+        }
+    # Handle regular translations
+    return {
+        "stringUnit": base_translation["stringUnit"].copy()
     }
 
-    for key, value in data['strings'].items():
-        localizations = value['localizations']
-
-        for base_lang, variants in language_variants.items():
-            if base_lang in localizations:
-                base_translation = localizations[base_lang]
-
-                for code, name in variants:
-                    if 'variations' in base_translation:
-                        # Handle plural variations
-                        localizations[code] = {
-                            "variations": {
-                                "plural": {
-                                    plural_key: {
-                                        "stringUnit": plural_value["stringUnit"].copy()
-                                    }
-                                    for plural_key, plural_value in base_translation["variations"]["plural"].items()
-                                }
-                            }
-                        }
-                    elif 'stringUnit' in base_translation:
-                        # Handle regular translations
-                        localizations[code] = {
-                            "stringUnit": base_translation["stringUnit"].copy()
-                        }
-
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
-
-
-def process_folder(folder_path):
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.xcstrings'):
-            file_path = os.path.join(folder_path, filename)
-            print(f"Processing file: {file_path}")
-            copy_translations(file_path)
+
+def update_variants(localizations, language_variants=LANGUAGE_VARIANTS, previous=None):
+    """
+    Copy one string's base-language translations to its regional variants.
+
+    A variant is only overwritten when it is missing or a verbatim copy of
+    the base's previous text; anything else was edited by hand and is kept.
+
+    Args:
+        localizations: The string's localizations, updated in place
+        previous: {base language: source_hash()es of its text before this run}
+
+    Returns:
+        (updated, kept) counts of variants copied and of hand-edited variants left alone
+    """
+    updated = kept = 0
+    for base_lang in language_variants:
+        base_translation = localizations.get(base_lang)
+        base_values = localization_values(base_translation)
+        if base_values is None:
+            continue
+
+        old_hashes = (previous or {}).get(base_lang, ())
+        for code in language_variants.get(base_lang, ()):
+            variant_values = localization_values(localizations.get(code))
+            if variant_values == base_values:
+                continue
+            if variant_values is None or source_hash(variant_values) in old_hashes:
+                localizations[code] = copy_localization(base_translation)
+                updated += 1
+            else:
+                kept += 1
+    return updated, kept
+
+
+class VariantPropagation:
+    """
+    The strings whose base-language text changes in a run, so that only they
+    get their regional variants updated, in memory, before catalogs are written.
+
+    For each string it keeps the source_hash() of every base language's text
+    from before the run, so variants that were verbatim copies of it can be
+    told apart from hand-edited ones.
+    """
+
+    def __init__(self, language_variants=LANGUAGE_VARIANTS):
+        self.language_variants = language_variants
+        self.strings = {}
+
+    def mark(self, filename, string_key, previous=None):
+        """Queue a string; previous is {base language: {source_hash()}} of its earlier text."""
+        queued = self.strings.setdefault(filename, {}).setdefault(string_key, {})
+        for lang, hashes in (previous or {}).items():
+            queued.setdefault(lang, set()).update(hashes)
+
+    def before_change(self, filename, string_key, string_data):
+        """Queue a string that is about to get new translations, remembering its current base texts."""
+        if not isinstance(string_data, dict):
+            return
+        localizations = string_data.get('localizations', {})
+        previous = {}
+        for lang in self.language_variants:
+            values = localization_values(localizations.get(lang))
+            if values is not None:
+                previous[lang] = {source_hash(values)}
+        self.mark(filename, string_key, previous)
+
+    def apply(self, catalogs, full=False):
+        """
+        Update the regional variants of the queued strings (every string with full).
+
+        Returns:
+            (updated, kept) counts, see update_variants()
+        """
+        updated = kept = 0
+        for filename, data in catalogs.items():
+            strings = data.get('strings', {})
+            queued = self.strings.get(filename, {})
+            for string_key in (strings if full else queued):
+                string_data = strings.get(string_key)
+                if not isinstance(string_data, dict) or not string_data.get('localizations'):
+                    continue
+                counts = update_variants(string_data['localizations'], self.language_variants,
+                                         previous=queued.get(string_key))
+                updated += counts[0]
+                kept += counts[1]
+        return updated, kept
+
+
+def add_variants(data, language_variants=LANGUAGE_VARIANTS):
+    """
+    Copy base-language translations to missing regional variants in a parsed catalog.
+
+    Returns:
+        (updated, kept) counts, see update_variants()
+    """
+    updated = kept = 0
+    for string_data in data['strings'].values():
+        if not isinstance(string_data, dict) or not string_data.get('localizations'):
+            continue
+        counts = update_variants(string_data['localizations'], language_variants)
+        updated += counts[0]
+        kept += counts[1]
+    return updated, kept
+
+
+def copy_translations(file_path, language_variants=LANGUAGE_VARIANTS):
+    """Add regional variants to one catalog; returns True if the file changed."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        original = file.read()
+    data = loads(original)
+
+    updated, _ = add_variants(data, language_variants)
+    if not updated:
+        return False
+
+    return write_catalog(file_path, data, original) is not None
+
+
+def process_folder(folder_path, language_variants=LANGUAGE_VARIANTS):
+    for filename in find_catalogs(folder_path):
+        file_path = os.path.join(folder_path, filename)
+        print(f"Processing file: {file_path}")
+        if copy_translations(file_path, language_variants):
+            print(f"Saved updated {file_path}")
 
 
 # Main execution
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Add regional variants to .xcstrings files')
     parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
-    
+    parser.add_argument('--variants', help='JSON file mapping base languages to regional variants (default: built-in map)')
+
     args = parser.parse_args()
-    
+
     folder_path = args.folder
-    
+
     print(f"Adding regional variants to files in: {folder_path}")
-    
+
     # Validate folder exists
     if not os.path.exists(folder_path):
         print(f"❌ Error: Folder '{folder_path}' does not exist")
         exit(1)
-    
+
     if not os.path.isdir(folder_path):
         print(f"❌ Error: '{folder_path}' is not a directory")
         exit(1)
-    
-    process_folder(folder_path)
-    print("✅ Regional variants added successfully")
\ No newline at end of file
+
+    language_variants = LANGUAGE_VARIANTS
+    if args.variants:
+        try:
+            language_variants = load_variants(args.variants)
+        except (ValueError, OSError) as e:
+            print(f"❌ Error: {e}")
+            exit(1)
+
+    process_folder(folder_path, language_variants)
+    print("✅ Regional variants added successfully")
@@ -2,10 +2,115 @@ import json
 import os
 import glob
 
+from catalog_files import write_catalog
+from job_journal import DONE, JOURNAL_NAME, SCRIPT_JOB_DIR, JobJournal
+from translation_memory import MEMORY_HITS_FILE
+from validation import validate_entry
+
+
+def build_localization(source_entry, translation):
+    """Build a localization for one language, mirroring the English structure."""
+    if 'variations' in source_entry:
+        # Mirror the English structure with variations
+        return {
+            "variations": {
+                "plural": {
+                    "one": {
+                        "stringUnit": {
+                            "state": "translated",
+                            "value": translation["one"]
+                        }
+                    },
+                    "other": {
+                        "stringUnit": {
+                            "state": "translated",
+                            "value": translation["other"]
+                        }
+                    }
+                }
+            }
+        }
+
+    # Regular translation without variations
+    return {
+        "stringUnit": {
+            "state": "translated",
+            "value": translation
+        }
+    }
+
+
+def expand_duplicates(translations, duplicates):
+    """
+    Fan translated entries out to the duplicates they were deduplicated from.
+
+    Args:
+        translations: {"filename:key": entry} translations
+        duplicates: {"filename:key": ["filename:key", ...]} from the task file
+
+    Returns:
+        Translations including an entry for every duplicate
+    """
+    if not duplicates:
+        return translations
+    expanded = dict(translations)
+    for entry_id, duplicate_ids in duplicates.items():
+        if entry_id in translations:
+            for duplicate_id in duplicate_ids:
+                expanded[duplicate_id] = translations[entry_id]
+    return expanded
+
+
+def apply_translation_entry(xcstrings_data, string_key, translations_data):
+    """
+    Apply one translated entry to a parsed .xcstrings catalog in memory.
+
+    Args:
+        xcstrings_data: Parsed .xcstrings catalog
+        string_key: Key of the string in the catalog
+        translations_data: Either {"en": ..., "missing_translations": {lang: value}}
+            or a flat {lang: value} mapping
+
+    Returns:
+        List of languages that were updated
+    """
+    if string_key not in xcstrings_data['strings']:
+        return []
+
+    string_data = xcstrings_data['strings'][string_key]
+    if 'localizations' not in string_data:
+        string_data['localizations'] = {}
+    localizations = string_data['localizations']
+
+    # Handle both original and new format
+    if 'missing_translations' in translations_data:
+        new_translations = translations_data['missing_translations']
+    else:
+        # Skip English as it's not a translation
+        new_translations = {lang: value for lang, value in translations_data.items() if lang != 'en'}
+
+    for lang, translation in new_translations.items():
+        localizations[lang] = build_localization(localizations.get('en', {}), translation)
+
+    return list(new_translations)
+
 def update_xcstrings_with_translations(xcstrings_folder):
-    # Get all llm_translation_task_*.json files in the current directory
+    # Get all llm_translation_task_*.json files in the current directory,
+    # plus the translations resolved from translation memory (if any)
     translation_files = glob.glob('llm_translation_task_*.json')
 
+    # Only merge batches the job journal lists as translated, so a partially
+    # failed run never writes empty translations
+    if os.path.exists(os.path.join(SCRIPT_JOB_DIR, JOURNAL_NAME)):
+        journal = JobJournal(SCRIPT_JOB_DIR)
+        unfinished = [f for f in translation_files if journal.status(f) != DONE]
+        for translation_file in sorted(unfinished):
+            print(f"Skipping {translation_file} (not translated yet)")
+        translation_files = [f for f in translation_files if f not in unfinished]
+
+    if os.path.exists(MEMORY_HITS_FILE):
+        translation_files.insert(0, MEMORY_HITS_FILE)
+
     # Keep track of modified .xcstrings files
     modified_xcstrings = {}
 
@@ -18,7 +123,7 @@ def update_xcstrings_with_translations(xcstrings_folder):
 
         # Check if the file uses the new format
         if 'translations' in file_content:
-            translations = file_content['translations']
+            translations = expand_duplicates(file_content['translations'], file_content.get('duplicates'))
         else:
             translations = file_content
 
@@ -33,86 +138,22 @@ def update_xcstrings_with_translations(xcstrings_folder):
                 with open(xcstrings_path, 'r', encoding='utf-8') as f:
                     modified_xcstrings[filename] = json.load(f)
 
-            # Update the translations in the .xcstrings data
-            if string_key in modified_xcstrings[filename]['strings']:
-                if 'localizations' not in modified_xcstrings[filename]['strings'][string_key]:
-                    modified_xcstrings[filename]['strings'][string_key]['localizations'] = {}
-
-                # Handle both original and new format
-                if 'missing_translations' in translations_data:
-                    for lang, translation in translations_data['missing_translations'].items():
-                        # Check if source has variations structure
-                        source_entry = modified_xcstrings[filename]['strings'][string_key]['localizations'].get('en', {})
-                        if 'variations' in source_entry:
-                            # Mirror the English structure with variations
-                            modified_xcstrings[filename]['strings'][string_key]['localizations'][lang] = {
-                                "variations": {
-                                    "plural": {
-                                        "one": {
-                                            "stringUnit": {
-                                                "state": "translated",
-                                                "value": translation["one"]
-                                            }
-                                        },
-                                        "other": {
-                                            "stringUnit": {
-                                                "state": "translated",
-                                                "value": translation["other"]
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        else:
-                            # Regular translation without variations
-                            modified_xcstrings[filename]['strings'][string_key]['localizations'][lang] = {
-                                "stringUnit": {
-                                    "state": "translated",
-                                    "value": translation
-                                }
-                            }
-                else:
-                    for lang, translation in translations_data.items():
-                        if lang != 'en':  # Skip English as it's not a translation
-                            # Check if source has variations structure
-                            source_entry = modified_xcstrings[filename]['strings'][string_key]['localizations'].get('en', {})
-                            if 'variations' in source_entry:
-                                # Mirror the English structure with variations
-                                modified_xcstrings[filename]['strings'][string_key]['localizations'][lang] = {
-                                    "variations": {
-                                        "plural": {
-                                            "one": {
-                                                "stringUnit": {
-                                                    "state": "translated",
-                                                    "value": translation["one"]
-                                                }
-                                            },
-                                            "other": {
-                                                "stringUnit": {
-                                                    "state": "translated",
-                                                    "value": translation["other"]
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            else:
-                                # Regular translation without variations
-                                modified_xcstrings[filename]['strings'][string_key]['localizations'][lang] = {
-                                    "stringUnit": {
-                                        "state": "translated",
-                                        "value": translation
-                                    }
-                                }
+            # Never write a translation that would drop plural forms or format specifiers
+            if 'en' in translations_data and 'missing_translations' in translations_data:
+                problems = validate_entry(translations_data, translations_data)
+                if problems:
+                    print(f"⚠️  Skipping '{string_key}' in {filename}: {'; '.join(problems)}")
+                    continue
+
+            apply_translation_entry(modified_xcstrings[filename], string_key, translations_data)
 
             print(f"Updated translations for '{string_key}' in {filename}")
 
-    # Save all modified .xcstrings files
+    # Save the .xcstrings files whose content changed
     for filename, xcstrings_data in modified_xcstrings.items():
         xcstrings_path = os.path.join(xcstrings_folder, filename)
-        with open(xcstrings_path, 'w', encoding='utf-8') as f:
-            json.dump(xcstrings_data, f, ensure_ascii=False, indent=2)
-        print(f"Saved updated {filename}")
+        if write_catalog(xcstrings_path, xcstrings_data) is not None:
+            print(f"Saved updated {filename}")
 
     print("All translations have been updated.")
 
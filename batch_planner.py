@@ -0,0 +1,170 @@
+"""
+Token accounting and batch planning for LLM translation tasks.
+
+Each missing entry is costed in input tokens (what we send) and expected
+output tokens (what the model writes back, per missing language), then the
+entries are packed into batches with a first-fit-decreasing bin-packer
+against separate input and output limits.
+"""
+
+import json
+import unicodedata
+
+DEFAULT_MAX_INPUT_TOKENS = 60000
+DEFAULT_MAX_OUTPUT_TOKENS = 32000
+
+# How much longer a translation tends to be than its English source, in
+# tokens. Non-Latin scripts tokenize into noticeably more tokens.
+LANGUAGE_OUTPUT_FACTORS = {
+    "ar": 2.0,
+    "hi": 2.5,
+    "ja": 1.8,
+    "ko": 1.8,
+    "ru": 1.8,
+    "zh-Hans": 1.5,
+    "zh-Hant": 1.5,
+}
+DEFAULT_OUTPUT_FACTOR = 1.4
+
+
+def heuristic_token_count(text):
+    """
+    Offline token estimate that accounts for non-ASCII text.
+
+    ASCII averages about four characters per token; CJK characters are
+    usually one token each and other non-ASCII letters about two characters
+    per token.
+    """
+    ascii_chars = 0
+    wide_chars = 0
+    other_chars = 0
+    for char in text:
+        if ord(char) < 128:
+            ascii_chars += 1
+        elif unicodedata.east_asian_width(char) in ('W', 'F'):
+            wide_chars += 1
+        else:
+            other_chars += 1
+    return ascii_chars // 4 + wide_chars + other_chars // 2 + 1
+
+
+def get_tokenizer(name='heuristic'):
+    """
+    Return a callable counting tokens in a string.
+
+    Args:
+        name: 'heuristic' (offline, default), 'tiktoken' (uses the optional
+            tiktoken package when installed) or any callable taking a string
+
+    Returns:
+        Callable text -> token count
+    """
+    if callable(name):
+        return name
+    if name == 'tiktoken':
+        try:
+            import tiktoken
+        except ImportError:
+            print("⚠️  tiktoken is not installed, falling back to the heuristic tokenizer")
+            return heuristic_token_count
+        encoding = tiktoken.get_encoding('cl100k_base')
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    if name == 'heuristic':
+        return heuristic_token_count
+    raise ValueError(f"Unknown tokenizer: {name}")
+
+
+def source_texts(en_value):
+    """The English strings of an entry (one for simple strings, one per plural form)."""
+    if isinstance(en_value, dict):
+        return list(en_value.values())
+    return [en_value]
+
+
+def entry_cost(entry_id, entry, count_tokens=heuristic_token_count):
+    """
+    Estimate the input and output tokens of one task entry.
+
+    Matches the compact wire format of translate_with_llm.py: entries are
+    sent as short ids with their English value, and the model answers with
+    {id: {lang: translation}}.
+
+    Args:
+        entry_id: The "filename:key" id of the entry (never sent to the model)
+        entry: Task entry with "en" and "missing_translations"
+        count_tokens: Tokenizer callable
+
+    Returns:
+        Tuple of (input_tokens, output_tokens)
+    """
+    # Short id, quotes and separators around the English value
+    input_tokens = count_tokens(json.dumps(entry["en"], ensure_ascii=False, separators=(',', ':'))) + 3
+
+    # The answer repeats the id, then each missing language with a
+    # translation of every plural form
+    source_tokens = sum(count_tokens(text) for text in source_texts(entry["en"]))
+    forms = len(source_texts(entry["en"]))
+    output_tokens = 3
+    for lang in entry["missing_translations"]:
+        factor = LANGUAGE_OUTPUT_FACTORS.get(lang, DEFAULT_OUTPUT_FACTOR)
+        # Plus the language code and a couple of tokens of JSON punctuation per form
+        output_tokens += int(source_tokens * factor) + 2 * forms + 2
+
+    return input_tokens, output_tokens
+
+
+def pack_batches(items, max_input_tokens, max_output_tokens, base_input_tokens=0, max_items=None):
+    """
+    Pack costed items into batches with first-fit-decreasing.
+
+    Args:
+        items: List of (item, input_tokens, output_tokens)
+        max_input_tokens: Input token limit per batch (including base_input_tokens)
+        max_output_tokens: Output token limit per batch
+        base_input_tokens: Fixed per-batch input cost (instructions, prompt text)
+        max_items: Item limit per batch (none by default)
+
+    Returns:
+        List of batches, each a dict with "items", "input_tokens" and "output_tokens".
+        Items that exceed a limit on their own get a batch to themselves.
+    """
+    input_room = max(max_input_tokens - base_input_tokens, 1)
+    output_room = max(max_output_tokens, 1)
+
+    # Largest first, measured against whichever limit the item uses most of
+    ordered = sorted(
+        items,
+        key=lambda item: max(item[1] / input_room, item[2] / output_room),
+        reverse=True
+    )
+
+    if not ordered:
+        return []
+
+    # A batch that can't fit even the smallest item is full for good and
+    # no longer needs to be scanned.
+    min_input = min(item[1] for item in ordered)
+    min_output = min(item[2] for item in ordered)
+
+    batches = []
+    open_batches = []
+    for item, input_tokens, output_tokens in ordered:
+        for batch in open_batches:
+            if (batch["input_tokens"] + input_tokens <= max_input_tokens and
+                    batch["output_tokens"] + output_tokens <= max_output_tokens):
+                break
+        else:
+            batch = {"items": [], "input_tokens": base_input_tokens, "output_tokens": 0}
+            batches.append(batch)
+            open_batches.append(batch)
+
+        batch["items"].append(item)
+        batch["input_tokens"] += input_tokens
+        batch["output_tokens"] += output_tokens
+
+        if (batch["input_tokens"] + min_input > max_input_tokens or
+                batch["output_tokens"] + min_output > max_output_tokens or
+                (max_items is not None and len(batch["items"]) >= max_items)):
+            open_batches.remove(batch)
+
+    return batches
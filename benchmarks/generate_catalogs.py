@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Synthetic .xcstrings catalog generator for benchmarks.
+
+Generates catalogs of any size with a configurable number of languages,
+share of plural strings and share of missing translations. Output is
+deterministic for a given seed, so runs on different commits compare the
+same work.
+"""
+
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_files import dumps
+
+# The action's 16 languages first, then other common App Store languages
+LANGUAGE_POOL = [
+    "ar", "de", "es", "fr", "ja", "nl", "pt", "zh-Hans", "zh-Hant", "it", "ko", "sv", "hi", "pl", "tr", "ru",
+    "ca", "cs", "da", "el", "fi", "he", "hr", "hu", "id", "ms", "nb", "ro", "sk", "th", "uk", "vi",
+    "bg", "et", "fa", "lt", "lv", "sl", "sr", "ta",
+]
+
+WORDS = [
+    "task", "list", "reminder", "today", "upcoming", "settings", "sync", "account", "project", "due",
+    "date", "priority", "complete", "delete", "share", "widget", "notification", "premium", "restore",
+    "purchase", "calendar", "repeat", "weekly", "daily", "monthly", "archive", "search", "filter", "tag",
+]
+
+
+def languages_for(count):
+    if count > len(LANGUAGE_POOL):
+        raise ValueError(f"At most {len(LANGUAGE_POOL)} languages are available")
+    return LANGUAGE_POOL[:count]
+
+
+def string_unit(value):
+    return {"stringUnit": {"state": "translated", "value": value}}
+
+
+def make_entry(rng, index, languages, plural_ratio, missing_ratio):
+    """One string entry: English source plus the languages that aren't missing."""
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))).capitalize()
+    is_plural = rng.random() < plural_ratio
+
+    def localization(prefix):
+        if is_plural:
+            return {"variations": {"plural": {
+                "one": string_unit(f"{prefix}%lld {text} {index}"),
+                "other": string_unit(f"{prefix}%lld {text}s {index}"),
+            }}}
+        return string_unit(f"{prefix}{text} {index}")
+
+    localizations = {"en": localization("")}
+    for lang in languages:
+        if rng.random() >= missing_ratio:
+            localizations[lang] = localization(f"[{lang}] ")
+    return f"{text} {index}", {"extractionState": "manual", "localizations": localizations}
+
+
+def generate_catalogs(folder, keys, languages, catalogs=4, plural_ratio=0.1, missing_ratio=0.05, seed=0):
+    """
+    Write synthetic catalogs to folder.
+
+    Args:
+        folder: Output folder (created if needed)
+        keys: Total number of string keys, spread across the catalogs
+        languages: Target language codes
+        catalogs: Number of catalog files; every other one goes in a subfolder
+        plural_ratio: Share of strings with plural variations
+        missing_ratio: Chance that any one language of a string is missing
+        seed: Random seed
+
+    Returns:
+        List of catalog paths relative to folder
+    """
+    rng = random.Random(seed)
+    written = []
+    for number in range(catalogs):
+        name = f"Catalog{number}.xcstrings"
+        relative_path = name if number % 2 == 0 else f"Module{number}/{name}"
+        count = keys // catalogs + (1 if number < keys % catalogs else 0)
+
+        strings = {}
+        for i in range(count):
+            key, entry = make_entry(rng, number * keys + i, languages, plural_ratio, missing_ratio)
+            strings[key] = entry
+
+        path = os.path.join(folder, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(dumps({"sourceLanguage": "en", "strings": strings, "version": "1.0"}))
+        written.append(relative_path)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic .xcstrings catalogs')
+    parser.add_argument('--folder', required=True, help='Output folder')
+    parser.add_argument('--keys', type=int, default=10000, help='Total number of string keys (default: 10000)')
+    parser.add_argument('--languages', type=int, default=16, help=f'Number of target languages, up to {len(LANGUAGE_POOL)} (default: 16)')
+    parser.add_argument('--catalogs', type=int, default=4, help='Number of catalog files (default: 4)')
+    parser.add_argument('--plural-ratio', type=float, default=0.1, help='Share of plural strings (default: 0.1)')
+    parser.add_argument('--missing-ratio', type=float, default=0.05, help='Chance a translation is missing (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    args = parser.parse_args()
+
+    paths = generate_catalogs(args.folder, args.keys, languages_for(args.languages), args.catalogs,
+                              args.plural_ratio, args.missing_ratio, args.seed)
+    print(f"✅ Generated {len(paths)} catalog(s) with {args.keys} keys in {args.folder}")
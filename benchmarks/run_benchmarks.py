@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the localization pipeline on synthetic catalogs.
+
+For every catalog size and language count, generates catalogs and times each
+stage separately: check_translations, create_llm_schemas,
+update_xcstrings_with_translations and copy_translations. Peak memory of each
+stage is measured with tracemalloc in a separate run, so tracing doesn't skew
+the timings. Results are written as JSON and can be compared against the
+results of another commit.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import importlib
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import catalog_files
+from add_regional_variants import copy_translations
+from apply_translations import update_xcstrings_with_translations
+from generate_catalogs import generate_catalogs, languages_for
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+STAGES = ['check_translations', 'create_llm_schemas', 'update_xcstrings_with_translations', 'copy_translations']
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fake_translations(schema):
+    """Fill a task's missing translations the way the model would."""
+    translations = {}
+    for entry_id, entry in schema['translations'].items():
+        if isinstance(entry['en'], dict):
+            filled = {lang: {form: f"[{lang}] {value}" for form, value in entry['en'].items()}
+                      for lang in entry['missing_translations']}
+        else:
+            filled = {lang: f"[{lang}] {entry['en']}" for lang in entry['missing_translations']}
+        translations[entry_id] = {"en": entry['en'], "missing_translations": filled}
+    return dict(schema, translations=translations)
+
+
+def measure(func, setup, repeat, memory):
+    """
+    Time func (after running setup each time) and optionally trace its peak memory.
+
+    Returns:
+        Tuple of (list of run times in seconds, peak traced bytes or None)
+    """
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+
+def benchmark_size(keys, language_count, args):
+    """Run every stage on one generated catalog set; returns a list of result records."""
+    languages = languages_for(language_count)
+    results = []
+    state = {}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pristine = os.path.join(tmpdir, 'pristine')
+        folder = os.path.join(tmpdir, 'catalogs')
+        workdir = os.path.join(tmpdir, 'work')
+        os.makedirs(workdir)
+
+        print(f"🏗️  Generating {keys} keys x {language_count} languages...")
+        paths = generate_catalogs(pristine, keys, languages, args.catalogs, args.plural_ratio,
+                                  args.missing_ratio, args.seed)
+
+        def restore():
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            shutil.copytree(pristine, folder)
+
+        def check():
+            state['missing'] = enforce.check_translations(folder, languages, workers=args.workers)
+
+        def schemas():
+            state['schemas'] = enforce.create_llm_schemas(state['missing'], languages)
+
+        def write_tasks():
+            # update_xcstrings_with_translations() reads the task files from the working directory
+            restore()
+            for i, schema in enumerate(state['schemas'], 1):
+                with open(os.path.join(workdir, f'llm_translation_task_{i}.json'), 'w', encoding='utf-8') as f:
+                    json.dump(fake_translations(schema), f, ensure_ascii=False)
+
+        def apply():
+            with contextlib.redirect_stdout(devnull):
+                update_xcstrings_with_translations(folder)
+
+        def variants():
+            for path in paths:
+                copy_translations(os.path.join(folder, path))
+
+        stages = [
+            ('check_translations', check, restore),
+            ('create_llm_schemas', schemas, lambda: None),
+            ('update_xcstrings_with_translations', apply, write_tasks),
+            ('copy_translations', variants, restore),
+        ]
+
+        original_dir = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with open(os.devnull, 'w') as devnull:
+                for stage, func, setup in stages:
+                    if args.stages and stage not in args.stages:
+                        # Later stages depend on the output of earlier ones
+                        if stage in ('check_translations', 'create_llm_schemas'):
+                            setup()
+                            func()
+                        continue
+                    times, peak = measure(func, setup, args.repeat, args.memory)
+                    record = {
+                        "stage": stage,
+                        "keys": keys,
+                        "languages": language_count,
+                        "catalogs": args.catalogs,
+                        "plural_ratio": args.plural_ratio,
+                        "missing_ratio": args.missing_ratio,
+                        "seconds": min(times),
+                        "median_seconds": statistics.median(times),
+                        "runs": times,
+                        "peak_bytes": peak,
+                    }
+                    results.append(record)
+                    memory = f", peak {peak / 1024 / 1024:.1f} MB" if peak is not None else ""
+                    print(f"  ⏱️  {stage}: {min(times):.3f}s{memory}")
+        finally:
+            os.chdir(original_dir)
+
+    return results
+
+
+def compare(results, baseline_path, max_regression):
+    """Print the change against a baseline results file; returns the regressed stages."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def result_key(record):
+        return record['stage'], record['keys'], record['languages'], record['plural_ratio'], record['missing_ratio']
+
+    previous = {result_key(record): record for record in baseline['results']}
+    regressions = []
+    print(f"\n📊 Compared with {baseline['meta'].get('commit') or baseline_path}:")
+    for record in results:
+        old = previous.get(result_key(record))
+        if old is None:
+            continue
+        change = record['seconds'] / old['seconds'] - 1 if old['seconds'] else 0.0
+        marker = ''
+        if max_regression is not None and change > max_regression:
+            marker = ' ⚠️'
+            regressions.append(record)
+        print(f"  {record['stage']} ({record['keys']} keys, {record['languages']} languages): "
+              f"{old['seconds']:.3f}s -> {record['seconds']:.3f}s ({change:+.1%}){marker}")
+    return regressions
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the localization pipeline on synthetic catalogs')
+    parser.add_argument('--sizes', type=parse_list, default=[1000, 10000, 50000], help='Comma-separated key counts (default: 1000,10000,50000)')
+    parser.add_argument('--languages', type=parse_list, default=[16], help='Comma-separated language counts (default: 16)')
+    parser.add_argument('--catalogs', type=int, default=4, help='Number of catalog files per size (default: 4)')
+    parser.add_argument('--plural-ratio', type=float, default=0.1, help='Share of plural strings (default: 0.1)')
+    parser.add_argument('--missing-ratio', type=float, default=0.05, help='Chance a translation is missing (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage; the fastest is reported (default: 3)')
+    parser.add_argument('--workers', type=int, default=1, help='Processes for check_translations (default: 1)')
+    parser.add_argument('--stages', type=lambda value: value.split(','), help=f'Comma-separated stages to time (default: all of {",".join(STAGES)})')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the peak memory runs')
+    parser.add_argument('--output', default='benchmark-results.json', help='Results file (default: benchmark-results.json)')
+    parser.add_argument('--compare', help='Results file of another commit to compare against')
+    parser.add_argument('--max-regression', type=float, help='With --compare, exit with an error if a stage got slower by more than this fraction (e.g. 0.2)')
+
+    args = parser.parse_args()
+
+    for stage in args.stages or []:
+        if stage not in STAGES:
+            print(f"❌ Error: Unknown stage '{stage}'")
+            sys.exit(1)
+
+    results = []
+    for keys in args.sizes:
+        for language_count in args.languages:
+            results.extend(benchmark_size(keys, language_count, args))
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "json_backend": 'orjson' if catalog_files.orjson is not None else 'json',
+            "repeat": args.repeat,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"💾 Saved results to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
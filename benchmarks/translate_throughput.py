@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Throughput of the translate stage against the local fake backend.
+
+Plans batches for synthetic missing strings, then translates them with
+translate_batches() at each concurrency level against a FakeBackend with the
+given latency and failure injection. Reports wall time, batches and strings
+per second, requests sent and injected failures, and writes them as JSON. No
+network access or API key is needed.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translate_with_llm
+from generate_catalogs import languages_for
+from rate_limiter import RateLimiter
+from translation_backends import create_backend
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+
+def synthetic_missing(keys, languages, catalogs=4):
+    """Missing-translation structure, as check_translations() returns it, for synthetic strings."""
+    missing = {}
+    for i in range(keys):
+        filename = f"Catalog{i % catalogs}.xcstrings"
+        en = {"one": f"%lld item {i}", "other": f"%lld items {i}"} if i % 10 == 0 else f"Synthetic string number {i}"
+        missing.setdefault(filename, {})[f"key{i}"] = {"en": en, "missing_langs": list(languages)}
+    return missing
+
+
+def run(backend_spec, schemas, concurrency, stream, retry_delays, rpm=None, tpm=None):
+    backend = create_backend(backend_spec)
+    batches = [(f"batch_{i:04d}", schema) for i, schema in enumerate(schemas, 1)]
+    stats = {"strings": 0}
+
+    def on_result(name, task_data, translated_data):
+        stats["strings"] += len(translated_data)
+
+    # Measure the pipeline, not the backoff sleeps (server retry hints are still honored)
+    translate_with_llm.RETRY_DELAY = 2 if retry_delays else 0
+    limiter = RateLimiter(rpm, tpm)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        failures = translate_with_llm.translate_batches(backend, batches, concurrency, on_result, stream=stream,
+                                                        limiter=limiter)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "stream": stream,
+        "seconds": elapsed,
+        "batches": len(batches),
+        "failed_batches": len(failures),
+        "strings": stats["strings"],
+        "batches_per_second": len(batches) / elapsed if elapsed else None,
+        "strings_per_second": stats["strings"] / elapsed if elapsed else None,
+        "rate_limit_wait_seconds": limiter.waited,
+        "backend": dict(backend.counts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure translate-stage throughput against the fake backend')
+    parser.add_argument('--keys', type=int, default=2000, help='Number of missing strings (default: 2000)')
+    parser.add_argument('--languages', type=int, default=16, help='Number of missing languages per string (default: 16)')
+    parser.add_argument('--max-tokens', type=int, default=8000, help='Maximum input tokens per batch (default: 8000)')
+    parser.add_argument('--max-output-tokens', type=int, default=8000, help='Maximum expected output tokens per batch (default: 8000)')
+    parser.add_argument('--concurrency', type=lambda value: [int(item) for item in value.split(',')], default=[1, 2, 4, 8, 16],
+                        help='Comma-separated concurrency levels (default: 1,2,4,8,16)')
+    parser.add_argument('--backend', default='fake:latency=0.2,latency_dist=lognormal,latency_spread=0.5',
+                        help='Fake backend spec (default: fake:latency=0.2,latency_dist=lognormal,latency_spread=0.5)')
+    parser.add_argument('--stream', action='store_true', help='Stream responses')
+    parser.add_argument('--rpm', type=int, help='Client-side requests-per-minute budget (default: unlimited)')
+    parser.add_argument('--tpm', type=int, help='Client-side input tokens-per-minute budget (default: unlimited)')
+    parser.add_argument('--retry-delays', action='store_true', help='Keep the retry backoff sleeps (skipped by default)')
+    parser.add_argument('--output', default='throughput-results.json', help='Results file (default: throughput-results.json)')
+
+    args = parser.parse_args()
+
+    if not args.backend.startswith('fake'):
+        print("❌ Error: Throughput is only measured against the fake backend")
+        sys.exit(1)
+
+    languages = languages_for(args.languages)
+    schemas = enforce.create_llm_schemas(synthetic_missing(args.keys, languages), languages,
+                                         max_tokens=args.max_tokens, max_output_tokens=args.max_output_tokens)
+    print(f"📦 {len(schemas)} batch(es) of {args.keys} strings x {args.languages} languages, backend {args.backend}")
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run(args.backend, schemas, concurrency, args.stream, args.retry_delays, args.rpm, args.tpm)
+        results.append(result)
+        print(f"  ⚡ concurrency {concurrency}: {result['seconds']:.2f}s, "
+              f"{result['batches_per_second']:.2f} batches/s, {result['strings_per_second']:.0f} strings/s, "
+              f"{result['backend']['requests']} requests ({result['backend']['rate_limited']} rate limited), {result['failed_batches']} failed batch(es)")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"backend": args.backend, "keys": args.keys, "languages": args.languages, "results": results}, f, indent=2)
+    print(f"💾 Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Discovery and parsing of .xcstrings catalogs.
+
+Catalogs are found recursively under the source folder and named by their
+path relative to it ("Tasks/Localizable.xcstrings"), so nested layouts are
+handled in one run. Include/exclude patterns are shell-style globs: a pattern
+without '/' matches a file or directory name anywhere in the tree, a pattern
+with '/' matches the whole relative path.
+
+Parsing uses orjson when it is installed and falls back to the standard
+library, and parallel_map() spreads per-file work across a process pool.
+
+write_catalog() writes catalogs the way Xcode does ("key" : value, keys in
+Xcode's order, empty objects spread over two lines), only when their content
+changed and atomically, so diffs contain only the lines that were translated.
+"""
+
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_INCLUDE = ['*.xcstrings']
+# Hidden directories (.git, .build, the localization cache) and Xcode build output
+DEFAULT_EXCLUDE = ['.*', 'DerivedData']
+
+# An empty object or array at the end of a line (strings can't span lines)
+EMPTY_CONTAINER = re.compile(r'(\{\}|\[\])(,?)$', re.MULTILINE)
+# orjson writes "key": value. Outside keys, '": ' can only appear after an
+# escaped quote inside a string; only then are keys matched precisely, by
+# being the first token on their line.
+ORJSON_KEY = re.compile(r'^( *"(?:[^"\\]|\\.)*"): ', re.MULTILINE)
+
+
+def matches(relative_path, patterns):
+    """Whether a '/'-separated relative path matches any of the glob patterns."""
+    name = relative_path.rsplit('/', 1)[-1]
+    for pattern in patterns:
+        if fnmatch(relative_path if '/' in pattern else name, pattern):
+            return True
+    return False
+
+
+def find_catalogs(folder_path, include=None, exclude=None):
+    """
+    Find catalogs under folder_path, recursively.
+
+    Args:
+        folder_path: Root folder to search
+        include: Glob patterns a file must match (default: *.xcstrings)
+        exclude: Glob patterns for files and directories to skip; excluded
+            directories are not descended into
+
+    Returns:
+        Sorted list of catalog paths relative to folder_path, using '/'
+    """
+    include = include or DEFAULT_INCLUDE
+    exclude = DEFAULT_EXCLUDE if exclude is None else exclude
+    catalogs = []
+
+    for root, dirs, files in os.walk(folder_path):
+        relative_root = os.path.relpath(root, folder_path).replace(os.sep, '/')
+        prefix = '' if relative_root == '.' else relative_root + '/'
+
+        dirs[:] = [d for d in dirs if not matches(prefix + d, exclude)]
+        for filename in files:
+            relative_path = prefix + filename
+            if matches(relative_path, include) and not matches(relative_path, exclude):
+                catalogs.append(relative_path)
+
+    return sorted(catalogs)
+
+
+def loads(content):
+    """Parse JSON text with orjson when available, otherwise the json module."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def read_catalog(path):
+    """Read and parse one catalog file."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return loads(content)
+
+
+def parallel_map(func, items, workers=None):
+    """
+    Apply func to every item across a process pool, preserving order.
+
+    func must be a module-level function. Falls back to a plain loop for a
+    single worker or a single item, where a pool would only add overhead.
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
+
+
+def xcode_sort_key(key):
+    """Xcode orders keys case-insensitively, lowercase first on ties."""
+    return key.casefold(), key.swapcase()
+
+
+def xcode_ordered(value):
+    """Copy of a parsed catalog with every object's keys in Xcode's order."""
+    if isinstance(value, dict):
+        keys = sorted(value, key=xcode_sort_key) if len(value) > 1 else value
+        return {key: xcode_ordered(value[key]) for key in keys}
+    if isinstance(value, list):
+        return [xcode_ordered(item) for item in value]
+    return value
+
+
+def _expand_empty(match):
+    container, comma = match.groups()
+    text = match.string
+    indent = line_start = text.rfind('\n', 0, match.start()) + 1
+    while text[indent] == ' ':
+        indent += 1
+    return f"{container[0]}\n\n{' ' * (indent - line_start)}{container[1]}{comma}"
+
+
+def dumps(data):
+    """Serialize a catalog exactly as Xcode writes .xcstrings files."""
+    if orjson is not None:
+        content = orjson.dumps(xcode_ordered(data), option=orjson.OPT_INDENT_2).decode('utf-8')
+        if '\\": ' in content:
+            content = ORJSON_KEY.sub(r'\1 : ', content)
+        else:
+            content = content.replace('": ', '" : ')
+    else:
+        content = json.dumps(xcode_ordered(data), ensure_ascii=False, indent=2, separators=(',', ' : '))
+    return EMPTY_CONTAINER.sub(_expand_empty, content)
+
+
+def write_catalog(path, data, original=None):
+    """
+    Write a catalog in Xcode's format if its content changed.
+
+    A file whose data is unchanged is left alone even if its formatting
+    differs, so untouched catalogs never show up in a diff. Writes go to a
+    temporary file that is renamed over the catalog, so an interrupted run
+    never leaves a truncated catalog behind.
+
+    Args:
+        path: Catalog path
+        data: Parsed catalog to write
+        original: Current file text, if already read
+
+    Returns:
+        The written text, or None when the file was left unchanged
+    """
+    if original is None and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            original = f.read()
+
+    content = dumps(data)
+    if original is not None and (content == original or loads(original) == data):
+        return None
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return content
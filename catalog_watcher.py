@@ -0,0 +1,130 @@
+"""
+Watching a folder of catalogs for edits, for the localize.py watch mode.
+
+Catalogs are kept parsed in memory between edits. The folder is polled
+(size and mtime of every catalog, like the run manifest, so no extra
+dependency is needed), and a burst of saves is debounced into one change
+set once the files have been quiet for a moment.
+"""
+
+import os
+import time
+
+from catalog_files import find_catalogs, loads, write_catalog
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 1.0
+
+
+def file_stat(path):
+    """(size, mtime_ns) of a file, or None if it's gone."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class CatalogWatcher:
+    """The parsed catalogs of a folder, reloaded as they change on disk."""
+
+    def __init__(self, folder_path, include=None, exclude=None, interval=DEFAULT_INTERVAL, debounce=DEFAULT_DEBOUNCE):
+        self.folder_path = folder_path
+        self.include = include
+        self.exclude = exclude
+        self.interval = interval
+        self.debounce = debounce
+        self.catalogs = {}
+        self.originals = {}
+        self.stats = {}
+
+        for filename in find_catalogs(folder_path, include, exclude):
+            try:
+                self.reload(filename)
+            except (ValueError, OSError) as e:
+                print(f"⚠️  Could not read {filename}, retrying when it changes: {e}")
+
+    def path(self, filename):
+        return os.path.join(self.folder_path, filename)
+
+    def modified(self, filename):
+        """Whether a catalog changed on disk since it was last read or written."""
+        return file_stat(self.path(filename)) != self.stats.get(filename)
+
+    def changes(self):
+        """Catalogs that are new or changed on disk; catalogs that were deleted are forgotten."""
+        filenames = find_catalogs(self.folder_path, self.include, self.exclude)
+        for filename in set(self.stats) - set(filenames):
+            self.catalogs.pop(filename, None)
+            self.originals.pop(filename, None)
+            del self.stats[filename]
+        return [filename for filename in filenames if self.modified(filename)]
+
+    def wait_for_changes(self, sleep=time.sleep):
+        """
+        Block until catalogs change, then until they stay unchanged for the debounce time.
+
+        Returns:
+            The changed catalogs
+        """
+        changed = []
+        while not changed:
+            sleep(self.interval)
+            changed = self.changes()
+
+        # Xcode may save several times in a row; wait until it settles
+        snapshot = {filename: file_stat(self.path(filename)) for filename in changed}
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < self.debounce:
+            sleep(min(self.interval, self.debounce))
+            for filename in self.changes():
+                current = file_stat(self.path(filename))
+                if snapshot.get(filename) != current:
+                    snapshot[filename] = current
+                    quiet_since = time.monotonic()
+        return sorted(filename for filename in snapshot if file_stat(self.path(filename)) is not None)
+
+    def reload(self, filename):
+        """
+        Parse a catalog again.
+
+        A catalog that can't be read (saved half-written, invalid JSON, or
+        deleted meanwhile) keeps its last parse and is only tried again once
+        it changes on disk.
+
+        Returns:
+            The previously parsed catalog (None for a new one)
+
+        Raises:
+            ValueError, OSError: The catalog could not be read or parsed
+        """
+        path = self.path(filename)
+        stat = file_stat(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            data = loads(content)
+        except (ValueError, OSError):
+            self.stats[filename] = stat
+            raise
+        previous = self.catalogs.get(filename)
+        self.catalogs[filename] = data
+        self.originals[filename] = content
+        self.stats[filename] = stat
+        return previous
+
+    def write(self, filename):
+        """
+        Write a catalog back in place, unless it was saved again in the meantime.
+
+        Returns:
+            False if the file changed on disk since it was read (nothing is written)
+        """
+        if self.modified(filename):
+            return False
+        path = self.path(filename)
+        content = write_catalog(path, self.catalogs[filename], self.originals[filename])
+        if content is not None:
+            self.originals[filename] = content
+            self.stats[filename] = file_stat(path)
+        return True
@@ -0,0 +1,189 @@
+"""
+Compact translation coverage index.
+
+Each catalog is indexed as its list of keys plus a bytearray with one state
+code per (key, language) cell, row-major by key, instead of nested dicts.
+Per-language counts are a single bytes.count() over a strided slice, so a
+coverage report over hundreds of thousands of strings takes milliseconds.
+
+The index is cached in the cache directory next to the run manifest and
+refreshed incrementally: only catalogs whose size or mtime changed are
+parsed again (across a process pool).
+"""
+
+import base64
+import json
+import os
+
+from catalog_files import find_catalogs, loads, parallel_map, read_catalog
+
+INDEX_NAME = 'coverage.json'
+INDEX_VERSION = 1
+
+# Cell state codes
+TRANSLATED = 0
+MISSING = 1
+NEEDS_REVIEW = 2
+STATE_NAMES = {TRANSLATED: 'translated', MISSING: 'missing', NEEDS_REVIEW: 'needs_review'}
+
+
+def unit_state(unit):
+    """State of a stringUnit: missing when it has no value, needs review when flagged."""
+    if not isinstance(unit, dict) or not unit.get('value'):
+        return MISSING
+    if unit.get('state') == 'needs_review':
+        return NEEDS_REVIEW
+    return TRANSLATED
+
+
+def localization_state(localization):
+    """State of one language's localization of a string (see is_translation_missing())."""
+    if not localization:
+        return MISSING
+    if isinstance(localization, dict):
+        if 'stringUnit' in localization:
+            return unit_state(localization['stringUnit'])
+        if 'variations' in localization:
+            states = [unit_state(variation.get('stringUnit')) if isinstance(variation, dict) else MISSING
+                      for variation in localization['variations'].get('plural', {}).values()]
+            # A plural string counts as translated as soon as any form is
+            if TRANSLATED in states:
+                return TRANSLATED
+            return NEEDS_REVIEW if NEEDS_REVIEW in states else MISSING
+    return TRANSLATED
+
+
+def index_catalog(data, languages):
+    """
+    Index a parsed catalog.
+
+    Returns:
+        (keys, cells) where cells[i * len(languages) + j] is the state of
+        keys[i] in languages[j]
+    """
+    strings = data.get('strings', {})
+    keys = list(strings)
+    step = len(languages)
+    columns = {lang: offset for offset, lang in enumerate(languages)}
+    # Every cell starts out missing; only languages a string actually has are looked at
+    cells = bytearray([MISSING]) * (len(keys) * step)
+    for row, string_key in enumerate(keys):
+        string_data = strings[string_key]
+        localizations = string_data.get('localizations') if isinstance(string_data, dict) else None
+        if not localizations:
+            continue
+        base = row * step
+        for lang, localization in localizations.items():
+            offset = columns.get(lang)
+            if offset is not None:
+                cells[base + offset] = localization_state(localization)
+    return keys, cells
+
+
+def index_file(task):
+    """Parse and index one catalog; runs in a worker process."""
+    path, languages = task
+    stat = os.stat(path)
+    keys, cells = index_catalog(read_catalog(path), languages)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "keys": keys, "cells": cells}
+
+
+class CoverageIndex:
+    """Coverage state of every (catalog, key, language) cell."""
+
+    def __init__(self, languages, cache_dir=None):
+        self.languages = list(languages)
+        self.path = os.path.join(cache_dir, INDEX_NAME) if cache_dir else None
+        self.files = {}
+
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = loads(f.read())
+            # Cells are laid out per language, so a different language list invalidates them
+            if data.get('version') == INDEX_VERSION and data.get('languages') == self.languages:
+                for filename, entry in data.get('files', {}).items():
+                    entry['cells'] = bytearray(base64.b64decode(entry['cells']))
+                    self.files[filename] = entry
+
+    def refresh(self, folder_path, include=None, exclude=None, workers=None):
+        """
+        Bring the index up to date with the catalogs on disk.
+
+        Returns:
+            Number of catalogs that had to be parsed
+        """
+        filenames = find_catalogs(folder_path, include, exclude)
+        stale = []
+        for filename in filenames:
+            entry = self.files.get(filename)
+            stat = os.stat(os.path.join(folder_path, filename))
+            if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                stale.append(filename)
+
+        tasks = [(os.path.join(folder_path, filename), self.languages) for filename in stale]
+        for filename, entry in zip(stale, parallel_map(index_file, tasks, workers)):
+            self.files[filename] = entry
+
+        for filename in set(self.files) - set(filenames):
+            del self.files[filename]
+        return len(stale)
+
+    def record(self, filename, path, data):
+        """Index a catalog that is already parsed (e.g. right after writing it)."""
+        stat = os.stat(path)
+        keys, cells = index_catalog(data, self.languages)
+        self.files[filename] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "keys": keys, "cells": cells}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        files = {
+            filename: dict(entry, cells=base64.b64encode(entry['cells']).decode('ascii'))
+            for filename, entry in self.files.items()
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "languages": self.languages, "files": files},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def counts(self, filename):
+        """{language: {state name: cell count}} for one catalog."""
+        cells = self.files[filename]['cells']
+        step = len(self.languages)
+        counts = {}
+        for offset, lang in enumerate(self.languages):
+            column = bytes(cells[offset::step])
+            counts[lang] = {name: column.count(code) for code, name in STATE_NAMES.items()}
+        return counts
+
+    def report(self):
+        """Coverage percentages per language, per catalog and overall."""
+        languages = {lang: {name: 0 for name in STATE_NAMES.values()} for lang in self.languages}
+        files = {}
+        for filename in sorted(self.files):
+            file_counts = self.counts(filename)
+            for lang, counts in file_counts.items():
+                for name, count in counts.items():
+                    languages[lang][name] += count
+            files[filename] = summarize(sum_counts(file_counts.values()))
+            files[filename]['strings'] = len(self.files[filename]['keys'])
+
+        return {
+            "languages": {lang: summarize(counts) for lang, counts in languages.items()},
+            "files": files,
+            "overall": summarize(sum_counts(languages.values())),
+        }
+
+
+def sum_counts(counts_list):
+    total = {name: 0 for name in STATE_NAMES.values()}
+    for counts in counts_list:
+        for name, count in counts.items():
+            total[name] += count
+    return total
+
+
+def summarize(counts):
+    """Counts plus the translated percentage (100% for an empty catalog)."""
+    cells = sum(counts.values())
+    return dict(counts, cells=cells, percent=100.0 * counts['translated'] / cells if cells else 100.0)
@@ -1,11 +1,26 @@
 import os
 import json
 import copy
+import unicodedata
+
+from catalog_files import find_catalogs, parallel_map, read_catalog
+from batch_planner import (
+    DEFAULT_MAX_INPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS, entry_cost, get_tokenizer, heuristic_token_count, pack_batches
+)
+from glossary import glossary_text, load_glossary, memory_prompt_version, select_glossary
+from model_router import ModelRouter, load_routing
+from translation_memory import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, MEMORY_HITS_FILE, TranslationMemory
+
+
+INSTRUCTIONS = "Please provide translations for the missing languages. Use the English version as a reference. For plural forms, provide appropriate translations for each form if applicable."
+
+# Fixed prompt text translate_with_llm.py wraps around every batch, plus
+# the per-group language lists of its compact wire format
+PROMPT_OVERHEAD_TOKENS = 150
 
 
 def estimate_tokens(text):
-    # Rough estimate: 1 token per 4 characters
-    return len(text) // 4 + 1
+    return heuristic_token_count(text)
 
 
 def is_translation_missing(translation):
@@ -21,85 +36,226 @@ def is_translation_missing(translation):
     return False
 
 
-def check_translations(folder_path, languages):
+def english_value(string_key, string_data):
+    en_value = string_key
+    if isinstance(string_data, dict) and 'localizations' in string_data:
+        en_localization = string_data['localizations'].get('en', {})
+        if isinstance(en_localization, dict):
+            if 'stringUnit' in en_localization:
+                en_value = en_localization['stringUnit'].get('value') or string_key
+            elif 'variations' in en_localization:
+                en_value = {
+                    form: variation['stringUnit'].get('value', string_key)
+                    for form, variation in en_localization['variations'].get('plural', {}).items()
+                }
+        elif isinstance(en_localization, str):
+            en_value = en_localization
+    return en_value
+
+
+def scan_catalog(data, languages, is_known_complete=None, stale_languages=None):
+    """
+    Return {string_key: {"en": ..., "missing_langs": [...]}} for one parsed catalog.
+
+    is_known_complete, if given, is called with (string_key, string_data) and
+    lets the scan skip keys a previous run already found complete.
+    stale_languages, if given, is called with (string_key, en_value,
+    translated_langs) and returns translated languages that need translating
+    again because the English source changed (see source_fingerprints).
+    """
+    missing = {}
+
+    for string_key, string_data in data.get('strings', {}).items():
+        if is_known_complete is not None and is_known_complete(string_key, string_data):
+            continue
+
+        missing_langs = [
+            lang for lang in languages
+            if lang not in string_data.get('localizations', {})
+            or is_translation_missing(string_data['localizations'].get(lang))
+        ]
+
+        en_value = None
+        if stale_languages is not None:
+            en_value = english_value(string_key, string_data)
+            stale = stale_languages(string_key, en_value, [lang for lang in languages if lang not in missing_langs])
+            if stale:
+                missing_langs = [lang for lang in languages if lang in missing_langs or lang in stale]
+
+        if missing_langs:
+            missing[string_key] = {
+                "en": en_value if en_value is not None else english_value(string_key, string_data),
+                "missing_langs": missing_langs
+            }
+
+    return missing
+
+
+def scan_file(task):
+    """Parse and scan one catalog; runs in a worker process."""
+    file_path, languages = task
+    return scan_catalog(read_catalog(file_path), languages)
+
+
+def check_translations(folder_path, languages, include=None, exclude=None, workers=None):
+    """
+    Find missing translations in every catalog under folder_path, recursively.
+
+    Catalogs are parsed and scanned across a process pool; only the missing
+    entries are sent back, never the parsed catalogs.
+
+    Returns:
+        {relative catalog path: {string_key: {"en", "missing_langs"}}}
+    """
+    filenames = find_catalogs(folder_path, include, exclude)
+    tasks = [(os.path.join(folder_path, filename), languages) for filename in filenames]
+
     missing_translations = {}
-    file_structures = {}
-
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.xcstrings'):
-            file_path = os.path.join(folder_path, filename)
-
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-
-            file_structures[filename] = data
-
-            for string_key, string_data in data.get('strings', {}).items():
-                en_value = string_key
-                if isinstance(string_data, dict) and 'localizations' in string_data:
-                    en_localization = string_data['localizations'].get('en', {})
-                    if isinstance(en_localization, dict):
-                        if 'stringUnit' in en_localization:
-                            en_value = en_localization['stringUnit'].get('value') or string_key
-                        elif 'variations' in en_localization:
-                            en_value = {
-                                form: variation['stringUnit'].get('value', string_key)
-                                for form, variation in en_localization['variations'].get('plural', {}).items()
-                            }
-                    elif isinstance(en_localization, str):
-                        en_value = en_localization
-
-                missing_langs = [
-                    lang for lang in languages
-                    if lang not in string_data.get('localizations', {})
-                    or is_translation_missing(string_data['localizations'].get(lang))
-                ]
-
-                if missing_langs:
-                    if filename not in missing_translations:
-                        missing_translations[filename] = {}
-                    missing_translations[filename][string_key] = {
-                        "en": en_value,
-                        "missing_langs": missing_langs
-                    }
-
-    return missing_translations, file_structures
-
-
-def create_llm_schemas(missing_translations, languages, max_tokens=4000):
-    llm_schemas = []
-    current_schema = {
-        "instructions": "Please provide translations for the missing languages. Use the English version as a reference. For plural forms, provide appropriate translations for each form if applicable.",
-        "translations": {}
-    }
-    current_tokens = estimate_tokens(json.dumps(current_schema["instructions"]))
+    for filename, missing in zip(filenames, parallel_map(scan_file, tasks, workers)):
+        if missing:
+            missing_translations[filename] = missing
+
+    return missing_translations
+
+
+def resolve_from_memory(missing_translations, memory):
+    """
+    Fill missing translations from the translation memory before batching.
+
+    Returns the still-missing entries (same shape as check_translations output)
+    and the resolved translations keyed by "filename:key" in task file format.
+    """
+    remaining = {}
+    resolved = {}
+
+    for filename, strings in missing_translations.items():
+        for string_key, data in strings.items():
+            still_missing = []
+            found = {}
+            for lang in data["missing_langs"]:
+                translation = memory.lookup(data["en"], lang)
+                if translation is None:
+                    still_missing.append(lang)
+                else:
+                    found[lang] = translation
+
+            if found:
+                resolved[f"{filename}:{string_key}"] = {
+                    "en": data["en"],
+                    "missing_translations": found
+                }
+            if still_missing:
+                remaining.setdefault(filename, {})[string_key] = {
+                    "en": data["en"],
+                    "missing_langs": still_missing
+                }
+
+    return remaining, resolved
+
+
+def save_memory_hits(resolved):
+    with open(MEMORY_HITS_FILE, 'w', encoding='utf-8') as outfile:
+        json.dump({"translations": resolved}, outfile, indent=2, ensure_ascii=False)
+    print(f"Created {MEMORY_HITS_FILE} with {len(resolved)} string(s) from translation memory")
+
+
+def normalize_source(en_value):
+    """NFC-normalized English source (string or plural dict), so equivalent spellings compare equal."""
+    if isinstance(en_value, dict):
+        return {form: unicodedata.normalize('NFC', value) for form, value in en_value.items()}
+    return unicodedata.normalize('NFC', en_value)
+
+
+def dedup_key(en_value, missing_langs):
+    """Group key for identical source strings: normalized value, plural shape and language set."""
+    return json.dumps([normalize_source(en_value), sorted(missing_langs)], sort_keys=True, ensure_ascii=False)
+
+
+def create_llm_schemas(missing_translations, languages, max_tokens=DEFAULT_MAX_INPUT_TOKENS,
+                       max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, tokenizer='heuristic', deduplicate=True, route=None,
+                       group=None, glossary=None):
+    count_tokens = get_tokenizer(tokenizer)
+    # The glossary is sent with every batch, as part of the prompt prefix
+    glossary = select_glossary(glossary, languages)
+    base_tokens = count_tokens(json.dumps(INSTRUCTIONS)) + count_tokens(glossary_text(glossary)) + PROMPT_OVERHEAD_TOKENS
 
+    # Cost each entry only for the languages it is actually missing. With
+    # deduplicate, identical strings (across all catalogs) are sent once and
+    # the other occurrences are listed as duplicates of the one that is sent.
+    items = []
+    representatives = {}
+    duplicates = {}
+    saved_tokens = {}
     for filename, strings in missing_translations.items():
         for string_key, data in strings.items():
+            entry_id = f"{filename}:{string_key}"
             new_entry = {
                 "en": data["en"],
                 "missing_translations": {lang: "" for lang in data["missing_langs"]}
             }
-            new_entry_tokens = estimate_tokens(json.dumps(new_entry)) * (
-                        len(languages) + 1)  # Estimating tokens for all languages
-
-            if current_tokens + new_entry_tokens > max_tokens:
-                llm_schemas.append(current_schema)
-                current_schema = {
-                    "instructions": "Please provide translations for the missing languages. Use the English version as a reference. For plural forms, provide appropriate translations for each form if applicable.",
-                    "translations": {}
-                }
-                current_tokens = estimate_tokens(json.dumps(current_schema["instructions"]))
+            input_tokens, output_tokens = entry_cost(entry_id, new_entry, count_tokens)
+
+            if deduplicate:
+                key = dedup_key(data["en"], data["missing_langs"])
+                if key in representatives:
+                    representative = representatives[key]
+                    duplicates.setdefault(representative, []).append(entry_id)
+                    saved_tokens[representative] = saved_tokens.get(representative, 0) + input_tokens + output_tokens
+                    continue
+                representatives[key] = entry_id
 
-            current_schema["translations"][f"{filename}:{string_key}"] = new_entry
-            current_tokens += new_entry_tokens
+            items.append(((entry_id, new_entry), input_tokens, output_tokens))
 
-    if current_schema["translations"]:
-        llm_schemas.append(current_schema)
+    # With route (e.g. ModelRouter.choose), strings routed to different
+    # models are packed into separate batches, each recording its model.
+    # With group (e.g. ModelRouter.group), strings are packed per routing
+    # rule instead, capped at the rule's max_entries per batch.
+    groups = {}
+    for item in items:
+        entry_id, entry = item[0]
+        task_data = {"translations": {entry_id: entry}}
+        if group is not None:
+            key = group(task_data)
+        else:
+            key = (route(task_data) if route is not None else None, None)
+        groups.setdefault(key, []).append(item)
+
+    batches = []
+    for (_, max_entries), group_items in groups.items():
+        batches.extend(pack_batches(group_items, max_tokens, max_output_tokens, base_input_tokens=base_tokens,
+                                    max_items=max_entries))
+
+    llm_schemas = []
+    for batch in batches:
+        translations = dict(batch["items"])
+        schema = {
+            "instructions": INSTRUCTIONS,
+            "translations": translations,
+            "estimated_tokens": {
+                "input": batch["input_tokens"],
+                "output": batch["output_tokens"]
+            }
+        }
+        if glossary:
+            schema["glossary"] = glossary
+        if route is not None:
+            schema["model"] = route(schema)
+        batch_duplicates = {entry_id: duplicates[entry_id] for entry_id in translations if entry_id in duplicates}
+        if batch_duplicates:
+            schema["duplicates"] = batch_duplicates
+            schema["estimated_tokens"]["saved_by_dedup"] = sum(saved_tokens[entry_id] for entry_id in batch_duplicates)
+        llm_schemas.append(schema)
 
     return llm_schemas
 
 
+def print_dedup_savings(llm_schemas):
+    duplicate_count = sum(len(ids) for schema in llm_schemas for ids in schema.get("duplicates", {}).values())
+    if duplicate_count:
+        saved = sum(schema["estimated_tokens"].get("saved_by_dedup", 0) for schema in llm_schemas)
+        print(f"♊ Deduplicated {duplicate_count} repeated string(s), saving ~{saved} tokens")
+
+
 def save_llm_schemas(llm_schemas):
     for i, schema in enumerate(llm_schemas):
         filename = f'llm_translation_task_{i + 1}.json'
@@ -115,7 +271,17 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Enforce 100% translation coverage for .xcstrings files')
     parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
     parser.add_argument('--languages', required=True, help='Comma-separated list of language codes')
-    parser.add_argument('--max-tokens', type=int, default=60000, help='Maximum tokens per batch (default: 60000)')
+    parser.add_argument('--include', action='append', help='Glob for catalogs to scan, repeatable (default: *.xcstrings, searched recursively)')
+    parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    parser.add_argument('--workers', type=int, help='Processes used to parse catalogs (default: CPU count)')
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_INPUT_TOKENS, help=f'Maximum input tokens per batch (default: {DEFAULT_MAX_INPUT_TOKENS})')
+    parser.add_argument('--max-output-tokens', type=int, default=DEFAULT_MAX_OUTPUT_TOKENS, help=f'Maximum expected output tokens per batch (default: {DEFAULT_MAX_OUTPUT_TOKENS})')
+    parser.add_argument('--tokenizer', default='heuristic', choices=['heuristic', 'tiktoken'], help='Token counter used for batching (default: heuristic)')
+    parser.add_argument('--cache-dir', help=f'Translation memory directory, e.g. {DEFAULT_CACHE_DIR} (disabled when omitted)')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help='Maximum translation memory size in MB; older entries are evicted past it (default: 50)')
+    parser.add_argument('--model', default='gemini-3-flash-preview', help='Model the translation memory is keyed by (default: gemini-3-flash-preview)')
+    parser.add_argument('--glossary', help='JSON file with project terms and per-language style notes, sent with every batch')
+    parser.add_argument('--routing', help='JSON file with rules routing batches to models; batches are packed per rule and record their model (pass the same file to translate_with_llm.py)')
     
     args = parser.parse_args()
     
@@ -133,16 +299,56 @@ if __name__ == '__main__':
     if not os.path.isdir(folder_path):
         print(f"❌ Error: '{folder_path}' is not a directory")
         exit(1)
+
+    glossary = None
+    if args.glossary:
+        try:
+            glossary = select_glossary(load_glossary(args.glossary), languages_to_check)
+        except (ValueError, OSError) as e:
+            print(f"❌ Error: {e}")
+            exit(1)
+
+    # Only the rules are needed to plan; translate_with_llm.py creates the backends
+    router = None
+    if args.routing:
+        try:
+            router = ModelRouter(None, args.model, *load_routing(args.routing))
+        except (ValueError, OSError) as e:
+            print(f"❌ Error: {e}")
+            exit(1)
     
     # Check for missing translations
-    missing_translations, file_structures = check_translations(folder_path, languages_to_check)
+    missing_translations = check_translations(folder_path, languages_to_check, include=args.include,
+                                              exclude=args.exclude, workers=args.workers)
     
     if not missing_translations:
         print("✅ All translations are complete!")
         exit(0)
+
+    # Resolve strings we've translated before so only real misses are batched
+    if args.cache_dir:
+        memory = TranslationMemory(args.cache_dir, args.model, memory_prompt_version(glossary),
+                                   max_bytes=args.cache_max_mb * 1024 * 1024)
+        missing_translations, resolved = resolve_from_memory(missing_translations, memory)
+        memory.print_stats()
+        memory.close()
+
+        if resolved:
+            save_memory_hits(resolved)
+
+        if not missing_translations:
+            print("✅ All missing translations were found in translation memory!")
+            exit(0)
     
     # Create schemas for LLM, split into files of approximately specified tokens each
-    llm_schemas = create_llm_schemas(missing_translations, languages_to_check, max_tokens=args.max_tokens)
+    llm_schemas = create_llm_schemas(missing_translations, languages_to_check, max_tokens=args.max_tokens,
+                                     max_output_tokens=args.max_output_tokens, tokenizer=args.tokenizer,
+                                     route=router.choose if router else None,
+                                     group=router.group if router else None, glossary=glossary)
+    total_input = sum(schema["estimated_tokens"]["input"] for schema in llm_schemas)
+    total_output = sum(schema["estimated_tokens"]["output"] for schema in llm_schemas)
+    print(f"📦 Planned {len(llm_schemas)} batch(es): ~{total_input} input / ~{total_output} output tokens")
+    print_dedup_savings(llm_schemas)
     
     # Save the LLM schemas to files
     save_llm_schemas(llm_schemas)
@@ -4,6 +4,17 @@ set -e
 # Input parameters
 GEMINI_API_KEY="$1"
 SOURCE_FOLDER="$2"
+CONCURRENCY="${3:-4}"
+CACHE_DIR="${4:-.localization-cache}"
+REQUESTS_PER_MINUTE="$5"
+TOKENS_PER_MINUTE="$6"
+ROUTING_FILE="$7"
+SHARD="$8"
+SHARD_BY="${9:-language}"
+MERGE_ARTIFACTS="${10}"
+VARIANTS_FILE="${11}"
+GLOSSARY_FILE="${12}"
+CACHE_MAX_MB="${13:-50}"
 
 # Hardcoded configuration
 LANGUAGES="ar,de,es,fr,ja,nl,pt,zh-Hans,zh-Hant,it,ko,sv,hi,pl,tr,ru"
@@ -11,8 +22,8 @@ LANGUAGES="ar,de,es,fr,ja,nl,pt,zh-Hans,zh-Hant,it,ko,sv,hi,pl,tr,ru"
 echo "🌍 Starting LLM-Powered Localization Workflow"
 echo "================================================"
 
-# Validate inputs
-if [ -z "$GEMINI_API_KEY" ]; then
+# Validate inputs (merging shard artifacts doesn't call Gemini)
+if [ -z "$GEMINI_API_KEY" ] && [ -z "$MERGE_ARTIFACTS" ]; then
     echo "❌ Error: Gemini API key is required"
     exit 1
 fi
@@ -40,43 +51,108 @@ fi
 
 echo "✅ Found $XCSTRINGS_COUNT .xcstrings file(s) in $SOURCE_FOLDER"
 
-# Step 1: Enforce 100% translation - generate JSON files for LLM
-echo ""
-echo "📋 Step 1: Analyzing missing translations..."
-python /action/enforce_100%_translation.py --folder "$SOURCE_FOLDER" --languages "$LANGUAGES"
-
-# Check if any translation files were generated
-TRANSLATION_FILES=$(find . -name "llm_translation_task_*.json" | wc -l)
-if [ "$TRANSLATION_FILES" -eq 0 ]; then
-    echo "✅ All translations are complete! No work needed."
-    exit 0
+# Optional rate-limit budgets, model routing and glossary
+EXTRA_ARGS=()
+if [ -n "$REQUESTS_PER_MINUTE" ]; then
+    EXTRA_ARGS+=(--rpm "$REQUESTS_PER_MINUTE")
+fi
+if [ -n "$TOKENS_PER_MINUTE" ]; then
+    EXTRA_ARGS+=(--tpm "$TOKENS_PER_MINUTE")
+fi
+if [ -n "$ROUTING_FILE" ]; then
+    if [ ! -f "$ROUTING_FILE" ]; then
+        echo "❌ Error: Routing file '$ROUTING_FILE' does not exist"
+        exit 1
+    fi
+    EXTRA_ARGS+=(--routing "$ROUTING_FILE")
+fi
+if [ -n "$GLOSSARY_FILE" ]; then
+    if [ ! -f "$GLOSSARY_FILE" ]; then
+        echo "❌ Error: Glossary file '$GLOSSARY_FILE' does not exist"
+        exit 1
+    fi
+    EXTRA_ARGS+=(--glossary "$GLOSSARY_FILE")
 fi
 
-echo "✅ Generated $TRANSLATION_FILES translation task file(s)"
+# Optional regional variants map, used wherever catalogs are written
+VARIANTS_ARGS=()
+if [ -n "$VARIANTS_FILE" ]; then
+    if [ ! -f "$VARIANTS_FILE" ]; then
+        echo "❌ Error: Variants file '$VARIANTS_FILE' does not exist"
+        exit 1
+    fi
+    VARIANTS_ARGS+=(--variants "$VARIANTS_FILE")
+fi
 
-# Step 2: Translate using Gemini LLM
-echo ""
-echo "🤖 Step 2: Translating with Gemini AI..."
-python /action/translate_with_llm.py --api-key "$GEMINI_API_KEY"
+if [ -n "$SHARD" ] && [ -n "$MERGE_ARTIFACTS" ]; then
+    echo "❌ Error: shard and merge-artifacts can't be used together"
+    exit 1
+fi
 
-# Step 3: Apply translations back to .xcstrings files
-echo ""
-echo "📝 Step 3: Applying translations to .xcstrings files..."
-python /action/apply_translations.py --folder "$SOURCE_FOLDER"
+if [ -n "$SHARD" ]; then
+    # Shard job: translate this slice into an artifact for the merge job, no PR
+    SHARD_ARTIFACT="$CACHE_DIR/shards/shard-${SHARD/\//-of-}.json"
+    echo "🧩 Translating shard $SHARD (by $SHARD_BY)..."
+    python /action/localize.py run \
+        --folder "$SOURCE_FOLDER" \
+        --languages "$LANGUAGES" \
+        --api-key "$GEMINI_API_KEY" \
+        --concurrency "$CONCURRENCY" \
+        --cache-dir "$CACHE_DIR" \
+        --cache-max-mb "$CACHE_MAX_MB" \
+        --job-dir "$CACHE_DIR/job" \
+        --metrics-file "$CACHE_DIR/metrics.json" \
+        "${EXTRA_ARGS[@]}" \
+        --shard "$SHARD" \
+        --shard-by "$SHARD_BY" \
+        --shard-output "$SHARD_ARTIFACT" \
+        --resume
+    echo "shard-artifact=$SHARD_ARTIFACT" >> "$GITHUB_OUTPUT"
+    echo "✅ Shard $SHARD done, upload $SHARD_ARTIFACT for the merge job"
+    exit 0
+fi
 
-# Step 4: Add regional variants
-echo ""
-echo "🌐 Step 4: Adding regional variants..."
-python /action/add_regional_variants.py --folder "$SOURCE_FOLDER"
+if [ -n "$MERGE_ARTIFACTS" ]; then
+    # Merge job: apply every shard's artifact in one pass, then open one PR
+    mapfile -t ARTIFACT_FILES < <(find "$MERGE_ARTIFACTS" -name "shard-*.json" | sort)
+    if [ "${#ARTIFACT_FILES[@]}" -eq 0 ]; then
+        echo "❌ Error: No shard artifacts found in '$MERGE_ARTIFACTS'"
+        exit 1
+    fi
+    echo "🧩 Step 1: Merging ${#ARTIFACT_FILES[@]} shard artifact(s)..."
+    python /action/localize.py merge \
+        --folder "$SOURCE_FOLDER" \
+        --languages "$LANGUAGES" \
+        --cache-dir "$CACHE_DIR" \
+        "${VARIANTS_ARGS[@]}" \
+        "${ARTIFACT_FILES[@]}"
+else
+    # Step 1: Find missing translations, translate them with Gemini, apply them
+    # and add regional variants, parsing and writing each catalog once
+    echo "🚀 Step 1: Translating missing strings..."
+    python /action/localize.py run \
+        --folder "$SOURCE_FOLDER" \
+        --languages "$LANGUAGES" \
+        --api-key "$GEMINI_API_KEY" \
+        --concurrency "$CONCURRENCY" \
+        --cache-dir "$CACHE_DIR" \
+        --cache-max-mb "$CACHE_MAX_MB" \
+        --job-dir "$CACHE_DIR/job" \
+        --metrics-file "$CACHE_DIR/metrics.json" \
+        "${EXTRA_ARGS[@]}" \
+        "${VARIANTS_ARGS[@]}" \
+        --resume
+fi
 
-# Clean up translation task files
-echo ""
-echo "🧹 Cleaning up temporary files..."
-rm -f llm_translation_task_*.json
+git config --global --add safe.directory /github/workspace
+if [ -z "$(git status --porcelain -- "$SOURCE_FOLDER")" ]; then
+    echo "✅ All translations are complete! No work needed."
+    exit 0
+fi
 
-# Step 5: Create PR with changes
+# Step 2: Create PR with changes
 echo ""
-echo "📤 Step 5: Creating pull request..."
+echo "📤 Step 2: Creating pull request..."
 
 # Authenticate GitHub CLI
 if [ -z "$GITHUB_TOKEN" ]; then
@@ -88,7 +164,6 @@ fi
 echo "✅ Using GITHUB_TOKEN for authentication"
 
 # Configure git
-git config --global --add safe.directory /github/workspace
 git config --global user.name "github-actions[bot]"
 git config --global user.email "github-actions[bot]@users.noreply.github.com"
 echo "✅ Git configured"
@@ -0,0 +1,114 @@
+"""
+Project glossary and style notes, sent with every batch's prompt.
+
+A glossary file is JSON with the terms that must be translated consistently
+and style notes, per language or for all of them ("*"):
+
+    {
+      "terms": {
+        "Streak": "A run of consecutive days with a completed habit",
+        "Focus Mode": {"de": "Fokusmodus", "ja": "集中モード"}
+      },
+      "style": {
+        "*": "Short, friendly UI text.",
+        "de": "Address the user informally (du)."
+      }
+    }
+
+A term maps to a note for every language or to the required translation per
+language. Together with the instructions it forms the prompt prefix that is
+the same for every batch of a run, which is what makes it cacheable.
+"""
+
+import hashlib
+import json
+
+from translation_memory import PROMPT_VERSION
+
+ALL_LANGUAGES = '*'
+
+
+def load_glossary(path):
+    """
+    Read and validate a glossary file.
+
+    Raises:
+        ValueError: The file is not a valid glossary file
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            glossary = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Glossary file {path} is not valid JSON: {e}") from e
+
+    if not isinstance(glossary, dict):
+        raise ValueError(f"Glossary file {path} must be a JSON object")
+    unknown = set(glossary) - {'terms', 'style'}
+    if unknown:
+        raise ValueError(f"Glossary file {path}: unknown section(s) {', '.join(sorted(unknown))}")
+
+    terms = glossary.get('terms', {})
+    style = glossary.get('style', {})
+    if not isinstance(terms, dict) or not all(
+            isinstance(value, str) or (isinstance(value, dict) and all(isinstance(text, str) for text in value.values()))
+            for value in terms.values()):
+        raise ValueError(f"Glossary file {path}: each term must map to a note or to {{language: translation}}")
+    if not isinstance(style, dict) or not all(isinstance(note, str) for note in style.values()):
+        raise ValueError(f"Glossary file {path}: 'style' must map languages (or \"*\") to notes")
+    return {"terms": terms, "style": style}
+
+
+def select_glossary(glossary, languages):
+    """
+    The part of a glossary that applies to a run's languages, or None if nothing does.
+
+    Translations and style notes for other languages are dropped, so they
+    don't take up room in every prompt.
+    """
+    if not glossary:
+        return None
+    wanted = set(languages) | {ALL_LANGUAGES}
+    terms = {}
+    for term, value in sorted(glossary.get('terms', {}).items()):
+        if isinstance(value, dict):
+            value = {lang: text for lang, text in sorted(value.items()) if lang in wanted}
+            if not value:
+                continue
+        terms[term] = value
+    style = {lang: note for lang, note in sorted(glossary.get('style', {}).items()) if lang in wanted}
+    if not terms and not style:
+        return None
+    return {"terms": terms, "style": style}
+
+
+def glossary_text(glossary):
+    """The glossary as prompt text ('' without one)."""
+    if not glossary:
+        return ''
+    sections = []
+    if glossary['terms']:
+        lines = ["Glossary: translate these terms consistently."]
+        for term, value in glossary['terms'].items():
+            if isinstance(value, dict):
+                value = '; '.join(f"{lang}: {text}" for lang, text in value.items())
+            lines.append(f"- {json.dumps(term, ensure_ascii=False)}: {value}")
+        sections.append('\n'.join(lines))
+    if glossary['style']:
+        lines = ["Style notes:"]
+        for lang, note in glossary['style'].items():
+            lines.append(f"- {'All languages' if lang == ALL_LANGUAGES else lang}: {note}")
+        sections.append('\n'.join(lines))
+    return '\n\n'.join(sections)
+
+
+def memory_prompt_version(glossary):
+    """
+    Translation memory prompt version for a run with a glossary.
+
+    Translations made with a different glossary (or none) aren't reused, since
+    the glossary can change how a string should be translated.
+    """
+    if not glossary:
+        return PROMPT_VERSION
+    digest = hashlib.sha256(json.dumps(glossary, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"{PROMPT_VERSION}+glossary-{digest[:12]}"
@@ -0,0 +1,153 @@
+"""
+Incremental parser for streamed LLM responses.
+
+The translation response is one JSON object whose values are the translated
+entries. ObjectStreamParser is fed the response text chunk by chunk and
+returns every (key, value) member as soon as its value closes, so entries can
+be used before the response is complete and a response cut off mid-stream
+still yields every entry that finished. Consumed text is discarded, so memory
+stays bounded by the largest single entry rather than the whole response.
+"""
+
+import json
+from json.decoder import scanstring
+
+WHITESPACE = ' \t\n\r'
+
+
+class ObjectStreamParser:
+    """Streams the members of a top-level JSON object."""
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.state = 'start'
+        self.key = None
+        self.closed = False
+        # Scanner state for the value currently being read
+        self._value_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """
+        Add text to the parser.
+
+        Returns:
+            List of (key, value) members completed by this chunk
+
+        Raises:
+            json.JSONDecodeError: The text can't be a JSON object
+        """
+        self.buffer += chunk
+        members = []
+
+        while not self.closed:
+            if self.state == 'start':
+                # Skip anything before the object, such as a ```json fence
+                start = self.buffer.find('{', self.pos)
+                if start == -1:
+                    self.pos = len(self.buffer)
+                    break
+                self.pos = start + 1
+                self.state = 'key'
+
+            elif self.state == 'key':
+                self._skip(WHITESPACE + ',')
+                if self.pos >= len(self.buffer):
+                    break
+                char = self.buffer[self.pos]
+                if char == '}':
+                    self.pos += 1
+                    self.closed = True
+                    break
+                if char != '"':
+                    raise json.JSONDecodeError("Expected property name", self.buffer, self.pos)
+                try:
+                    self.key, end = scanstring(self.buffer, self.pos + 1)
+                except json.JSONDecodeError:
+                    # The key itself hasn't fully arrived yet
+                    break
+                self.pos = end
+                self.state = 'colon'
+
+            elif self.state == 'colon':
+                self._skip(WHITESPACE)
+                if self.pos >= len(self.buffer):
+                    break
+                if self.buffer[self.pos] != ':':
+                    raise json.JSONDecodeError("Expected ':'", self.buffer, self.pos)
+                self.pos += 1
+                self.state = 'value'
+
+            elif self.state == 'value':
+                end = self._scan_value()
+                if end is None:
+                    break
+                value = json.loads(self.buffer[self._value_start:end])
+                members.append((self.key, value))
+                self.pos = end
+                self._value_start = None
+                self.state = 'key'
+                self._compact()
+
+        return members
+
+    def _skip(self, characters):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in characters:
+            self.pos += 1
+
+    def _scan_value(self):
+        """Advance through the current value; return its end offset once it closes."""
+        buffer = self.buffer
+        if self._value_start is None:
+            self._skip(WHITESPACE)
+            if self.pos >= len(buffer):
+                return None
+            self._value_start = self.pos
+            self._depth = 0
+            self._in_string = False
+            self._escape = False
+
+        first = buffer[self._value_start]
+        pos = self.pos
+
+        if first not in '{["':
+            # Scalar (number, true, false, null): ends at the next delimiter
+            while pos < len(buffer) and buffer[pos] not in ',}' + WHITESPACE:
+                pos += 1
+            self.pos = pos
+            return pos if pos < len(buffer) else None
+
+        while pos < len(buffer):
+            char = buffer[pos]
+            pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        self.pos = pos
+                        return pos
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.pos = pos
+                    return pos
+
+        self.pos = pos
+        return None
+
+    def _compact(self):
+        """Drop text that has been fully consumed."""
+        if self.pos > 4096:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
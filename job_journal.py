@@ -0,0 +1,149 @@
+"""
+Checkpoint journal for translation jobs.
+
+Every batch of a job is tracked in a journal file inside the job directory
+with its status (pending, in-flight, done, failed), attempts, token usage and
+last error. Batch payloads (the task sent and the translations received) are
+stored next to it, so a job interrupted by an outage can be resumed and only
+its unfinished batches are translated again.
+"""
+
+import json
+import os
+import threading
+import time
+
+JOURNAL_NAME = 'journal.json'
+
+# Journal directory used by the standalone scripts, next to the
+# llm_translation_task_*.json files in the working directory
+SCRIPT_JOB_DIR = 'llm_translation_job'
+
+PENDING = 'pending'
+IN_FLIGHT = 'in-flight'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobJournal:
+    """Per-batch status journal persisted after every change."""
+
+    def __init__(self, job_dir, meta=None):
+        """
+        Open (or start) the journal in job_dir.
+
+        Args:
+            job_dir: Directory holding the journal and batch payloads
+            meta: Description of the job (folder, languages, model...). An
+                existing journal written for different meta is discarded.
+        """
+        os.makedirs(job_dir, exist_ok=True)
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, JOURNAL_NAME)
+        self.meta = meta or {}
+        self.batches = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.batches = data.get('batches', {})
+            if meta is None or data.get('meta') == self.meta:
+                self.meta = data.get('meta', {})
+            else:
+                print("⚠️  Existing job journal was written for a different job, starting over")
+                self.reset()
+
+    def reset(self):
+        """Forget every batch and remove their payloads."""
+        with self._lock:
+            for name in self.batches:
+                for kind in ('task', 'result'):
+                    path = self._payload_path(name, kind)
+                    if os.path.exists(path):
+                        os.remove(path)
+            self.batches = {}
+            self._save()
+
+    def add_batch(self, name, task_data=None):
+        """Register a pending batch (keeping the history of a resumed one), optionally storing its task payload."""
+        if task_data is not None:
+            self.save_payload(name, 'task', task_data)
+        with self._lock:
+            batch = self.batches.setdefault(name, {"status": PENDING, "attempts": 0, "usage": {}, "error": None})
+            batch["status"] = PENDING
+            self._save()
+
+    def mark_in_flight(self, name):
+        with self._lock:
+            batch = self.batches[name]
+            batch["status"] = IN_FLIGHT
+            batch["started_at"] = time.time()
+            self._save()
+
+    def mark_done(self, name, stats=None, result=None):
+        """Mark a batch done, storing its translations payload if given."""
+        if result is not None:
+            self.save_payload(name, 'result', result)
+        with self._lock:
+            batch = self.batches[name]
+            batch["status"] = DONE
+            batch["error"] = None
+            self._record_stats(batch, stats)
+            self._save()
+
+    def mark_failed(self, name, error, stats=None):
+        with self._lock:
+            batch = self.batches[name]
+            batch["status"] = FAILED
+            batch["error"] = str(error)
+            self._record_stats(batch, stats)
+            self._save()
+
+    def status(self, name):
+        batch = self.batches.get(name)
+        return batch["status"] if batch else None
+
+    def done(self):
+        """Names of finished batches, in order."""
+        return sorted(name for name, batch in self.batches.items() if batch["status"] == DONE)
+
+    def unfinished(self):
+        """Names of batches that still need translating (pending, in-flight or failed)."""
+        return sorted(name for name, batch in self.batches.items() if batch["status"] != DONE)
+
+    def save_payload(self, name, kind, data):
+        path = self._payload_path(name, kind)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_payload(self, name, kind):
+        with open(self._payload_path(name, kind), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def summary(self):
+        """Count of batches per status."""
+        counts = {}
+        for batch in self.batches.values():
+            counts[batch["status"]] = counts.get(batch["status"], 0) + 1
+        return counts
+
+    def _payload_path(self, name, kind):
+        return os.path.join(self.job_dir, f"{name}.{kind}.json")
+
+    def _record_stats(self, batch, stats):
+        if not stats:
+            return
+        batch["attempts"] += stats.get("attempts", 0)
+        for key in ("prompt_tokens", "cached_tokens", "output_tokens"):
+            if key in stats:
+                batch["usage"][key] = batch["usage"].get(key, 0) + stats[key]
+
+    def _save(self):
+        # Callers hold self._lock
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"meta": self.meta, "batches": self.batches}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
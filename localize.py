@@ -0,0 +1,973 @@
+#!/usr/bin/env python3
+"""
+Single-process localization pipeline.
+
+Parses every .xcstrings catalog once, finds missing translations, translates
+them with Gemini, then applies the results and regional variants in memory and
+writes each changed catalog at most once. Replaces the enforce -> translate ->
+apply -> regional variants round-trip through llm_translation_task_*.json files.
+"""
+
+import os
+import sys
+import json
+import argparse
+import importlib
+import threading
+import time
+
+from add_regional_variants import LANGUAGE_VARIANTS, VariantPropagation, load_variants
+from apply_translations import apply_translation_entry, expand_duplicates
+from catalog_files import find_catalogs, loads, write_catalog
+from catalog_watcher import DEFAULT_DEBOUNCE, DEFAULT_INTERVAL, CatalogWatcher
+from coverage_index import CoverageIndex
+from glossary import load_glossary, memory_prompt_version, select_glossary
+from batch_planner import DEFAULT_MAX_INPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS
+from job_journal import JobJournal
+from model_router import create_router, describe_routing
+from run_manifest import RunManifest
+from run_planner import METRICS_NAME, load_calibration, plan_report, print_plan
+from source_fingerprints import SourceFingerprints
+from shards import SHARD_MODES, filter_missing, load_artifact, parse_shard, shard_languages, write_artifact
+from telemetry import Telemetry
+from translate_with_llm import remember_translations, translate_batches
+from translation_backends import DEFAULT_MODEL
+from translation_memory import DATABASE_NAME, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, TranslationMemory
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+DEFAULT_LANGUAGES = "ar,de,es,fr,ja,nl,pt,zh-Hans,zh-Hant,it,ko,sv,hi,pl,tr,ru"
+
+# Watch mode translates a handful of new strings at a time: small batches
+# come back sooner and run in parallel
+WATCH_MAX_INPUT_TOKENS = 4000
+WATCH_MAX_OUTPUT_TOKENS = 4000
+
+
+def load_catalogs(folder_path, manifest=None, include=None, exclude=None, telemetry=None):
+    """
+    Parse every catalog under the folder (recursively) exactly once.
+
+    With a manifest, catalogs that are unchanged and were complete after the
+    last successful run are skipped without being parsed.
+
+    Returns:
+        Tuple of ({relative path: parsed catalog}, {relative path: original
+        file text}, [skipped relative paths])
+    """
+    catalogs = {}
+    originals = {}
+    skipped = []
+
+    for filename in find_catalogs(folder_path, include, exclude):
+        path = os.path.join(folder_path, filename)
+
+        content = None
+        if manifest is not None:
+            skip, content = manifest.check_file(filename, path)
+            if skip:
+                skipped.append(filename)
+                continue
+
+        start = time.perf_counter()
+        if content is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        originals[filename] = content
+        catalogs[filename] = loads(content)
+        if telemetry is not None:
+            telemetry.record_catalog(filename, parse_seconds=time.perf_counter() - start, bytes=len(content))
+
+    return catalogs, originals, skipped
+
+
+def find_missing(catalogs, languages, manifest=None, telemetry=None, fingerprints=None):
+    """
+    Missing translations for the parsed catalogs, shaped like check_translations() output.
+
+    With fingerprints, translations whose English source changed since they
+    were made count as missing too.
+    """
+    missing_translations = {}
+    for filename, data in catalogs.items():
+        start = time.perf_counter()
+        is_known_complete = manifest.known_complete(filename) if manifest is not None else None
+        stale_languages = fingerprints.stale_languages(filename) if fingerprints is not None else None
+        missing = enforce.scan_catalog(data, languages, is_known_complete, stale_languages)
+        if telemetry is not None:
+            telemetry.record_catalog(filename, scan_seconds=time.perf_counter() - start,
+                                     strings=len(data.get('strings', {})), missing=len(missing))
+        if missing:
+            missing_translations[filename] = missing
+    return missing_translations
+
+
+def apply_entries(catalogs, translations, collect=None, fingerprints=None, variants=None):
+    """
+    Apply {"filename:key": entry} translations to the in-memory catalogs.
+
+    With collect, applied entries are also merged into that dict (per
+    language), e.g. to write them to a shard artifact. With fingerprints,
+    the English source of every applied translation is recorded. With
+    variants (a VariantPropagation), the string is queued for its regional
+    variants along with the text its base languages had before.
+    """
+    applied = 0
+    for entry_id, translations_data in translations.items():
+        filename, string_key = entry_id.split(':', 1)
+        if filename not in catalogs or not isinstance(translations_data, dict):
+            print(f"  ⚠️  Ignoring unexpected entry '{entry_id}'")
+            continue
+        if variants is not None:
+            variants.before_change(filename, string_key, catalogs[filename]['strings'].get(string_key))
+        updated = apply_translation_entry(catalogs[filename], string_key, translations_data)
+        if updated:
+            applied += 1
+            if fingerprints is not None:
+                string_data = catalogs[filename]['strings'][string_key]
+                fingerprints.record(filename, string_key, enforce.english_value(string_key, string_data), updated)
+            if collect is not None:
+                collected = collect.setdefault(entry_id, {"en": translations_data.get('en'), "missing_translations": {}})
+                collected['missing_translations'].update(translations_data.get('missing_translations', {}))
+    return applied
+
+
+def write_changed_catalogs(folder_path, catalogs, originals):
+    """
+    Write each catalog in Xcode's format, only if its content changed.
+
+    originals is updated with the content that is now on disk.
+    """
+    written = []
+    for filename, data in catalogs.items():
+        content = write_catalog(os.path.join(folder_path, filename), data, originals[filename])
+        if content is None:
+            continue
+        originals[filename] = content
+        written.append(filename)
+        print(f"💾 Saved updated {filename}")
+    return written
+
+
+def existing_catalogs(folder_path, filenames):
+    """
+    The catalogs among filenames that still exist under folder_path.
+
+    Cache state is pruned by this rather than by the catalogs a run loaded,
+    so a run narrowed with --include or --exclude keeps the state of the others.
+    """
+    return {filename for filename in filenames if os.path.isfile(os.path.join(folder_path, filename))}
+
+
+def save_manifest(folder_path, cache_dir, languages, manifest, catalogs, originals, fingerprints=None):
+    """Record the state of every catalog after a successful run."""
+    if manifest is None:
+        manifest = RunManifest(cache_dir, languages)
+
+    for filename, data in catalogs.items():
+        # Keys applied in this run no longer match the old manifest, so they are re-checked
+        # (stale translations that weren't redone keep their key incomplete)
+        stale_languages = fingerprints.stale_languages(filename) if fingerprints is not None else None
+        still_missing = enforce.scan_catalog(data, languages, manifest.known_complete(filename), stale_languages)
+        manifest.record(filename, os.path.join(folder_path, filename), originals[filename],
+                        data, still_missing, enforce.english_value)
+
+    manifest.prune(existing_catalogs(folder_path, manifest.catalogs))
+    manifest.save()
+
+    # Keep the coverage index warm for the coverage command (skipped catalogs are unchanged)
+    index = CoverageIndex(languages, cache_dir)
+    for filename, data in catalogs.items():
+        index.record(filename, os.path.join(folder_path, filename), data)
+    index.save()
+
+
+def current_entries(catalogs, entries):
+    """
+    The {"filename:key": entry} entries whose English source still matches the catalogs.
+
+    Sources are compared normalized, like duplicates are grouped, so a duplicate
+    spelled with different Unicode normalization still matches its representative.
+    """
+    current = {}
+    for entry_id, entry in entries.items():
+        filename, string_key = entry_id.split(':', 1)
+        string_data = catalogs.get(filename, {}).get('strings', {}).get(string_key)
+        if string_data is None:
+            continue
+        en_value = enforce.english_value(string_key, string_data)
+        if enforce.normalize_source(en_value) == enforce.normalize_source(entry['en']):
+            current[entry_id] = entry
+    return current
+
+
+def current_task(catalogs, task_data):
+    """
+    A batch's task without the entries whose English source changed since it
+    was planned, or None if none are left.
+
+    The entries that are dropped (duplicates included) aren't covered by the
+    batch anymore, so the scan finds them again with their current English.
+    """
+    translations = current_entries(catalogs, task_data['translations'])
+    if not translations:
+        return None
+    duplicates = {}
+    for entry_id, duplicate_ids in task_data.get('duplicates', {}).items():
+        if entry_id in translations:
+            kept = current_entries(catalogs, {duplicate_id: translations[entry_id] for duplicate_id in duplicate_ids})
+            if kept:
+                duplicates[entry_id] = list(kept)
+
+    task_data = dict(task_data, translations=translations)
+    task_data.pop('duplicates', None)
+    if duplicates:
+        task_data['duplicates'] = duplicates
+    return task_data
+
+
+def resume_job(journal, catalogs, collect=None, fingerprints=None, variants=None):
+    """
+    Apply the results of finished batches from an interrupted job.
+
+    Results are only applied when the English source they were translated
+    from is unchanged, and unfinished batches only translate the entries
+    whose English is unchanged. collect, fingerprints and variants are passed
+    on to apply_entries().
+
+    Returns:
+        List of (name, task_data) for the batches that still need translating
+    """
+    for name in journal.done():
+        task_data = journal.load_payload(name, 'task')
+        duplicates = task_data.get('duplicates')
+        result = expand_duplicates(journal.load_payload(name, 'result'), duplicates)
+        current = current_entries(catalogs, expand_duplicates(task_data['translations'], duplicates))
+        applied = apply_entries(catalogs, {entry_id: result[entry_id] for entry_id in current if entry_id in result},
+                                collect, fingerprints, variants)
+        print(f"  ♻️  Applied {applied} string(s) from finished {name}")
+
+    batches = []
+    for name in journal.unfinished():
+        task_data = journal.load_payload(name, 'task')
+        current = current_task(catalogs, task_data)
+        if current != task_data:
+            stale = len(expand_duplicates(task_data['translations'], task_data.get('duplicates')))
+            if current is not None:
+                stale -= len(expand_duplicates(current['translations'], current.get('duplicates')))
+                journal.save_payload(name, 'task', current)
+            print(f"  ♻️  Dropped {stale} string(s) with changed English from unfinished {name}"
+                  + ("" if current is not None else ", nothing left to translate"))
+        if current is not None:
+            batches.append((name, current))
+    return batches
+
+
+def queue_variants(variants, missing_translations, fingerprints=None):
+    """
+    Queue the strings whose regional variants may need updating before any
+    translation is applied: those found missing or stale by the scan, and
+    those whose English changed (with the English they had before).
+    """
+    for filename, strings in missing_translations.items():
+        for string_key in strings:
+            variants.mark(filename, string_key)
+    if fingerprints is not None:
+        for filename, strings in fingerprints.changed.items():
+            for string_key, hashes in strings.items():
+                variants.mark(filename, string_key, {'en': hashes})
+
+
+def add_regional_variants(variants, catalogs, full=False):
+    print("🌐 Adding regional variants...")
+    updated, kept = variants.apply(catalogs, full)
+    print(f"  🌐 Updated {updated} regional variant(s)"
+          + (f", kept {kept} edited by hand" if kept else ""))
+    return updated, kept
+
+
+def drop_covered(missing_translations, batches):
+    """Remove entries that are already part of resumed batches."""
+    covered = set()
+    for _, task_data in batches:
+        covered.update(expand_duplicates(task_data['translations'], task_data.get('duplicates')))
+    remaining = {}
+    for filename, strings in missing_translations.items():
+        for string_key, data in strings.items():
+            if f"{filename}:{string_key}" not in covered:
+                remaining.setdefault(filename, {})[string_key] = data
+    return remaining
+
+
+def run(args):
+    """Run the pipeline, writing its metrics whether it succeeds or fails."""
+    telemetry = Telemetry(args.model)
+    status = 'error'
+    try:
+        result = run_pipeline(args, telemetry)
+        status = 'success' if result == 0 else 'failed'
+        if result == 0 and telemetry.dropped():
+            # Dropped strings are still missing, so the next run picks them up
+            status = 'incomplete'
+        return result
+    finally:
+        telemetry.write(args.metrics_file, status)
+
+
+def report_failures(failures, journal, written):
+    print("\nFailed batches:")
+    for name in sorted(failures):
+        print(f"  - {name}: {failures[name]}")
+    if journal is not None:
+        print(f"Translation workflow failed after updating {written}. "
+              f"Rerun with --resume to translate only the unfinished batches.")
+    else:
+        print(f"Translation workflow failed after updating {written}.")
+
+
+def report_dropped(telemetry):
+    dropped = telemetry.dropped()
+    if dropped:
+        print(f"⚠️  {dropped} string(s) kept failing and were left untranslated; the next run retries them")
+
+
+def run_pipeline(args, telemetry):
+    languages = [lang.strip() for lang in args.languages.split(',')]
+
+    # A shard only translates its slice and leaves writing the catalogs to
+    # the merge step; everything it applies is collected for its artifact
+    shard = None
+    collected = None
+    if args.shard:
+        shard = parse_shard(args.shard)
+        collected = {}
+        if args.shard_by == 'language':
+            languages = shard_languages(languages, *shard)
+        print(f"🧩 Shard {shard[0]}/{shard[1]} by {args.shard_by}: {', '.join(languages) or 'no languages'}")
+
+    # Backends are created lazily: the Gemini SDK is only loaded when there
+    # is something to translate
+    try:
+        router = create_router(args.backend, args.api_key, args.model, args.routing, args.fallback_model,
+                               args.rpm, args.tpm, prompt_cache=not args.no_prompt_cache)
+        language_variants = load_variants(args.variants) if args.variants else LANGUAGE_VARIANTS
+        glossary = select_glossary(load_glossary(args.glossary), languages) if args.glossary else None
+    except (ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    manifest = None
+    if args.cache_dir and not args.full_scan:
+        manifest = RunManifest(args.cache_dir, languages)
+
+    # A shard's translations only reach the catalogs in the merge step, which
+    # records their sources and adds regional variants
+    fingerprints = None
+    if args.cache_dir:
+        fingerprints = SourceFingerprints(args.cache_dir)
+        fingerprints.adopt(manifest or RunManifest(args.cache_dir, languages))
+    recorded = fingerprints if shard is None else None
+    variants = VariantPropagation(language_variants) if shard is None else None
+
+    print(f"📋 Scanning {args.folder} for missing translations...")
+    with telemetry.stage('load'):
+        catalogs, originals, skipped = load_catalogs(args.folder, manifest, args.include, args.exclude, telemetry)
+    telemetry.count('catalogs_parsed', len(catalogs))
+    telemetry.count('catalogs_skipped', len(skipped))
+    if manifest is not None:
+        telemetry.record_cache('manifest', len(skipped), len(catalogs))
+    if not catalogs and not skipped:
+        print(f"❌ Error: No .xcstrings files found in '{args.folder}'")
+        return 1
+
+    journal = None
+    batches = []
+    if args.job_dir:
+        journal = JobJournal(args.job_dir, {"folder": args.folder, "languages": languages, "model": args.model})
+        if args.resume:
+            print(f"♻️  Resuming job in {args.job_dir}: {journal.summary()}")
+            batches = resume_job(journal, catalogs, collected, recorded, variants)
+        else:
+            journal.reset()
+
+    with telemetry.stage('scan'):
+        missing_translations = find_missing(catalogs, languages, manifest, telemetry, fingerprints)
+        if variants is not None:
+            queue_variants(variants, missing_translations, fingerprints)
+        if shard is not None and args.shard_by == 'key':
+            missing_translations = filter_missing(missing_translations, *shard)
+        missing_translations = drop_covered(missing_translations, batches)
+    missing_count = sum(len(strings) for strings in missing_translations.values())
+    telemetry.count('strings_missing', missing_count)
+    if fingerprints is not None and fingerprints.stale:
+        telemetry.count('translations_stale', fingerprints.stale)
+        print(f"🔁 {fingerprints.stale} translation(s) are out of date because their English source changed")
+    print(f"✅ Parsed {len(catalogs)} catalog(s), skipped {len(skipped)} unchanged, "
+          f"{missing_count} string(s) need translation")
+
+    # Resolve strings we've translated before so only real misses are batched
+    memory = None
+    if args.cache_dir:
+        with telemetry.stage('memory'):
+            memory = TranslationMemory(args.cache_dir, args.model, memory_prompt_version(glossary),
+                                       max_bytes=args.cache_max_mb * 1024 * 1024)
+            missing_translations, resolved = enforce.resolve_from_memory(missing_translations, memory)
+            apply_entries(catalogs, resolved, collected, recorded, variants)
+        memory.print_stats()
+        telemetry.record_cache('translation_memory', memory.hits, memory.misses)
+        telemetry.count('strings_from_memory', len(resolved))
+
+    if missing_translations:
+        with telemetry.stage('plan'):
+            llm_schemas = enforce.create_llm_schemas(missing_translations, languages, max_tokens=args.max_tokens,
+                                                     max_output_tokens=args.max_output_tokens, tokenizer=args.tokenizer,
+                                                     route=router.choose if router.rules else None,
+                                                     group=router.group if router.rules else None, glossary=glossary)
+        telemetry.count('batches_planned', len(llm_schemas))
+        telemetry.count('estimated_input_tokens', sum(schema['estimated_tokens']['input'] for schema in llm_schemas))
+        telemetry.count('estimated_output_tokens', sum(schema['estimated_tokens']['output'] for schema in llm_schemas))
+        print(f"📦 Planned {len(llm_schemas)} batch(es)")
+        for line in describe_routing(router):
+            print(line)
+        enforce.print_dedup_savings(llm_schemas)
+        first = len(journal.batches) + 1 if journal is not None else 1
+        for i, schema in enumerate(llm_schemas, first):
+            batches.append((f"batch_{i:04d}", schema))
+            if journal is not None:
+                journal.add_batch(f"batch_{i:04d}", schema)
+
+    failures = {}
+    if batches:
+        try:
+            router.backend(args.model)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+
+        print(f"🤖 Translating {len(batches)} batch(es) with Gemini AI...")
+
+        # With --stream, entries are applied from the workers as soon as
+        # each one arrives; otherwise whole batches are applied as they finish
+        apply_lock = threading.Lock()
+        duplicates = {name: task_data.get('duplicates') for name, task_data in batches}
+
+        def apply_streamed(name, entry_id, entry):
+            with apply_lock:
+                apply_entries(catalogs, expand_duplicates({entry_id: entry}, duplicates[name]), collected, recorded, variants)
+
+        def apply_result(name, task_data, translated_data):
+            telemetry.count('strings_translated', len(expand_duplicates(translated_data, duplicates[name])))
+            if memory is not None:
+                remember_translations(memory, task_data, translated_data)
+            if not args.stream:
+                apply_entries(catalogs, expand_duplicates(translated_data, duplicates[name]), collected, recorded, variants)
+            print(f"  📝 Applied {len(translated_data)} string(s) from {name}")
+            return translated_data
+
+        try:
+            with telemetry.stage('translate'):
+                failures = translate_batches(router, batches, args.concurrency, apply_result, journal,
+                                             stream=args.stream, on_entry=apply_streamed if args.stream else None,
+                                             telemetry=telemetry)
+        finally:
+            # The router isn't used after this; registered prompt prefixes are billed while they exist
+            router.release_prefix_caches()
+
+    if memory is not None:
+        memory.close()
+
+    if shard is not None:
+        # Whatever completed goes into the artifact, even when some batches failed
+        with telemetry.stage('write'):
+            write_artifact(args.shard_output, *shard, args.shard_by, languages, collected)
+        if failures:
+            report_failures(failures, journal, f"the artifact with {len(collected)} string(s)")
+            return 1
+        if journal is not None:
+            journal.reset()
+        print(f"✅ Done: shard {shard[0]}/{shard[1]} translated {len(collected)} string(s)")
+        report_dropped(telemetry)
+        return 0
+
+    # Whatever completed is merged and written, even when some batches failed.
+    # Without a previous run's manifest every string is checked for missing
+    # variants, otherwise only the strings this run changed
+    with telemetry.stage('variants'):
+        updated, kept = add_regional_variants(variants, catalogs, full=manifest is None or not manifest.catalogs)
+    telemetry.count('variants_updated', updated)
+    telemetry.count('variants_kept', kept)
+
+    with telemetry.stage('write'):
+        written = write_changed_catalogs(args.folder, catalogs, originals)
+    telemetry.count('catalogs_written', len(written))
+
+    if fingerprints is not None:
+        # Saved even when batches failed: it only holds translations that were written
+        fingerprints.prune(existing_catalogs(args.folder, fingerprints.catalogs))
+        fingerprints.save()
+
+    if failures:
+        report_failures(failures, journal, f"{len(written)} catalog(s)")
+        return 1
+
+    if args.cache_dir:
+        with telemetry.stage('manifest'):
+            save_manifest(args.folder, args.cache_dir, languages, manifest, catalogs, originals, fingerprints)
+
+    if journal is not None:
+        # The job is complete, nothing left to resume
+        journal.reset()
+
+    print(f"✅ Done: {len(written)} catalog(s) updated")
+    report_dropped(telemetry)
+    return 0
+
+
+def merge(args):
+    """Apply shard artifacts to the catalogs in one pass, then add regional variants and write."""
+    languages = [lang.strip() for lang in args.languages.split(',')]
+
+    print(f"📋 Loading catalogs from {args.folder}...")
+    catalogs, originals, _ = load_catalogs(args.folder, include=args.include, exclude=args.exclude)
+    if not catalogs:
+        print(f"❌ Error: No .xcstrings files found in '{args.folder}'")
+        return 1
+
+    try:
+        variants = VariantPropagation(load_variants(args.variants) if args.variants else LANGUAGE_VARIANTS)
+    except (ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    # With a cache, only the strings the shards translated or whose English
+    # changed get their variants updated
+    fingerprints = None
+    if args.cache_dir:
+        fingerprints = SourceFingerprints(args.cache_dir)
+        fingerprints.adopt(RunManifest(args.cache_dir, languages))
+        queue_variants(variants, find_missing(catalogs, languages, fingerprints=fingerprints), fingerprints)
+
+    shards = {}
+    for path in args.artifacts:
+        try:
+            artifact = load_artifact(path)
+        except (ValueError, OSError) as e:
+            print(f"❌ Error: {e}")
+            return 1
+        index, count = parse_shard(artifact['shard'])
+        shards.setdefault(count, set()).add(index)
+
+        # Strings whose English source changed since the shard ran are left for the next run
+        entries = artifact['entries']
+        current = current_entries(catalogs, entries)
+        applied = apply_entries(catalogs, current, fingerprints=fingerprints, variants=variants)
+        stale = len(entries) - len(current)
+        print(f"  🧩 Applied {applied} string(s) from shard {artifact['shard']} ({path})"
+              + (f", skipped {stale} stale" if stale else ""))
+
+    for count, indices in sorted(shards.items()):
+        missing = sorted(set(range(1, count + 1)) - indices)
+        if missing:
+            print(f"  ⚠️  No artifact for shard(s) {', '.join(f'{i}/{count}' for i in missing)}")
+
+    add_regional_variants(variants, catalogs, full=fingerprints is None)
+
+    written = write_changed_catalogs(args.folder, catalogs, originals)
+    if args.cache_dir:
+        save_manifest(args.folder, args.cache_dir, languages, None, catalogs, originals, fingerprints)
+        fingerprints.prune(existing_catalogs(args.folder, fingerprints.catalogs))
+        fingerprints.save()
+
+    print(f"✅ Done: {len(written)} catalog(s) updated")
+    return 0
+
+
+def print_coverage(report, show_files=True):
+    print("🌐 Coverage by language:")
+    for lang, summary in report['languages'].items():
+        review = f", {summary['needs_review']} need review" if summary['needs_review'] else ""
+        print(f"  {lang:<8} {summary['percent']:6.2f}%  ({summary['missing']} missing{review})")
+    if show_files:
+        print("📄 Coverage by catalog:")
+        for filename, summary in report['files'].items():
+            print(f"  {summary['percent']:6.2f}%  {filename} ({summary['strings']} strings)")
+    overall = report['overall']
+    print(f"📊 Overall: {overall['percent']:.2f}% of {overall['cells']} string/language pairs translated")
+
+
+def coverage(args):
+    """Report translation coverage from the (incrementally refreshed) coverage index."""
+    languages = [lang.strip() for lang in args.languages.split(',')]
+    index = CoverageIndex(languages, args.cache_dir)
+    start = time.perf_counter()
+    parsed = index.refresh(args.folder, args.include, args.exclude, args.workers)
+    if args.cache_dir and parsed:
+        index.save()
+    if not index.files:
+        print(f"❌ Error: No .xcstrings files found in '{args.folder}'")
+        return 1
+
+    report = index.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_coverage(report, show_files=not args.languages_only)
+        print(f"⏱️  {time.perf_counter() - start:.3f}s, {parsed} of {len(index.files)} catalog(s) parsed")
+
+    if args.min_coverage is not None:
+        below = [lang for lang, summary in report['languages'].items() if summary['percent'] < args.min_coverage]
+        if below:
+            print(f"❌ Coverage below {args.min_coverage}% for: {', '.join(below)}")
+            return 1
+    return 0
+
+
+def plan(args):
+    """
+    Scan and batch like run() would, without calling the API, and predict the
+    run's tokens, wall time and cost.
+
+    Nothing is written: the run manifest, source fingerprints and translation
+    memory in --cache-dir are only read.
+    """
+    languages = [lang.strip() for lang in args.languages.split(',')]
+    shard = parse_shard(args.shard) if args.shard else None
+    if shard is not None and args.shard_by == 'language':
+        languages = shard_languages(languages, *shard)
+
+    try:
+        # Only used to route batches; no backend is created
+        router = create_router('gemini', None, args.model, args.routing)
+        glossary = select_glossary(load_glossary(args.glossary), languages) if args.glossary else None
+    except (ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    manifest = None
+    if args.cache_dir and not args.full_scan:
+        manifest = RunManifest(args.cache_dir, languages)
+    fingerprints = None
+    if args.cache_dir:
+        fingerprints = SourceFingerprints(args.cache_dir)
+        fingerprints.adopt(manifest or RunManifest(args.cache_dir, languages))
+
+    catalogs, _, skipped = load_catalogs(args.folder, manifest, args.include, args.exclude)
+    if not catalogs and not skipped:
+        print(f"❌ Error: No .xcstrings files found in '{args.folder}'")
+        return 1
+    missing_translations = find_missing(catalogs, languages, manifest, fingerprints=fingerprints)
+    if shard is not None and args.shard_by == 'key':
+        missing_translations = filter_missing(missing_translations, *shard)
+
+    resolved = {}
+    if args.cache_dir and os.path.exists(os.path.join(args.cache_dir, DATABASE_NAME)):
+        memory = TranslationMemory(args.cache_dir, args.model, memory_prompt_version(glossary))
+        missing_translations, resolved = enforce.resolve_from_memory(missing_translations, memory)
+        memory.close(persist=False)
+
+    llm_schemas = enforce.create_llm_schemas(missing_translations, languages, max_tokens=args.max_tokens,
+                                             max_output_tokens=args.max_output_tokens, tokenizer=args.tokenizer,
+                                             route=router.choose if router.rules else None,
+                                             group=router.group if router.rules else None, glossary=glossary)
+
+    metrics = args.metrics
+    if metrics is None and args.cache_dir:
+        metrics = [os.path.join(args.cache_dir, METRICS_NAME)]
+    report = plan_report(missing_translations, llm_schemas, load_calibration(metrics or []), args.model,
+                         args.concurrency, args.rpm, args.tpm, from_memory=len(resolved))
+    report['catalogs_skipped'] = len(skipped)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"📋 Parsed {len(catalogs)} catalog(s), skipped {len(skipped)} unchanged")
+        print_plan(report, show_files=not args.languages_only)
+    return 0
+
+
+def watch_cycle(args, watcher, filenames, router, language_variants, memory=None, fingerprints=None, pending=None,
+                glossary=None, failed=None):
+    """
+    Translate the strings added or changed in some catalogs and write them back in place.
+
+    Only keys that are new or changed since the watcher last read a catalog
+    are looked at. When a catalog is saved again while its strings are being
+    translated it isn't written; its translations are kept in pending and
+    applied on the next cycle instead. Likewise the "filename:key" ids of
+    strings that weren't translated are kept in failed and tried again on the
+    next cycle. A catalog that can't be read is skipped until it changes again.
+
+    Returns:
+        Number of strings translated
+    """
+    languages = [lang.strip() for lang in args.languages.split(',')]
+    pending = pending if pending is not None else {}
+    failed = failed if failed is not None else set()
+    variants = VariantPropagation(language_variants)
+    catalogs = {}
+    missing_translations = {}
+
+    # Strings of catalogs that were deleted meanwhile aren't retried
+    retried = {}
+    for entry_id in list(failed):
+        filename, string_key = entry_id.split(':', 1)
+        if filename in watcher.catalogs:
+            retried.setdefault(filename, set()).add(string_key)
+        else:
+            failed.discard(entry_id)
+
+    for filename in sorted(set(filenames) | set(retried)):
+        try:
+            previous = watcher.reload(filename)
+        except (ValueError, OSError) as e:
+            print(f"⚠️  Could not read {filename}, retrying when it changes: {e}")
+            continue
+        retry_keys = retried.get(filename, set())
+        failed.difference_update(f"{filename}:{string_key}" for string_key in retry_keys)
+        data = watcher.catalogs[filename]
+        catalogs[filename] = data
+        apply_entries(catalogs, current_entries(catalogs, pending.pop(filename, {})), fingerprints=fingerprints,
+                      variants=variants)
+
+        previous_strings = previous.get('strings', {}) if previous is not None else {}
+
+        def is_known_complete(key, string_data):
+            return key not in retry_keys and previous_strings.get(key) == string_data
+
+        stale_languages = fingerprints.stale_languages(filename) if fingerprints is not None else None
+        missing = enforce.scan_catalog(data, languages, is_known_complete, stale_languages)
+        if missing:
+            missing_translations[filename] = missing
+            print(f"🆕 {len(missing)} new or changed string(s) in {filename}")
+    queue_variants(variants, missing_translations, fingerprints)
+
+    translated = {}
+    if memory is not None:
+        missing_translations, resolved = enforce.resolve_from_memory(missing_translations, memory)
+        apply_entries(catalogs, resolved, fingerprints=fingerprints, variants=variants)
+        translated.update(resolved)
+
+    if missing_translations:
+        start = time.perf_counter()
+        schemas = enforce.create_llm_schemas(missing_translations, languages, max_tokens=args.max_tokens,
+                                             max_output_tokens=args.max_output_tokens, tokenizer=args.tokenizer,
+                                             route=router.choose if router.rules else None,
+                                             group=router.group if router.rules else None, glossary=glossary)
+        batches = [(f"watch_{i:04d}", schema) for i, schema in enumerate(schemas, 1)]
+
+        def apply_result(name, task_data, translated_data):
+            expanded = expand_duplicates(translated_data, task_data.get('duplicates'))
+            if memory is not None:
+                remember_translations(memory, task_data, translated_data)
+            apply_entries(catalogs, expanded, fingerprints=fingerprints, variants=variants)
+            translated.update(expanded)
+            return translated_data
+
+        failures = translate_batches(router, batches, args.concurrency, apply_result)
+        untranslated = {entry_id for _, schema in batches
+                        for entry_id in expand_duplicates(schema['translations'], schema.get('duplicates'))
+                        if entry_id not in translated}
+        if untranslated:
+            failed.update(untranslated)
+            print(f"⚠️  {len(untranslated)} string(s) weren't translated ({len(failures)} failed batch(es)), "
+                  f"they are tried again on the next change")
+        print(f"⚡ Translated {len(batches)} batch(es) in {time.perf_counter() - start:.1f}s")
+
+    variants.apply(catalogs)
+    for filename in catalogs:
+        if watcher.write(filename):
+            continue
+        print(f"  ↩️  {filename} was saved again meanwhile, its translations are applied on the next change")
+        pending[filename] = {entry_id: entry for entry_id, entry in translated.items()
+                             if entry_id.split(':', 1)[0] == filename}
+
+    if memory is not None:
+        memory.commit()
+    if fingerprints is not None:
+        fingerprints.save()
+    if translated:
+        print(f"✅ Localized {len(translated)} string(s)")
+    return len(translated)
+
+
+def watch(args):
+    """Keep the catalogs parsed and the client warm, translating new strings as they are saved."""
+    try:
+        router = create_router(args.backend, args.api_key, args.model, args.routing, args.fallback_model,
+                               args.rpm, args.tpm, prompt_cache=not args.no_prompt_cache)
+        language_variants = load_variants(args.variants) if args.variants else LANGUAGE_VARIANTS
+        languages = [lang.strip() for lang in args.languages.split(',')]
+        glossary = select_glossary(load_glossary(args.glossary), languages) if args.glossary else None
+        router.backend(args.model)
+    except (ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    memory = None
+    if args.cache_dir:
+        memory = TranslationMemory(args.cache_dir, args.model, memory_prompt_version(glossary),
+                                   max_bytes=args.cache_max_mb * 1024 * 1024)
+    fingerprints = SourceFingerprints(args.cache_dir) if args.cache_dir else None
+    watcher = CatalogWatcher(args.folder, args.include, args.exclude, args.interval, args.debounce)
+    pending = {}
+    failed = set()
+    print(f"👀 Watching {len(watcher.catalogs)} catalog(s) in {args.folder} for new strings (Ctrl-C to stop)")
+
+    try:
+        while True:
+            watch_cycle(args, watcher, watcher.wait_for_changes(), router, language_variants,
+                        memory, fingerprints, pending, glossary, failed)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        # Prompt prefixes stay registered across cycles until the watch stops
+        router.release_prefix_caches()
+        if memory is not None:
+            memory.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM-powered localization for .xcstrings files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Find, translate and apply missing translations in one pass')
+    run_parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
+    run_parser.add_argument('--include', action='append', help='Glob for catalogs to process, repeatable (default: *.xcstrings, searched recursively)')
+    run_parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    run_parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Comma-separated list of language codes')
+    run_parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'), help='Google Gemini API key (default: $GEMINI_API_KEY)')
+    run_parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Gemini model to use (default: {DEFAULT_MODEL})')
+    run_parser.add_argument('--backend', default='gemini', help='Translation backend: gemini, or fake[:key=value,...] for offline testing (default: gemini)')
+    run_parser.add_argument('--variants', help='JSON file mapping base languages to their regional variants, e.g. {"es": ["es-419"]} (default: built-in map)')
+    run_parser.add_argument('--glossary', help='JSON file with project terms and per-language style notes, sent with every batch')
+    run_parser.add_argument('--no-prompt-cache', action='store_true', help="Send the full prompt with every batch instead of caching its shared prefix")
+    run_parser.add_argument('--routing', help='JSON file with rules routing batches to models (e.g. short strings to a cheaper one) and a fallback chain')
+    run_parser.add_argument('--fallback-model', action='append', help='Model to fall back to when a batch keeps failing or is rate limited, repeatable')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='Number of batches to keep in flight (default: 4)')
+    run_parser.add_argument('--rpm', type=int, help='Requests-per-minute budget shared by all workers (default: unlimited)')
+    run_parser.add_argument('--tpm', type=int, help='Input tokens-per-minute budget shared by all workers (default: unlimited)')
+    run_parser.add_argument('--cache-dir', help=f'Directory for the translation memory and run manifest, e.g. {DEFAULT_CACHE_DIR} (disabled when omitted)')
+    run_parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help='Maximum translation memory size in MB; older entries are evicted past it (default: 50)')
+    run_parser.add_argument('--full-scan', action='store_true', help='Ignore the run manifest and scan every catalog')
+    run_parser.add_argument('--job-dir', help='Directory for the per-batch job journal (disabled when omitted)')
+    run_parser.add_argument('--resume', action='store_true', help='Resume the job in --job-dir: reuse finished batches, translate only unfinished ones')
+    run_parser.add_argument('--stream', action='store_true', help='Stream responses and apply each entry as soon as it arrives')
+    run_parser.add_argument('--metrics-file', help='Write run metrics (timings, tokens, estimated cost, cache hit rates) to this JSON file')
+    run_parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_INPUT_TOKENS, help=f'Maximum input tokens per batch (default: {DEFAULT_MAX_INPUT_TOKENS})')
+    run_parser.add_argument('--max-output-tokens', type=int, default=DEFAULT_MAX_OUTPUT_TOKENS, help=f'Maximum expected output tokens per batch (default: {DEFAULT_MAX_OUTPUT_TOKENS})')
+    run_parser.add_argument('--tokenizer', default='heuristic', choices=['heuristic', 'tiktoken'], help='Token counter used for batching (default: heuristic)')
+    run_parser.add_argument('--shard', help='Translate only shard i of N (e.g. 2/4) and write its artifact instead of the catalogs')
+    run_parser.add_argument('--shard-by', default='language', choices=SHARD_MODES, help='Split shards by language or by a hash of the English string (default: language)')
+    run_parser.add_argument('--shard-output', help='Shard artifact path (default: shard-<i>-of-<N>.json)')
+
+    merge_parser = subparsers.add_parser('merge', help='Apply shard artifacts to the catalogs in one pass')
+    merge_parser.add_argument('artifacts', nargs='+', help='Shard artifact files')
+    merge_parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
+    merge_parser.add_argument('--include', action='append', help='Glob for catalogs to process, repeatable (default: *.xcstrings, searched recursively)')
+    merge_parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    merge_parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Comma-separated list of language codes of the whole run (for the run manifest)')
+    merge_parser.add_argument('--variants', help='JSON file mapping base languages to their regional variants (default: built-in map)')
+    merge_parser.add_argument('--cache-dir', help='Directory for the run manifest, updated after merging (disabled when omitted)')
+
+    coverage_parser = subparsers.add_parser('coverage', help='Report translation coverage per language and catalog')
+    coverage_parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
+    coverage_parser.add_argument('--include', action='append', help='Glob for catalogs to process, repeatable (default: *.xcstrings, searched recursively)')
+    coverage_parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    coverage_parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Comma-separated list of language codes')
+    coverage_parser.add_argument('--cache-dir', help=f'Directory for the coverage index, so only changed catalogs are parsed, e.g. {DEFAULT_CACHE_DIR}')
+    coverage_parser.add_argument('--workers', type=int, help='Processes used to parse changed catalogs (default: CPU count)')
+    coverage_parser.add_argument('--min-coverage', type=float, help='Exit with an error if any language is below this percentage')
+    coverage_parser.add_argument('--languages-only', action='store_true', help='Only print the per-language summary')
+    coverage_parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    watch_parser = subparsers.add_parser('watch', help='Translate new strings in place as soon as catalogs are saved')
+    watch_parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
+    watch_parser.add_argument('--include', action='append', help='Glob for catalogs to watch, repeatable (default: *.xcstrings, searched recursively)')
+    watch_parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    watch_parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Comma-separated list of language codes')
+    watch_parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'), help='Google Gemini API key (default: $GEMINI_API_KEY)')
+    watch_parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Gemini model to use (default: {DEFAULT_MODEL})')
+    watch_parser.add_argument('--backend', default='gemini', help='Translation backend: gemini, or fake[:key=value,...] for offline testing (default: gemini)')
+    watch_parser.add_argument('--variants', help='JSON file mapping base languages to their regional variants (default: built-in map)')
+    watch_parser.add_argument('--glossary', help='JSON file with project terms and per-language style notes, sent with every batch')
+    watch_parser.add_argument('--no-prompt-cache', action='store_true', help="Send the full prompt with every batch instead of caching its shared prefix")
+    watch_parser.add_argument('--routing', help='JSON file with rules routing batches to models and a fallback chain')
+    watch_parser.add_argument('--fallback-model', action='append', help='Model to fall back to when a batch keeps failing or is rate limited, repeatable')
+    watch_parser.add_argument('--concurrency', type=int, default=4, help='Number of batches to keep in flight (default: 4)')
+    watch_parser.add_argument('--rpm', type=int, help='Requests-per-minute budget shared by all workers (default: unlimited)')
+    watch_parser.add_argument('--tpm', type=int, help='Input tokens-per-minute budget shared by all workers (default: unlimited)')
+    watch_parser.add_argument('--cache-dir', help=f'Directory for the translation memory and source fingerprints, e.g. {DEFAULT_CACHE_DIR} (disabled when omitted)')
+    watch_parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help='Maximum translation memory size in MB; older entries are evicted past it (default: 50)')
+    watch_parser.add_argument('--max-tokens', type=int, default=WATCH_MAX_INPUT_TOKENS, help=f'Maximum input tokens per batch (default: {WATCH_MAX_INPUT_TOKENS})')
+    watch_parser.add_argument('--max-output-tokens', type=int, default=WATCH_MAX_OUTPUT_TOKENS, help=f'Maximum expected output tokens per batch (default: {WATCH_MAX_OUTPUT_TOKENS})')
+    watch_parser.add_argument('--tokenizer', default='heuristic', choices=['heuristic', 'tiktoken'], help='Token counter used for batching (default: heuristic)')
+    watch_parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help=f'Seconds between checks for changed catalogs (default: {DEFAULT_INTERVAL})')
+    watch_parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, help=f'Seconds a catalog must stay unchanged before its new strings are translated (default: {DEFAULT_DEBOUNCE})')
+
+    plan_parser = subparsers.add_parser('plan', help='Predict batches, tokens, wall time and cost of a run without calling the API')
+    plan_parser.add_argument('--folder', required=True, help='Path to folder containing .xcstrings files')
+    plan_parser.add_argument('--include', action='append', help='Glob for catalogs to process, repeatable (default: *.xcstrings, searched recursively)')
+    plan_parser.add_argument('--exclude', action='append', help='Glob for files or directories to skip, repeatable (default: hidden directories and DerivedData)')
+    plan_parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Comma-separated list of language codes')
+    plan_parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Gemini model the run would use, for pricing and translation memory (default: {DEFAULT_MODEL})')
+    plan_parser.add_argument('--routing', help='JSON file with rules routing batches to models')
+    plan_parser.add_argument('--glossary', help='JSON file with project terms and per-language style notes, sent with every batch')
+    plan_parser.add_argument('--concurrency', type=int, default=4, help='Number of batches the run would keep in flight (default: 4)')
+    plan_parser.add_argument('--rpm', type=int, help='Requests-per-minute budget of the run (default: unlimited)')
+    plan_parser.add_argument('--tpm', type=int, help='Input tokens-per-minute budget of the run (default: unlimited)')
+    plan_parser.add_argument('--cache-dir', help=f'Directory with the translation memory, run manifest and metrics of previous runs, e.g. {DEFAULT_CACHE_DIR} (only read)')
+    plan_parser.add_argument('--full-scan', action='store_true', help='Ignore the run manifest and scan every catalog')
+    plan_parser.add_argument('--metrics', action='append', help=f'Metrics file of a previous run to calibrate predictions with, repeatable (default: {METRICS_NAME} in --cache-dir)')
+    plan_parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_INPUT_TOKENS, help=f'Maximum input tokens per batch (default: {DEFAULT_MAX_INPUT_TOKENS})')
+    plan_parser.add_argument('--max-output-tokens', type=int, default=DEFAULT_MAX_OUTPUT_TOKENS, help=f'Maximum expected output tokens per batch (default: {DEFAULT_MAX_OUTPUT_TOKENS})')
+    plan_parser.add_argument('--tokenizer', default='heuristic', choices=['heuristic', 'tiktoken'], help='Token counter used for batching (default: heuristic)')
+    plan_parser.add_argument('--shard', help='Plan only shard i of N (e.g. 2/4)')
+    plan_parser.add_argument('--shard-by', default='language', choices=SHARD_MODES, help='Split shards by language or by a hash of the English string (default: language)')
+    plan_parser.add_argument('--languages-only', action='store_true', help='Leave out the per-catalog counts')
+    plan_parser.add_argument('--json', action='store_true', help='Print the plan as JSON')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"❌ Error: Folder '{args.folder}' does not exist or is not a directory")
+        sys.exit(1)
+
+    if args.command == 'merge':
+        sys.exit(merge(args))
+
+    if args.command == 'coverage':
+        sys.exit(coverage(args))
+
+    if args.command in ('run', 'plan') and args.shard:
+        try:
+            index, count = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        if args.command == 'run' and not args.shard_output:
+            args.shard_output = f"shard-{index}-of-{count}.json"
+
+    if args.concurrency < 1:
+        print("❌ Error: --concurrency must be at least 1")
+        sys.exit(1)
+
+    if (args.rpm is not None and args.rpm < 1) or (args.tpm is not None and args.tpm < 1):
+        print("❌ Error: --rpm and --tpm must be at least 1")
+        sys.exit(1)
+
+    if args.command == 'watch':
+        sys.exit(watch(args))
+
+    if args.command == 'plan':
+        sys.exit(plan(args))
+
+    if args.resume and not args.job_dir:
+        print("❌ Error: --resume requires --job-dir")
+        sys.exit(1)
+
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
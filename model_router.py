@@ -0,0 +1,247 @@
+"""
+Model routing: which model translates a batch, and what to fall back to.
+
+Routing rules are checked in order and the first one whose conditions all
+hold for a batch picks its model; batches no rule matches go to the default
+model. A rule can require:
+
+    max_chars    the longest English text (any plural form) is at most this long
+    plurals      the batch does (true) or doesn't (false) contain plural strings
+    languages    every missing language is one of these
+    max_entries  the batch has at most this many strings (strings routed by
+                 the rule are packed at most this many to a batch)
+
+When a model keeps failing or stays rate limited, the batch moves on to the
+next model of the fallback chain. The router also registers the prompt
+prefix shared by every batch with each model's context caching, once. A
+routing file is JSON:
+
+    {
+      "rules": [{"model": "gemini-2.5-flash-lite", "max_chars": 40, "plurals": false}],
+      "fallbacks": ["gemini-2.5-flash"]
+    }
+"""
+
+import hashlib
+import json
+import threading
+
+from batch_planner import heuristic_token_count, source_texts
+from rate_limiter import RateLimitedBackend, RateLimiter
+from translation_backends import create_backend
+
+RULE_CONDITIONS = ('max_chars', 'plurals', 'languages', 'max_entries')
+
+
+def load_routing(path):
+    """
+    Read and validate a routing file.
+
+    Returns:
+        (rules, fallbacks) tuple
+
+    Raises:
+        ValueError: The file is not a valid routing file
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Routing file {path} is not valid JSON: {e}") from e
+
+    rules = config.get('rules', [])
+    fallbacks = config.get('fallbacks', [])
+    if not isinstance(rules, list) or not isinstance(fallbacks, list):
+        raise ValueError(f"Routing file {path}: 'rules' and 'fallbacks' must be lists")
+    for rule in rules:
+        if not isinstance(rule, dict) or not rule.get('model'):
+            raise ValueError(f"Routing file {path}: every rule needs a 'model'")
+        unknown = set(rule) - set(RULE_CONDITIONS) - {'model'}
+        if unknown:
+            raise ValueError(f"Routing file {path}: unknown rule condition(s) {', '.join(sorted(unknown))}")
+    return rules, fallbacks
+
+
+def rule_matches(rule, task_data):
+    """Whether a batch meets every condition of a routing rule."""
+    entries = task_data['translations'].values()
+    if 'max_entries' in rule and len(task_data['translations']) > rule['max_entries']:
+        return False
+    if 'plurals' in rule and any(isinstance(entry['en'], dict) for entry in entries) != rule['plurals']:
+        return False
+    if 'max_chars' in rule:
+        longest = max((len(text) for entry in entries for text in source_texts(entry['en'])), default=0)
+        if longest > rule['max_chars']:
+            return False
+    if 'languages' in rule:
+        allowed = set(rule['languages'])
+        if any(lang not in allowed for entry in entries for lang in entry['missing_translations']):
+            return False
+    return True
+
+
+class ModelRouter:
+    """Picks a model per batch and hands out one rate-limited backend per model."""
+
+    def __init__(self, backend_factory, model, rules=(), fallbacks=(), rpm=None, tpm=None, prompt_cache=True):
+        """
+        Args:
+            backend_factory: Called as backend_factory(model) the first time a model is used
+            model: Default model, for batches no rule matches
+            rules: Routing rules, checked in order
+            fallbacks: Models to fall back to, in order
+            rpm, tpm: Rate-limit budgets, per model (Gemini quotas are per model)
+            prompt_cache: Register prompt prefixes with the models' context caching
+        """
+        self.backend_factory = backend_factory
+        self.model = model
+        self.rules = list(rules)
+        self.fallbacks = list(fallbacks)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.prompt_cache = prompt_cache
+        self.backends = {}
+        self.limiters = {}
+        self.prefix_caches = {}
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+
+    def choose(self, task_data):
+        """Model for a batch: the first matching rule's, or the default."""
+        for rule in self.rules:
+            if rule_matches(rule, task_data):
+                return rule['model']
+        return self.model
+
+    def group(self, task_data):
+        """
+        Packing group of a single string, before batches are formed.
+
+        Strings matching the same rule are packed together, and at most that
+        rule's max_entries to a batch, so each batch still matches the rule
+        as a whole.
+
+        Returns:
+            (index of the first matching rule or None, max_entries or None)
+        """
+        for index, rule in enumerate(self.rules):
+            if rule_matches(rule, task_data):
+                return index, rule.get('max_entries')
+        return None, None
+
+    def chain(self, model):
+        """The model followed by the fallbacks (the default model last, if not already in it)."""
+        models = [model]
+        for fallback in self.fallbacks + [self.model]:
+            if fallback not in models:
+                models.append(fallback)
+        return models
+
+    def backend(self, model):
+        with self._lock:
+            if model not in self.backends:
+                limiter = self.limiters.setdefault(model, RateLimiter(self.rpm, self.tpm))
+                self.backends[model] = RateLimitedBackend(self.backend_factory(model), limiter)
+            return self.backends[model]
+
+    def prefix_cache(self, model, prefix):
+        """
+        Handle of a prompt prefix registered with a model's context caching,
+        registered on first use, or None when the prefix is sent with every
+        prompt instead (caching disabled, unsupported or failing, or the
+        prefix is too short to be cached).
+        """
+        key = (model, hashlib.sha256(prefix.encode('utf-8')).hexdigest())
+        with self._cache_lock:
+            if key not in self.prefix_caches:
+                self.prefix_caches[key] = self._register_prefix(model, prefix)
+            return self.prefix_caches[key]
+
+    def _register_prefix(self, model, prefix):
+        backend = self.backend(model)
+        if not self.prompt_cache or not hasattr(backend, 'cache_prefix'):
+            return None
+        tokens = heuristic_token_count(prefix)
+        if tokens < getattr(backend, 'min_cached_tokens', 0):
+            return None
+        try:
+            cache = backend.cache_prefix(prefix)
+        except Exception as e:
+            print(f"  ⚠️  Context caching unavailable for {model}, sending the full prompt: {e}")
+            return None
+        print(f"  🗄️  Cached the prompt prefix (~{tokens} tokens) for {model}")
+        return cache
+
+    def forget_prefix_cache(self, model, prefix):
+        """Drop a registered prefix that was rejected (e.g. it expired), so the next batch registers it again."""
+        key = (model, hashlib.sha256(prefix.encode('utf-8')).hexdigest())
+        with self._cache_lock:
+            self.prefix_caches.pop(key, None)
+
+    def release_prefix_caches(self):
+        """Delete every registered prefix instead of leaving it to expire."""
+        with self._cache_lock:
+            caches = [(model, cache) for (model, _), cache in self.prefix_caches.items() if cache is not None]
+            self.prefix_caches.clear()
+        for model, cache in caches:
+            try:
+                self.backend(model).drop_cache(cache)
+            except Exception as e:
+                print(f"  ⚠️  Could not delete the cached prompt prefix for {model}: {e}")
+
+    def rate_limit_wait(self):
+        """Seconds workers spent waiting on the rate limiters."""
+        return sum(limiter.waited for limiter in self.limiters.values())
+
+
+class ModelChain:
+    """A batch's models in fallback order; falling back is sticky for the rest of the batch."""
+
+    def __init__(self, router, models):
+        self.router = router
+        self.models = models
+        self.position = 0
+
+    @property
+    def model(self):
+        return self.models[self.position]
+
+    @property
+    def backend(self):
+        return self.router.backend(self.model)
+
+    def can_fall_back(self):
+        return self.position + 1 < len(self.models)
+
+    def fall_back(self):
+        """Move on to the next model, returning whether there was one."""
+        if not self.can_fall_back():
+            return False
+        self.position += 1
+        return True
+
+
+def create_router(spec, api_key, model, routing_file=None, fallbacks=None, rpm=None, tpm=None, prompt_cache=True):
+    """
+    Create a ModelRouter for a backend spec (see translation_backends.create_backend).
+
+    Backends are only created when a model is first used; call
+    router.backend(router.model) to check the spec and API key up front.
+
+    Raises:
+        ValueError: Invalid routing file
+    """
+    rules, routed_fallbacks = load_routing(routing_file) if routing_file else ([], [])
+    return ModelRouter(lambda name: create_backend(spec, api_key, name), model, rules,
+                       routed_fallbacks + list(fallbacks or []), rpm, tpm, prompt_cache)
+
+
+def describe_routing(router):
+    """One line per rule and the fallback chain, for logging."""
+    lines = []
+    for rule in router.rules:
+        conditions = ', '.join(f"{name}={rule[name]}" for name in RULE_CONDITIONS if name in rule)
+        lines.append(f"  ↪ {conditions or 'any batch'} -> {rule['model']}")
+    if router.fallbacks:
+        lines.append(f"  ↪ fallbacks: {' -> '.join(router.fallbacks)}")
+    return lines
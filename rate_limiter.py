@@ -0,0 +1,223 @@
+"""
+Client-side rate limiting and retry policy for model requests.
+
+All workers share one RateLimiter: a token bucket for requests per minute and
+one for (input) tokens per minute, refilled continuously, plus a cooldown that
+pauses every worker when the API answers with a rate-limit error, so a 429
+doesn't turn into a burst of retries from the other workers. Token estimates
+are reconciled with the usage the API reports.
+
+Errors are classified as rate limits (429 / quota), server errors (5xx),
+bad requests (other 4xx, not worth retrying) or parse errors (malformed
+responses), and server retry hints (Retry-After, RetryInfo) are honored.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+from batch_planner import heuristic_token_count
+
+RATE_LIMIT = 'rate_limit'
+SERVER_ERROR = 'server_error'
+BAD_REQUEST = 'bad_request'
+PARSE_ERROR = 'parse_error'
+UNKNOWN_ERROR = 'unknown'
+
+MAX_BACKOFF = 60.0
+
+RETRY_IN = re.compile(r'retry (?:in|after) (\d+(?:\.\d+)?)\s*(ms|s)?', re.IGNORECASE)
+RETRY_DELAY_FIELD = re.compile(r"""['"]retryDelay['"]\s*:\s*['"](\d+(?:\.\d+)?)s['"]""")
+STATUS_CODE = re.compile(r'^\s*(\d{3})\b')
+
+
+class MalformedResponse(ValueError):
+    """A response that parsed as JSON but isn't shaped the way the request asked for."""
+
+
+# Seconds of budget a bucket holds: bursts stay small, so a quota enforced over
+# any sliding minute isn't overrun by a full bucket followed by a minute of refill
+BURST_SECONDS = 6
+
+
+class TokenBucket:
+    """Bucket holding up to capacity units, refilled at rate units per second."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * BURST_SECONDS)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount is available (amounts above capacity only need a full bucket)."""
+        needed = min(amount, self.capacity) - self.available
+        return max(0.0, needed / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets shared by all workers."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.rate_limited = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens=0):
+        """Block until a request of about this many tokens fits the budgets, then take it."""
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                delay = self.paused_until - now
+                for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                    if bucket is not None:
+                        bucket.refill(now)
+                        delay = max(delay, bucket.wait_time(amount))
+                if delay <= 0:
+                    break
+                self._condition.wait(delay)
+
+            if self.requests is not None:
+                self.requests.available -= 1
+            if self.tokens is not None:
+                self.tokens.available -= tokens
+            self.waited += time.monotonic() - start
+        return tokens
+
+    def settle(self, estimated, actual):
+        """Correct the token budget once the API reports the request's real usage."""
+        if self.tokens is None or not actual:
+            return
+        with self._condition:
+            self.tokens.available -= actual - estimated
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Hold every worker for seconds, e.g. after a rate-limit response."""
+        with self._condition:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+def error_code(error):
+    """HTTP status code of an API error, from its attributes or its message."""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'status_code', None)
+    if isinstance(value, int):
+        return value
+    match = STATUS_CODE.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def classify_error(error):
+    """
+    Classify an exception from a model request.
+
+    Only malformed responses are parse errors; any other ValueError (e.g. from
+    the SDK validating a request) takes the normal error path.
+    """
+    if isinstance(error, (json.JSONDecodeError, MalformedResponse)):
+        return PARSE_ERROR
+    code = error_code(error)
+    message = str(error)
+    if code == 429 or 'RESOURCE_EXHAUSTED' in message or 'quota' in message.lower():
+        return RATE_LIMIT
+    if code is not None and 500 <= code < 600:
+        return SERVER_ERROR
+    if code is not None and 400 <= code < 500:
+        return BAD_REQUEST
+    return UNKNOWN_ERROR
+
+
+def retry_after(error):
+    """Server-suggested delay in seconds (Retry-After header, RetryInfo or message), if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+    text = str(error)
+    details = getattr(error, 'details', None)
+    if details:
+        text += ' ' + json.dumps(details, default=str)
+
+    match = RETRY_DELAY_FIELD.search(text)
+    if match:
+        return float(match.group(1))
+    match = RETRY_IN.search(text)
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000 if match.group(2) == 'ms' else seconds
+    return None
+
+
+def backoff_delay(attempt, base, cap=MAX_BACKOFF):
+    """Exponential backoff with jitter: between half and all of base * 2**attempt, capped."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RateLimitedBackend:
+    """Backend wrapper that takes every request from a shared RateLimiter."""
+
+    def __init__(self, backend, limiter, count_tokens=heuristic_token_count):
+        self.backend = backend
+        self.limiter = limiter
+        self.count_tokens = count_tokens
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _failed(self, error):
+        if classify_error(error) == RATE_LIMIT:
+            delay = retry_after(error)
+            self.limiter.pause(delay if delay is not None else backoff_delay(0, 1.0))
+
+    def generate(self, prompt, response_schema=None, cache=None):
+        estimate = self.limiter.acquire(self.count_tokens(prompt))
+        try:
+            response = self.backend.generate(prompt, response_schema, cache=cache)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self.limiter.settle(estimate, prompt_tokens(response))
+        return response
+
+    def generate_stream(self, prompt, response_schema=None, cache=None):
+        estimate = self.limiter.acquire(self.count_tokens(prompt))
+        last_chunk = None
+        try:
+            for chunk in self.backend.generate_stream(prompt, response_schema, cache=cache):
+                last_chunk = chunk
+                yield chunk
+        except Exception as e:
+            self._failed(e)
+            raise
+        finally:
+            if last_chunk is not None:
+                self.limiter.settle(estimate, prompt_tokens(last_chunk))
+
+
+def prompt_tokens(response):
+    """Input tokens the API reports for a response (0 when it reports none)."""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'prompt_token_count', 0) or 0
@@ -0,0 +1,131 @@
+"""
+Incremental run manifest for the localization pipeline.
+
+After a successful run we record, per .xcstrings file, its size/mtime and a
+content hash, plus a hash of every string entry, a hash of its English
+source and the languages that were still missing. The next run only parses
+catalogs whose content changed and only scans keys whose entry changed, so a
+run over an unchanged tree does little more than stat the files.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def content_hash(content):
+    """Hash of a catalog's file content (str or bytes)."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def entry_hash(string_data):
+    """Short hash of one string entry, stable across key ordering."""
+    payload = json.dumps(string_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def source_hash(en_value):
+    """Short hash of an English source value (string or plural dict)."""
+    payload = json.dumps(en_value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class RunManifest:
+    """Per-catalog and per-string fingerprints from the last successful run."""
+
+    def __init__(self, cache_dir, languages):
+        self.path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.languages = sorted(languages)
+        self.catalogs = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # A different language set makes every "complete" flag meaningless
+            if data.get('version') == MANIFEST_VERSION and data.get('languages') == self.languages:
+                self.catalogs = data.get('catalogs', {})
+
+    def check_file(self, filename, path):
+        """
+        Check whether a catalog is unchanged and was complete after the last run.
+
+        Returns:
+            Tuple of (skip, content). When skip is False, content holds the file
+            text if it had to be read, so callers don't read it twice.
+        """
+        entry = self.catalogs.get(filename)
+        if entry is None:
+            return False, None
+
+        stat = os.stat(path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['complete'], None
+
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if entry['sha256'] != content_hash(content):
+            return False, content
+
+        # Same content with a new mtime (e.g. a fresh checkout)
+        entry['size'] = stat.st_size
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return entry['complete'], content
+
+    def known_complete(self, filename):
+        """Callable for scan_catalog() telling whether a key is unchanged and complete."""
+        strings = self.catalogs.get(filename, {}).get('strings', {})
+        incomplete = self.catalogs.get(filename, {}).get('incomplete', {})
+
+        def is_known_complete(string_key, string_data):
+            recorded = strings.get(string_key)
+            return (recorded is not None and string_key not in incomplete and
+                    recorded[0] == entry_hash(string_data))
+
+        return is_known_complete
+
+    def record(self, filename, path, content, data, missing, english_value):
+        """
+        Record a catalog's state after a successful run.
+
+        Args:
+            filename: Catalog name as used by the pipeline
+            path: Path of the catalog on disk
+            content: The catalog's current file text
+            data: The parsed catalog
+            missing: {string_key: {"missing_langs": [...]}} still missing after the run
+            english_value: Callable (string_key, string_data) -> English source value
+        """
+        stat = os.stat(path)
+        self.catalogs[filename] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': content_hash(content),
+            'complete': not missing,
+            'strings': {
+                string_key: [entry_hash(string_data), source_hash(english_value(string_key, string_data))]
+                for string_key, string_data in data.get('strings', {}).items()
+            },
+            'incomplete': {string_key: info['missing_langs'] for string_key, info in missing.items()},
+        }
+
+    def prune(self, filenames):
+        """Drop catalogs that no longer exist on disk."""
+        for filename in list(self.catalogs):
+            if filename not in filenames:
+                del self.catalogs[filename]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'languages': self.languages,
+                'catalogs': self.catalogs,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,271 @@
+"""
+Dry-run predictions for a translation run, for the localize.py plan command.
+
+The scan and batching stages run as usual, but nothing is sent to the API.
+For the planned batches the planner predicts token usage, cost and wall
+time at a given concurrency and rate limit, so --max-tokens, --concurrency
+and sharding can be sized before paying for a run.
+
+Predictions are calibrated from the metrics files of previous runs (see
+telemetry.py) when there are any:
+
+    input/output ratio   tokens the API reported / tokens the planner estimated,
+                         which also covers retries, splits and follow-ups
+    batch latency        seconds = base + per_token * output tokens, fitted
+                         to the finished batches
+
+Without metrics the estimates are used as they are, with a typical latency.
+Wall time is simulated like translate_batches() runs: every batch starts on
+the next free worker once the requests- and tokens-per-minute budgets of its
+model allow it.
+"""
+
+import heapq
+import json
+
+from rate_limiter import TokenBucket
+from telemetry import METRICS_VERSION, estimate_cost
+
+METRICS_NAME = 'metrics.json'
+
+# Latency of a batch without calibration: time to first token, then output speed
+DEFAULT_BASE_SECONDS = 2.0
+DEFAULT_SECONDS_PER_OUTPUT_TOKEN = 0.01
+
+# Concurrency levels the wall time is also predicted for
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16, 32)
+
+
+def default_calibration():
+    return {
+        "runs": 0,
+        "batches": 0,
+        "input_ratio": 1.0,
+        "output_ratio": 1.0,
+        "base_seconds": DEFAULT_BASE_SECONDS,
+        "seconds_per_output_token": DEFAULT_SECONDS_PER_OUTPUT_TOKEN,
+    }
+
+
+def fit_latency(samples):
+    """
+    Least-squares fit of seconds = base + per_token * output tokens.
+
+    Args:
+        samples: (output tokens, seconds) of finished batches
+
+    Returns:
+        (base, per_token), or None without enough samples
+    """
+    if not samples:
+        return None
+    count = len(samples)
+    mean_tokens = sum(tokens for tokens, _ in samples) / count
+    mean_seconds = sum(seconds for _, seconds in samples) / count
+    variance = sum((tokens - mean_tokens) ** 2 for tokens, _ in samples)
+    if variance > 0:
+        per_token = sum((tokens - mean_tokens) * (seconds - mean_seconds) for tokens, seconds in samples) / variance
+        base = mean_seconds - per_token * mean_tokens
+        if per_token >= 0 and base >= 0:
+            return base, per_token
+    # Batches of one size (or a fit that makes no sense): proportional to output
+    if mean_tokens > 0:
+        return 0.0, mean_seconds / mean_tokens
+    return mean_seconds, 0.0
+
+
+def load_calibration(paths):
+    """
+    Calibrate predictions from the metrics files of previous runs.
+
+    Token ratios come from successful runs that recorded their planned
+    estimates; latencies from every finished batch. Files that are missing
+    or aren't metrics files are skipped.
+    """
+    calibration = default_calibration()
+    estimated_input = estimated_output = actual_input = actual_output = 0
+    samples = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if not isinstance(report, dict) or report.get('version') != METRICS_VERSION:
+            continue
+
+        calibration['runs'] += 1
+        batches = report.get('batches', {}).values()
+        counters = report.get('counters', {})
+        if report.get('status') == 'success' and counters.get('estimated_input_tokens'):
+            estimated_input += counters['estimated_input_tokens']
+            estimated_output += counters.get('estimated_output_tokens', 0)
+            actual_input += sum(batch.get('prompt_tokens', 0) for batch in batches)
+            actual_output += sum(batch.get('output_tokens', 0) for batch in batches)
+        samples += [(batch.get('output_tokens', 0), batch['seconds']) for batch in batches
+                    if batch.get('status') == 'done' and batch.get('seconds')]
+
+    if estimated_input and actual_input:
+        calibration['input_ratio'] = actual_input / estimated_input
+    if estimated_output and actual_output:
+        calibration['output_ratio'] = actual_output / estimated_output
+    fit = fit_latency(samples)
+    if fit is not None:
+        calibration['batches'] = len(samples)
+        calibration['base_seconds'], calibration['seconds_per_output_token'] = fit
+    return calibration
+
+
+def predict_batch(schema, calibration):
+    """Predicted (input tokens, output tokens, seconds) of a planned batch."""
+    input_tokens = round(schema['estimated_tokens']['input'] * calibration['input_ratio'])
+    output_tokens = round(schema['estimated_tokens']['output'] * calibration['output_ratio'])
+    seconds = calibration['base_seconds'] + output_tokens * calibration['seconds_per_output_token']
+    return input_tokens, output_tokens, seconds
+
+
+def simulate_wall_time(batches, concurrency, rpm=None, tpm=None):
+    """
+    Seconds to translate batches with this many workers and per-model budgets.
+
+    Args:
+        batches: (model, input tokens, seconds) per batch, in submission order
+    """
+    workers = [0.0] * concurrency
+    buckets = {}
+    last_start = 0.0
+    finished = 0.0
+    for model, input_tokens, seconds in batches:
+        # Batches start in order, each on the next free worker
+        start = max(heapq.heappop(workers), last_start)
+        if model not in buckets:
+            buckets[model] = (TokenBucket(rpm) if rpm else None, TokenBucket(tpm) if tpm else None)
+            for bucket in buckets[model]:
+                if bucket is not None:
+                    bucket.updated = 0.0
+        needs = [(bucket, amount) for bucket, amount in zip(buckets[model], (1, input_tokens)) if bucket is not None]
+        for bucket, amount in needs:
+            bucket.refill(start)
+            start += bucket.wait_time(amount)
+        for bucket, amount in needs:
+            bucket.refill(start)
+            bucket.available -= amount
+
+        last_start = start
+        finished = max(finished, start + seconds)
+        heapq.heappush(workers, start + seconds)
+    return finished
+
+
+def plan_report(missing_translations, llm_schemas, calibration, default_model, concurrency, rpm=None, tpm=None,
+                from_memory=0):
+    """
+    Entry counts, batches, and predicted tokens, wall time and cost of a run.
+
+    Args:
+        missing_translations: What needs translating, shaped like check_translations() output
+        llm_schemas: Batches planned for it by create_llm_schemas()
+        calibration: See load_calibration()
+        default_model: Model of batches that aren't routed to another one
+        from_memory: Strings resolved from translation memory instead
+    """
+    languages = {}
+    catalogs = {}
+    for filename, strings in missing_translations.items():
+        catalog = catalogs.setdefault(filename, {"strings": 0, "translations": 0})
+        for data in strings.values():
+            catalog['strings'] += 1
+            catalog['translations'] += len(data['missing_langs'])
+            for lang in data['missing_langs']:
+                languages[lang] = languages.get(lang, 0) + 1
+
+    models = {}
+    predicted = []
+    for schema in llm_schemas:
+        model = schema.get('model') or default_model
+        input_tokens, output_tokens, seconds = predict_batch(schema, calibration)
+        predicted.append((model, input_tokens, seconds))
+        usage = models.setdefault(model, {"batches": 0, "input_tokens": 0, "output_tokens": 0})
+        usage['batches'] += 1
+        usage['input_tokens'] += input_tokens
+        usage['output_tokens'] += output_tokens
+    for model, usage in models.items():
+        usage['estimated_cost_usd'] = estimate_cost(model, usage['input_tokens'], usage['output_tokens'])
+    costs = [usage['estimated_cost_usd'] for usage in models.values()]
+
+    wall_seconds = simulate_wall_time(predicted, concurrency, rpm, tpm)
+    unlimited_seconds = simulate_wall_time(predicted, concurrency)
+    return {
+        "strings": sum(catalog['strings'] for catalog in catalogs.values()),
+        "translations": sum(languages.values()),
+        "from_memory": from_memory,
+        "languages": dict(sorted(languages.items())),
+        "catalogs": dict(sorted(catalogs.items())),
+        "batches": len(llm_schemas),
+        "deduplicated": sum(len(ids) for schema in llm_schemas for ids in schema.get('duplicates', {}).values()),
+        "tokens": {
+            "estimated_input": sum(schema['estimated_tokens']['input'] for schema in llm_schemas),
+            "estimated_output": sum(schema['estimated_tokens']['output'] for schema in llm_schemas),
+            "predicted_input": sum(usage['input_tokens'] for usage in models.values()),
+            "predicted_output": sum(usage['output_tokens'] for usage in models.values()),
+            "largest_batch_input": max((schema['estimated_tokens']['input'] for schema in llm_schemas), default=0),
+            "largest_batch_output": max((schema['estimated_tokens']['output'] for schema in llm_schemas), default=0),
+        },
+        "models": models,
+        "estimated_cost_usd": None if None in costs else sum(costs),
+        "concurrency": concurrency,
+        "rpm": rpm,
+        "tpm": tpm,
+        "wall_seconds": wall_seconds,
+        # More than a few percent above the unlimited time: the budgets, not the workers, set the pace
+        "rate_limited": wall_seconds > unlimited_seconds * 1.05,
+        "wall_seconds_by_concurrency": {
+            level: simulate_wall_time(predicted, level, rpm, tpm) for level in CONCURRENCY_LEVELS
+        },
+        "calibration": calibration,
+    }
+
+
+def format_duration(seconds):
+    if seconds < 10:
+        return f"{seconds:.1f}s"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}m {seconds % 60:02.0f}s"
+    return f"{seconds // 3600:.0f}h {seconds % 3600 // 60:02.0f}m"
+
+
+def print_plan(report, show_files=True):
+    tokens = report['tokens']
+    calibration = report['calibration']
+    print(f"🧮 {report['strings']} string(s) need {report['translations']} translation(s)"
+          + (f", {report['from_memory']} more come from translation memory" if report['from_memory'] else ""))
+    for lang, count in report['languages'].items():
+        print(f"  {lang}: {count}")
+    if show_files:
+        for filename, catalog in report['catalogs'].items():
+            print(f"  📄 {filename}: {catalog['strings']} string(s), {catalog['translations']} translation(s)")
+
+    print(f"📦 {report['batches']} batch(es)"
+          + (f", {report['deduplicated']} repeated string(s) deduplicated" if report['deduplicated'] else "")
+          + f"; largest ~{tokens['largest_batch_input']} input / ~{tokens['largest_batch_output']} output tokens")
+    for model, usage in sorted(report['models'].items()):
+        print(f"  {model}: {usage['batches']} batch(es)")
+    print(f"🔢 Tokens: ~{tokens['predicted_input']} input / ~{tokens['predicted_output']} output "
+          f"(planner estimate {tokens['estimated_input']} / {tokens['estimated_output']})")
+    cost = report['estimated_cost_usd']
+    print(f"💵 Estimated cost: {f'${cost:.4f}' if cost is not None else 'unknown model pricing'}")
+
+    limits = ', '.join(f"{value} {name}" for name, value in (('rpm', report['rpm']), ('tpm', report['tpm'])) if value)
+    print(f"⏱️  Wall time: ~{format_duration(report['wall_seconds'])} at concurrency {report['concurrency']}"
+          + (f" and {limits}" if limits else "")
+          + (" (limited by the rate limits)" if report['rate_limited'] else ""))
+    print("  " + ", ".join(f"{level}: {format_duration(seconds)}"
+                           for level, seconds in report['wall_seconds_by_concurrency'].items()))
+    if calibration['runs']:
+        print(f"📈 Calibrated from {calibration['runs']} previous run(s), {calibration['batches']} batch(es): "
+              f"tokens x{calibration['input_ratio']:.2f} input / x{calibration['output_ratio']:.2f} output, "
+              f"{calibration['base_seconds']:.1f}s + {calibration['seconds_per_output_token'] * 1000:.1f}ms per output token")
+    else:
+        print("📈 No metrics from previous runs, using default latencies (pass --metrics to calibrate)")
@@ -0,0 +1,97 @@
+"""
+Sharding a localization run across several jobs (e.g. a CI matrix).
+
+Shard i of N translates only its slice of the work, either a subset of the
+languages or the strings whose English source hashes to it (identical
+strings always land in the same shard, so deduplication still works), and
+writes the translations to a compact artifact instead of the catalogs. A
+merge step applies every shard's artifact to the catalogs in one pass.
+
+An artifact is JSON:
+
+    {"version": 1, "shard": "2/4", "by": "language", "languages": [...],
+     "entries": {"Catalog.xcstrings:key": {"en": ..., "missing_translations": {lang: value}}}}
+"""
+
+import hashlib
+import json
+import os
+
+SHARD_VERSION = 1
+SHARD_MODES = ('language', 'key')
+
+
+def parse_shard(text):
+    """
+    Parse a shard spec "i/N" (1-based).
+
+    Returns:
+        (index, count) tuple
+
+    Raises:
+        ValueError: The spec is malformed or out of range
+    """
+    index, separator, count = text.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Shard '{text}' must look like i/N, e.g. 2/4") from None
+    if not separator or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard '{text}' must look like i/N with 1 <= i <= N")
+    return index, count
+
+
+def shard_languages(languages, index, count):
+    """The languages shard index of count translates (round-robin over the list)."""
+    return [lang for position, lang in enumerate(languages) if position % count == index - 1]
+
+
+def key_shard(en_value, count):
+    """Shard (1-based) a string belongs to, from a stable hash of its English source."""
+    payload = json.dumps(en_value, sort_keys=True, ensure_ascii=False)
+    return int(hashlib.sha1(payload.encode('utf-8')).hexdigest()[:8], 16) % count + 1
+
+
+def filter_missing(missing_translations, index, count):
+    """Keep the missing strings (check_translations() shape) that belong to a shard."""
+    kept = {}
+    for filename, strings in missing_translations.items():
+        for string_key, data in strings.items():
+            if key_shard(data['en'], count) == index:
+                kept.setdefault(filename, {})[string_key] = data
+    return kept
+
+
+def write_artifact(path, index, count, by, languages, entries):
+    """Write a shard's translations as a compact artifact."""
+    artifact = {
+        "version": SHARD_VERSION,
+        "shard": f"{index}/{count}",
+        "by": by,
+        "languages": languages,
+        "entries": {
+            entry_id: {"en": entry['en'], "missing_translations": entry['missing_translations']}
+            for entry_id, entry in sorted(entries.items())
+        },
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"📦 Wrote {len(entries)} translated string(s) of shard {index}/{count} to {path}")
+
+
+def load_artifact(path):
+    """
+    Read a shard artifact.
+
+    Raises:
+        ValueError: The file is not a shard artifact this version understands
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            artifact = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not valid JSON: {e}") from e
+    if not isinstance(artifact, dict) or artifact.get('version') != SHARD_VERSION:
+        raise ValueError(f"{path} is not a version {SHARD_VERSION} shard artifact")
+    return artifact
@@ -0,0 +1,120 @@
+"""
+Fingerprints of the English source every translation was produced from.
+
+When the English text of an existing key changes, its translations are
+stale even though they aren't empty or flagged needs_review. Every applied
+translation records a fingerprint of the English it was translated from, so
+later runs queue exactly the (key, language) pairs whose source changed.
+
+The index lives in the cache directory as JSON, per catalog and key:
+
+    "fingerprint"                          every language was translated from it
+    {"*": "fingerprint", "de": "other"}    per language, "*" for the rest
+
+Keys seen for the first time (e.g. translated before the index existed) are
+adopted with their current source, so introducing it doesn't retranslate
+anything. Keys the run manifest already knows are adopted with the source it
+recorded instead, since the manifest skips them until they change.
+"""
+
+import json
+import os
+
+from run_manifest import source_hash
+
+FINGERPRINTS_NAME = 'sources.json'
+FINGERPRINTS_VERSION = 1
+
+
+def recorded_source(record, lang):
+    """Fingerprint a language's translation was produced from, or None if unknown."""
+    if record is None or isinstance(record, str):
+        return record
+    return record.get(lang, record.get('*'))
+
+
+class SourceFingerprints:
+    """Per (catalog, key, language) fingerprints of the English source."""
+
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, FINGERPRINTS_NAME)
+        self.catalogs = {}
+        self.stale = 0
+        # {catalog: {key: fingerprints of its previous English}} for keys whose source changed
+        self.changed = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FINGERPRINTS_VERSION:
+                self.catalogs = data.get('catalogs', {})
+
+    def adopt(self, manifest):
+        """
+        Record the English source of the last successful run for keys without a fingerprint.
+
+        The manifest skips unchanged, complete keys, so without this a key
+        would first be seen after its English changed and the new source
+        would be taken as the one its translations were made from.
+        """
+        for filename, entry in manifest.catalogs.items():
+            records = self.catalogs.setdefault(filename, {})
+            for string_key, (_, recorded_source_hash) in entry.get('strings', {}).items():
+                records.setdefault(string_key, recorded_source_hash)
+
+    def stale_languages(self, filename):
+        """
+        Callable for scan_catalog() returning the translated languages of a key
+        whose English source changed since they were translated.
+
+        Called as stale_languages(string_key, en_value, translated_langs).
+        """
+        records = self.catalogs.setdefault(filename, {})
+
+        def stale_languages(string_key, en_value, translated_langs):
+            current = source_hash(en_value)
+            record = records.get(string_key)
+            if record is None:
+                records[string_key] = current
+                return []
+            if record == current:
+                return []
+
+            self.changed.setdefault(filename, {})[string_key] = \
+                {record} if isinstance(record, str) else set(record.values()) - {current}
+            stale = [lang for lang in translated_langs if recorded_source(record, lang) not in (None, current)]
+            if not stale and isinstance(record, dict) and all(record.get(lang) == current for lang in translated_langs):
+                # Every translation has been redone, so the old source can be forgotten
+                records[string_key] = current
+            self.stale += len(stale)
+            return stale
+
+        return stale_languages
+
+    def record(self, filename, string_key, en_value, languages):
+        """Record that languages of a key were just translated from en_value."""
+        records = self.catalogs.setdefault(filename, {})
+        current = source_hash(en_value)
+        record = records.get(string_key)
+        if record is None or record == current:
+            records[string_key] = current
+            return
+
+        record = {'*': record} if isinstance(record, str) else dict(record)
+        for lang in languages:
+            record[lang] = current
+        records[string_key] = current if set(record.values()) == {current} else record
+
+    def prune(self, filenames):
+        """Drop catalogs that no longer exist on disk."""
+        for filename in list(self.catalogs):
+            if filename not in filenames:
+                del self.catalogs[filename]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': FINGERPRINTS_VERSION, 'catalogs': self.catalogs},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
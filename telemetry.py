@@ -0,0 +1,256 @@
+"""
+Run telemetry for the localization pipeline.
+
+Collects per-stage wall time, per-catalog scan time, planned batches,
+per-batch model, latency, attempts and token usage (from the response usage
+metadata, including prompt tokens served from a cached prompt prefix), token
+usage and estimated cost per model, and cache hit rates. The report is written as a
+JSON metrics file and, inside GitHub Actions, as a job summary and step
+outputs.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_VERSION = 1
+
+# USD per million (input, output) tokens
+MODEL_PRICING = {
+    'gemini-3-flash-preview': (0.50, 3.00),
+    'gemini-3-pro-preview': (2.00, 12.00),
+    'gemini-2.5-pro': (1.25, 10.00),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+}
+
+# Share of the input price charged for prompt tokens read from a context
+# cache (the cache's storage is billed separately and not included)
+CACHED_INPUT_PRICE_RATIO = 0.1
+
+
+def estimate_cost(model, prompt_tokens, output_tokens, cached_tokens=0):
+    """Estimated cost in USD, or None for a model without known pricing."""
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        return None
+    input_cost = (prompt_tokens - cached_tokens + cached_tokens * CACHED_INPUT_PRICE_RATIO) * pricing[0]
+    return (input_cost + output_tokens * pricing[1]) / 1_000_000
+
+
+class Telemetry:
+    """Metrics for one run, safe to update from worker threads."""
+
+    def __init__(self, model=None):
+        """
+        Args:
+            model: Default model of the run; batches record the models they actually used
+        """
+        self.model = model
+        self.started_at = time.time()
+        self.stages = {}
+        self.catalogs = {}
+        self.batches = {}
+        self.counters = {}
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage (repeated stages accumulate)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def record_catalog(self, filename, **values):
+        """Merge values (e.g. parse_seconds, scan_seconds, missing) into a catalog's record."""
+        with self._lock:
+            self.catalogs.setdefault(filename, {}).update(values)
+
+    def record_batch(self, name, status, stats, entries):
+        """Record a finished or failed batch with its stats dict from translate_batch()."""
+        with self._lock:
+            self.batches[name] = {
+                "status": status,
+                "entries": entries,
+                "seconds": stats.get('seconds', 0.0),
+                "attempts": stats.get('attempts', 0),
+                "rate_limited": stats.get('rate_limited', 0),
+                "prompt_tokens": stats.get('prompt_tokens', 0),
+                "cached_tokens": stats.get('cached_tokens', 0),
+                "output_tokens": stats.get('output_tokens', 0),
+                "splits": stats.get('splits', 0),
+                "rejected": stats.get('rejected', 0),
+                "follow_ups": stats.get('follow_ups', 0),
+                "dropped": stats.get('dropped', 0),
+                "model": stats.get('model'),
+                "fallbacks": stats.get('fallbacks', 0),
+                "models": stats.get('models', {}),
+            }
+
+    def dropped(self):
+        """Entries left untranslated by batches that otherwise completed."""
+        with self._lock:
+            return sum(batch['dropped'] for batch in self.batches.values())
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_cache(self, name, hits, misses):
+        lookups = hits + misses
+        self.caches[name] = {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
+
+    def model_usage(self):
+        """Batches, token usage and estimated cost per model."""
+        usage = {}
+        empty = {"batches": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+        for batch in self.batches.values():
+            if batch['model']:
+                usage.setdefault(batch['model'], dict(empty))
+                usage[batch['model']]['batches'] += 1
+            for model, tokens in batch['models'].items():
+                model_usage = usage.setdefault(model, dict(empty))
+                model_usage['prompt_tokens'] += tokens.get('prompt_tokens', 0)
+                model_usage['cached_tokens'] += tokens.get('cached_tokens', 0)
+                model_usage['output_tokens'] += tokens.get('output_tokens', 0)
+        for model, model_usage in usage.items():
+            model_usage['estimated_cost_usd'] = estimate_cost(model, model_usage['prompt_tokens'],
+                                                              model_usage['output_tokens'], model_usage['cached_tokens'])
+        return usage
+
+    def report(self, status=None):
+        batches = self.batches.values()
+        prompt_tokens = sum(batch['prompt_tokens'] for batch in batches)
+        cached_tokens = sum(batch['cached_tokens'] for batch in batches)
+        output_tokens = sum(batch['output_tokens'] for batch in batches)
+        latencies = sorted(batch['seconds'] for batch in batches)
+        models = self.model_usage()
+        # Usage without a model (e.g. batches recorded before routing) is priced at the default model
+        unattributed_prompt = prompt_tokens - sum(usage['prompt_tokens'] for usage in models.values())
+        unattributed_output = output_tokens - sum(usage['output_tokens'] for usage in models.values())
+        unattributed_cached = cached_tokens - sum(usage['cached_tokens'] for usage in models.values())
+        costs = [usage['estimated_cost_usd'] for usage in models.values()]
+        if unattributed_prompt or unattributed_output:
+            costs.append(estimate_cost(self.model, unattributed_prompt, unattributed_output, unattributed_cached))
+        cost = None if None in costs else sum(costs)
+        return {
+            "version": METRICS_VERSION,
+            "status": status,
+            "model": self.model,
+            "started_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+            "duration_seconds": time.time() - self.started_at,
+            "stages": self.stages,
+            "counters": self.counters,
+            "caches": self.caches,
+            "tokens": {
+                "prompt": prompt_tokens,
+                "cached": cached_tokens,
+                "output": output_tokens,
+                "estimated_cost_usd": cost,
+            },
+            "models": models,
+            "batch_totals": {
+                "count": len(latencies),
+                "failed": sum(batch['status'] != 'done' for batch in batches),
+                "attempts": sum(batch['attempts'] for batch in batches),
+                "retries": sum(max(batch['attempts'] - 1, 0) for batch in batches),
+                "rate_limited": sum(batch['rate_limited'] for batch in batches),
+                "splits": sum(batch['splits'] for batch in batches),
+                "fallbacks": sum(batch['fallbacks'] for batch in batches),
+                "rejected": sum(batch['rejected'] for batch in batches),
+                "follow_ups": sum(batch['follow_ups'] for batch in batches),
+                "dropped": sum(batch['dropped'] for batch in batches),
+                "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+                "latency_max": latencies[-1] if latencies else None,
+            },
+            "batches": self.batches,
+            "catalogs": self.catalogs,
+        }
+
+    def write(self, path, status=None):
+        """Write the JSON metrics file and, in GitHub Actions, the job summary and outputs."""
+        report = self.report(status)
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"📊 Wrote metrics to {path}")
+
+        summary_path = os.environ.get('GITHUB_STEP_SUMMARY')
+        if summary_path:
+            with open(summary_path, 'a', encoding='utf-8') as f:
+                f.write(summary_markdown(report))
+
+        output_path = os.environ.get('GITHUB_OUTPUT')
+        if output_path:
+            with open(output_path, 'a', encoding='utf-8') as f:
+                for key, value in step_outputs(report, path).items():
+                    f.write(f"{key}={value}\n")
+        return report
+
+
+def step_outputs(report, metrics_path=None):
+    cost = report['tokens']['estimated_cost_usd']
+    outputs = {
+        "status": report['status'] or '',
+        "strings-translated": report['counters'].get('strings_translated', 0),
+        "strings-dropped": report['batch_totals']['dropped'],
+        "batches": report['batch_totals']['count'],
+        "prompt-tokens": report['tokens']['prompt'],
+        "cached-tokens": report['tokens']['cached'],
+        "output-tokens": report['tokens']['output'],
+        "estimated-cost": f"{cost:.4f}" if cost is not None else "",
+        "duration-seconds": f"{report['duration_seconds']:.1f}",
+    }
+    if metrics_path:
+        outputs["metrics-file"] = metrics_path
+    return outputs
+
+
+def summary_markdown(report):
+    """Job summary: where the time and tokens went."""
+    tokens = report['tokens']
+    totals = report['batch_totals']
+    cost = tokens['estimated_cost_usd']
+    lines = [
+        "## 🌍 Localization run",
+        "",
+        f"**Status:** {report['status'] or 'unknown'} · **Duration:** {report['duration_seconds']:.1f}s · "
+        f"**Model:** {report['model'] or '-'}",
+        "",
+    ]
+    if totals['dropped']:
+        lines += [f"> ⚠️ {totals['dropped']} string(s) kept failing and were left "
+                  f"untranslated for the next run.", ""]
+    lines += [
+        "| Stage | Seconds |",
+        "|-------|---------|",
+    ]
+    lines += [f"| {stage} | {seconds:.2f} |" for stage, seconds in report['stages'].items()]
+    lines += [
+        "",
+        "| Metric | Value |",
+        "|--------|-------|",
+    ]
+    lines += [f"| {name.replace('_', ' ')} | {value} |" for name, value in sorted(report['counters'].items())]
+    lines += [
+        f"| batches | {totals['count']} ({totals['failed']} failed, {totals['retries']} retries, {totals['rate_limited']} rate limited, "
+        f"{totals['fallbacks']} fallbacks, {totals['splits']} splits) |",
+        f"| validation | {totals['rejected']} entries rejected, {totals['follow_ups']} follow-up requests, "
+        f"{totals['dropped']} dropped |",
+        f"| tokens | {tokens['prompt']} prompt ({tokens['cached']} cached) / {tokens['output']} output |",
+        f"| estimated cost | {f'${cost:.4f}' if cost is not None else 'unknown model pricing'} |",
+    ]
+    lines += [f"| {model} | {usage['batches']} batch(es), {usage['prompt_tokens']} prompt ({usage['cached_tokens']} cached) / "
+              f"{usage['output_tokens']} output tokens |"
+              for model, usage in sorted(report['models'].items())]
+    lines += [f"| {name.replace('_', ' ')} hit rate | {cache['hit_rate']:.0%} ({cache['hits']}/{cache['hits'] + cache['misses']}) |"
+              for name, cache in sorted(report['caches'].items())]
+    return '\n'.join(lines) + '\n\n'
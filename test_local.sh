@@ -44,37 +44,9 @@ fi
 echo -e "${GREEN}✅ Found $XCSTRINGS_COUNT .xcstrings file(s)${NC}"
 echo ""
 
-# Step 1: Detect missing translations
-echo -e "${BLUE}📋 Step 1: Detecting missing translations...${NC}"
-python3 "enforce_100%_translation.py" --folder "$FOLDER_PATH" --languages "$LANGUAGES"
-# Check if translation files were created
-TASK_FILES=$(ls llm_translation_task_*.json 2>/dev/null | wc -l | tr -d ' ')
-if [ "$TASK_FILES" -eq 0 ]; then
-    echo -e "${GREEN}✅ All translations are complete! No work needed.${NC}"
-    exit 0
-fi
-
-echo -e "${GREEN}✅ Found $TASK_FILES translation task(s) to process${NC}"
-echo ""
-
-# Step 2: Translate with Gemini
-echo -e "${BLUE}🤖 Step 2: Translating with Gemini AI...${NC}"
-python3 translate_with_llm.py --api-key "$GEMINI_API_KEY"
-echo ""
-
-# Step 3: Apply translations
-echo -e "${BLUE}📝 Step 3: Applying translations...${NC}"
-python3 apply_translations.py --folder "$FOLDER_PATH"
-echo ""
-
-# Step 4: Add regional variants
-echo -e "${BLUE}🌐 Step 4: Adding regional variants...${NC}"
-python3 add_regional_variants.py --folder "$FOLDER_PATH"
-echo ""
-
-# Cleanup
-echo -e "${BLUE}🧹 Cleaning up temporary files...${NC}"
-rm -f llm_translation_task_*.json
+# Detect, translate, apply and add regional variants in one pass
+echo -e "${BLUE}🚀 Translating missing strings...${NC}"
+python3 localize.py run --folder "$FOLDER_PATH" --languages "$LANGUAGES" --api-key "$GEMINI_API_KEY"
 
 echo ""
 echo "================================================"
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for token accounting and batch packing.
+"""
+
+import os
+import sys
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_planner import entry_cost, heuristic_token_count, pack_batches
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+
+def test_cost_scales_with_missing_languages():
+    """An entry missing one language costs far less output than one missing many."""
+    one = entry_cost("A.xcstrings:k", {"en": "Save changes", "missing_translations": {"de": ""}})
+    many = entry_cost("A.xcstrings:k", {"en": "Save changes",
+                                        "missing_translations": {lang: "" for lang in ["de", "fr", "ja", "ar"]}})
+    assert many[1] > one[1]
+    assert heuristic_token_count("日本語") > heuristic_token_count("abc")
+
+
+def test_pack_respects_both_limits():
+    """No batch exceeds the input or the output limit, and no item is lost."""
+    items = [(i, 10 + i % 7, 30 + (i * 13) % 50) for i in range(200)]
+    batches = pack_batches(items, max_input_tokens=200, max_output_tokens=400, base_input_tokens=20)
+
+    assert sorted(item for batch in batches for item in batch["items"]) == list(range(200))
+    for batch in batches:
+        assert batch["input_tokens"] <= 200
+        assert batch["output_tokens"] <= 400
+
+    # First-fit-decreasing should come close to the output lower bound
+    lower_bound = -(-sum(item[2] for item in items) // 400)
+    assert len(batches) <= lower_bound + 2
+
+
+def test_oversized_item_gets_its_own_batch():
+    batches = pack_batches([("big", 500, 10), ("small", 5, 5)], max_input_tokens=100, max_output_tokens=100)
+    assert [batch["items"] for batch in batches] == [["big"], ["small"]]
+
+
+def test_create_llm_schemas_only_includes_missing_languages():
+    missing = {
+        "A.xcstrings": {
+            "cancel": {"en": "Cancel", "missing_langs": ["de"]},
+            "items": {"en": {"one": "%lld item", "other": "%lld items"}, "missing_langs": ["de", "fr"]},
+        }
+    }
+    schemas = enforce.create_llm_schemas(missing, ["de", "fr"], max_tokens=60000)
+
+    assert len(schemas) == 1
+    translations = schemas[0]["translations"]
+    assert translations["A.xcstrings:cancel"]["missing_translations"] == {"de": ""}
+    assert set(translations["A.xcstrings:items"]["missing_translations"]) == {"de", "fr"}
+
+
+def test_identical_strings_are_translated_once():
+    """Repeated strings across catalogs are sent once and fanned back out to every key."""
+    from apply_translations import expand_duplicates
+
+    missing = {
+        "A.xcstrings": {"cancel": {"en": "Cancel", "missing_langs": ["de"]}},
+        "B.xcstrings": {"Cancel": {"en": "Cancel", "missing_langs": ["de"]},
+                        "other": {"en": "Cancel", "missing_langs": ["de", "fr"]}},
+    }
+    schemas = enforce.create_llm_schemas(missing, ["de", "fr"])
+    assert len(schemas) == 1
+    schema = schemas[0]
+    # Same text but a different language set is its own entry
+    assert sorted(schema["translations"]) == ["A.xcstrings:cancel", "B.xcstrings:other"]
+    assert schema["duplicates"] == {"A.xcstrings:cancel": ["B.xcstrings:Cancel"]}
+    assert schema["estimated_tokens"]["saved_by_dedup"] > 0
+
+    result = {"A.xcstrings:cancel": {"en": "Cancel", "missing_translations": {"de": "Abbrechen"}}}
+    expanded = expand_duplicates(result, schema["duplicates"])
+    assert expanded["B.xcstrings:Cancel"]["missing_translations"]["de"] == "Abbrechen"
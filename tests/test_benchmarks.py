@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Smoke tests for the synthetic catalog generator and the benchmark runner.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from generate_catalogs import generate_catalogs, languages_for
+import run_benchmarks
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+
+def test_generated_catalogs_match_the_requested_shape():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        languages = languages_for(40)
+        paths = generate_catalogs(tmpdir, 200, languages, catalogs=3, plural_ratio=0.5, missing_ratio=0.25)
+        assert paths == ["Catalog0.xcstrings", "Module1/Catalog1.xcstrings", "Catalog2.xcstrings"]
+
+        missing = enforce.check_translations(tmpdir, languages, workers=1)
+        missing_pairs = sum(len(data["missing_langs"]) for strings in missing.values() for data in strings.values())
+        assert 0.15 < missing_pairs / (200 * 40) < 0.35
+        plurals = sum(isinstance(data["en"], dict) for strings in missing.values() for data in strings.values())
+        assert plurals > 0
+
+
+def test_benchmark_records_every_stage():
+    args = argparse.Namespace(catalogs=2, plural_ratio=0.1, missing_ratio=0.1, seed=0, repeat=1,
+                              workers=1, stages=None, memory=True)
+    results = run_benchmarks.benchmark_size(50, 16, args)
+    assert [record["stage"] for record in results] == run_benchmarks.STAGES
+    assert all(record["seconds"] >= 0 and record["peak_bytes"] > 0 for record in results)
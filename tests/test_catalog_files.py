@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for recursive catalog discovery and parallel scanning.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_files import find_catalogs
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+SAMPLE_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_xcstrings", "Localizable.xcstrings")
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full_path = os.path.join(root, *path.split('/'))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        shutil.copy(SAMPLE_CATALOG, full_path)
+
+
+def test_find_catalogs_recurses_with_patterns():
+    """Nested catalogs are found; hidden directories and excluded paths are skipped."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir, [
+            "Localizable.xcstrings",
+            "Tasks/Localizable.xcstrings",
+            "Frameworks/Settings/Settings.xcstrings",
+            "Frameworks/Legacy/Old.xcstrings",
+            ".build/checkouts/Dependency.xcstrings",
+        ])
+        with open(os.path.join(tmpdir, "Tasks", "notes.json"), "w") as f:
+            json.dump({}, f)
+
+        assert find_catalogs(tmpdir) == [
+            "Frameworks/Legacy/Old.xcstrings",
+            "Frameworks/Settings/Settings.xcstrings",
+            "Localizable.xcstrings",
+            "Tasks/Localizable.xcstrings",
+        ]
+        assert find_catalogs(tmpdir, exclude=[".*", "Legacy"]) == [
+            "Frameworks/Settings/Settings.xcstrings",
+            "Localizable.xcstrings",
+            "Tasks/Localizable.xcstrings",
+        ]
+        assert find_catalogs(tmpdir, include=["Frameworks/*"]) == [
+            "Frameworks/Legacy/Old.xcstrings",
+            "Frameworks/Settings/Settings.xcstrings",
+        ]
+
+
+def test_check_translations_is_the_same_across_workers():
+    """Scanning in a process pool gives the same result as scanning in-process."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir, ["A.xcstrings", "Nested/B.xcstrings", "Nested/Deeper/C.xcstrings"])
+
+        serial = enforce.check_translations(tmpdir, ["ar", "de"], workers=1)
+        parallel = enforce.check_translations(tmpdir, ["ar", "de"], workers=3)
+
+        assert serial == parallel
+        assert sorted(serial) == ["A.xcstrings", "Nested/B.xcstrings", "Nested/Deeper/C.xcstrings"]
+
+
+def test_write_catalog_uses_xcode_format_and_skips_unchanged():
+    """Catalogs are written in Xcode's format, and only when their data changed."""
+    from catalog_files import dumps, write_catalog
+
+    data = {"version": "1.0", "sourceLanguage": "en", "strings": {
+        "group": {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "{} group"}}}},
+        "Group": {},
+        "apple": {"comment": "Fruit"},
+    }}
+    assert dumps(data) == """{
+  "sourceLanguage" : "en",
+  "strings" : {
+    "apple" : {
+      "comment" : "Fruit"
+    },
+    "group" : {
+      "localizations" : {
+        "en" : {
+          "stringUnit" : {
+            "state" : "translated",
+            "value" : "{} group"
+          }
+        }
+      }
+    },
+    "Group" : {
+
+    }
+  },
+  "version" : "1.0"
+}"""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "Localizable.xcstrings")
+        # Same data in another format is left alone
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        assert write_catalog(path, data) is None
+
+        data["strings"]["apple"]["comment"] = "A fruit"
+        assert write_catalog(path, data) is not None
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == dumps(data)
+        assert os.listdir(tmpdir) == ["Localizable.xcstrings"]
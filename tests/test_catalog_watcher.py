@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for watch mode: picking up saved catalogs and translating only new strings.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import localize
+from catalog_watcher import CatalogWatcher
+from model_router import create_router
+
+SAMPLE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_xcstrings")
+
+
+def make_watch_args(folder, cache_dir=None):
+    return argparse.Namespace(
+        folder=folder, include=None, exclude=None, languages="ar,de", cache_dir=cache_dir, concurrency=2,
+        max_tokens=localize.WATCH_MAX_INPUT_TOKENS, max_output_tokens=localize.WATCH_MAX_OUTPUT_TOKENS,
+        tokenizer="heuristic",
+    )
+
+
+def save_catalog(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def test_saved_string_is_translated_in_place():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_watch_args(folder, os.path.join(tmpdir, "cache"))
+        router = create_router("fake", None, "fake-model")
+        watcher = CatalogWatcher(folder, interval=0, debounce=0)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["strings"]["Save"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "Save"}}}}
+        save_catalog(path, data)
+
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        assert changed == ["Localizable.xcstrings"]
+        assert localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS) == 1
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        localizations = data["strings"]["Save"]["localizations"]
+        assert localizations["de"]["stringUnit"]["value"] == "[de] Save"
+        assert localizations["en-GB"]["stringUnit"]["value"] == "Save"
+        # Strings that were already missing before the watch started are left to a full run
+        assert "de" not in data["strings"]["Hello, World!"]["localizations"]
+        # Our own write isn't picked up as a change
+        assert watcher.changes() == []
+
+
+def test_catalog_saved_during_translation_gets_its_strings_next_cycle():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_watch_args(folder)
+        watcher = CatalogWatcher(folder, interval=0, debounce=0)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["strings"]["Save"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "Save"}}}}
+        save_catalog(path, data)
+
+        router = create_router("fake", None, "fake-model")
+        backend = router.backend("fake-model")
+        generate = backend.generate
+
+        def generate_while_saving(*call_args, **kwargs):
+            # The developer adds another string while the first one is being translated
+            data["strings"]["Open"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "Open"}}}}
+            save_catalog(path, data)
+            os.utime(path, ns=(0, 1))
+            return generate(*call_args, **kwargs)
+
+        backend.generate = generate_while_saving
+        pending = {}
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS, pending=pending)
+        assert list(pending["Localizable.xcstrings"]) == ["Localizable.xcstrings:Save"]
+
+        backend.generate = generate
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS, pending=pending)
+
+        with open(path, encoding="utf-8") as f:
+            strings = json.load(f)["strings"]
+        assert strings["Save"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Save"
+        assert strings["Open"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Open"
+        assert pending == {}
+
+
+def test_unreadable_catalog_is_skipped_until_it_changes_again():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_watch_args(folder)
+        router = create_router("fake", None, "fake-model")
+        watcher = CatalogWatcher(folder, interval=0, debounce=0)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        # Saved half-written: the cycle skips it and leaves the file alone
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"sourceLanguage": "en", "strings": {')
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        assert localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS) == 0
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == '{"sourceLanguage": "en", "strings": {'
+        assert watcher.changes() == []
+
+        # Deleted between the poll and the reload
+        assert localize.watch_cycle(args, watcher, ["Missing.xcstrings"], router, localize.LANGUAGE_VARIANTS) == 0
+
+        data["strings"]["Save"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "Save"}}}}
+        save_catalog(path, data)
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        assert localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS) == 1
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f)["strings"]["Save"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Save"
+
+
+def test_strings_of_failed_batches_are_retried_next_cycle():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_watch_args(folder)
+        router = create_router("fake:bad_request_rate=1", None, "fake-model")
+        watcher = CatalogWatcher(folder, interval=0, debounce=0)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["strings"]["Save"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "Save"}}}}
+        save_catalog(path, data)
+
+        failed = set()
+        changed = watcher.wait_for_changes(sleep=lambda seconds: None)
+        assert localize.watch_cycle(args, watcher, changed, router, localize.LANGUAGE_VARIANTS, failed=failed) == 0
+        assert failed == {"Localizable.xcstrings:Save"}
+
+        # The next cycle picks the string up again, although its catalog didn't change
+        router.backend("fake-model").backend.bad_request_rate = 0
+        assert localize.watch_cycle(args, watcher, [], router, localize.LANGUAGE_VARIANTS, failed=failed) == 1
+        assert failed == set()
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f)["strings"]["Save"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Save"
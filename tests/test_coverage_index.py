@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact coverage index behind the coverage command.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coverage_index import MISSING, NEEDS_REVIEW, TRANSLATED, CoverageIndex, index_catalog
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+SAMPLE_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_xcstrings", "Localizable.xcstrings")
+LANGUAGES = ["de", "fr", "ja"]
+
+
+def test_cells_hold_one_state_per_key_and_language():
+    data = {"strings": {
+        "done": {"localizations": {
+            "de": {"stringUnit": {"state": "translated", "value": "Fertig"}},
+            "fr": {"stringUnit": {"state": "needs_review", "value": "Fini"}},
+        }},
+        "files": {"localizations": {
+            "de": {"variations": {"plural": {
+                "one": {"stringUnit": {"state": "translated", "value": "%lld Datei"}},
+                "other": {"stringUnit": {"state": "translated", "value": ""}},
+            }}},
+            "ja": {"variations": {"plural": {"other": {"stringUnit": {"state": "translated", "value": ""}}}}},
+        }},
+        "empty": {},
+    }}
+
+    keys, cells = index_catalog(data, LANGUAGES)
+
+    assert keys == ["done", "files", "empty"]
+    assert list(cells) == [TRANSLATED, NEEDS_REVIEW, MISSING,
+                           TRANSLATED, MISSING, MISSING,
+                           MISSING, MISSING, MISSING]
+
+
+def test_report_matches_check_translations_and_refreshes_incrementally():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "catalogs")
+        cache_dir = os.path.join(tmpdir, "cache")
+        for name in ("A.xcstrings", "Nested/B.xcstrings"):
+            os.makedirs(os.path.dirname(os.path.join(folder, name)), exist_ok=True)
+            shutil.copy(SAMPLE_CATALOG, os.path.join(folder, name))
+
+        index = CoverageIndex(LANGUAGES, cache_dir)
+        assert index.refresh(folder, workers=1) == 2
+        index.save()
+        report = index.report()
+
+        missing = enforce.check_translations(folder, LANGUAGES, workers=1)
+        untranslated = sum(len(entry["missing_langs"]) for strings in missing.values() for entry in strings.values())
+        overall = report["overall"]
+        assert overall["missing"] + overall["needs_review"] == untranslated
+        assert overall["cells"] == sum(len(entry["keys"]) for entry in index.files.values()) * len(LANGUAGES)
+
+        # A second index only parses the catalog that changed
+        path = os.path.join(folder, "A.xcstrings")
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for string_data in data["strings"].values():
+            string_data["localizations"] = {}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        index = CoverageIndex(LANGUAGES, cache_dir)
+        assert index.refresh(folder, workers=1) == 1
+        assert index.report()["files"]["A.xcstrings"]["percent"] == 0.0
+        assert index.report()["files"]["Nested/B.xcstrings"] == report["files"]["Nested/B.xcstrings"]
+
+        # A different language list can't reuse the cells
+        assert CoverageIndex(["de"], cache_dir).files == {}
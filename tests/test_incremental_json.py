@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental parser used on streamed responses.
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from incremental_json import ObjectStreamParser
+
+RESPONSE = {
+    "A.xcstrings:greeting": {"en": "Say \"hi\" {now}", "missing_translations": {"de": "Sag \"hallo\" {jetzt}"}},
+    "A.xcstrings:items": {"en": {"one": "%lld item", "other": "%lld items"},
+                          "missing_translations": {"de": {"one": "%lld Element", "other": "%lld Elemente"}}},
+    "A.xcstrings:path": {"en": "C:\\temp", "missing_translations": {"ja": "一時フォルダ"}},
+}
+
+
+def feed_in_chunks(parser, text, size):
+    members = []
+    for i in range(0, len(text), size):
+        members.extend(parser.feed(text[i:i + size]))
+    return members
+
+
+def test_members_arrive_as_they_close():
+    text = "```json\n" + json.dumps(RESPONSE, indent=2, ensure_ascii=False) + "\n```"
+    for size in (1, 7, 64, len(text)):
+        parser = ObjectStreamParser()
+        assert dict(feed_in_chunks(parser, text, size)) == RESPONSE
+        assert parser.closed
+
+
+def test_truncated_stream_keeps_completed_entries():
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    cut = text.index('"A.xcstrings:path"') + 30
+    parser = ObjectStreamParser()
+    members = dict(feed_in_chunks(parser, text[:cut], 5))
+
+    assert list(members) == ["A.xcstrings:greeting", "A.xcstrings:items"]
+    assert not parser.closed
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-process localization pipeline.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import localize
+import translate_with_llm
+from job_journal import JobJournal
+from run_manifest import RunManifest
+from translation_memory import TranslationMemory
+
+SAMPLE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_xcstrings")
+LANGUAGES = ["ar", "de"]
+
+
+def make_args(folder, cache_dir):
+    return argparse.Namespace(
+        folder=folder,
+        include=None,
+        exclude=None,
+        languages=",".join(LANGUAGES),
+        api_key=None,
+        backend="gemini",
+        routing=None,
+        variants=None,
+        glossary=None,
+        no_prompt_cache=False,
+        fallback_model=None,
+        model=localize.DEFAULT_MODEL,
+        concurrency=1,
+        cache_dir=cache_dir,
+        cache_max_mb=50,
+        full_scan=False,
+        job_dir=None,
+        resume=False,
+        stream=False,
+        max_tokens=60000,
+        max_output_tokens=32000,
+        tokenizer='heuristic',
+        metrics_file=None,
+        rpm=None,
+        tpm=None,
+        shard=None,
+        shard_by="language",
+        shard_output=None,
+    )
+
+
+def test_run_applies_translations_in_one_pass():
+    """With every string in translation memory, run() applies and writes without calling Gemini."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        cache_dir = os.path.join(tmpdir, "cache")
+
+        catalogs, _, _ = localize.load_catalogs(folder)
+        memory = TranslationMemory(cache_dir, localize.DEFAULT_MODEL)
+        for strings in localize.find_missing(catalogs, LANGUAGES).values():
+            for data in strings.values():
+                for lang in data["missing_langs"]:
+                    if isinstance(data["en"], dict):
+                        memory.store(data["en"], lang, {form: f"[{lang}] {value}" for form, value in data["en"].items()})
+                    else:
+                        memory.store(data["en"], lang, f"[{lang}] {data['en']}")
+        memory.close()
+
+        assert localize.run(make_args(folder, cache_dir)) == 0
+
+        with open(os.path.join(folder, "Localizable.xcstrings"), encoding="utf-8") as f:
+            data = json.load(f)
+        localizations = data["strings"]["Hello, World!"]["localizations"]
+        assert localizations["de"]["stringUnit"]["value"] == "[de] Hello, World!"
+        assert localizations["en-AU"]["stringUnit"]["value"] == "Hello, World!"
+        plural = data["strings"]["itemCount"]["localizations"]["ar"]["variations"]["plural"]
+        assert plural["other"]["stringUnit"]["value"] == "[ar] %lld items"
+        # Existing translations are left alone
+        assert data["strings"]["Welcome"]["localizations"]["ar"]["stringUnit"]["value"] == "مرحبا"
+
+        # Nothing left to do, so a second run writes nothing
+        catalogs, originals, _ = localize.load_catalogs(folder)
+        assert localize.find_missing(catalogs, LANGUAGES) == {}
+        assert localize.write_changed_catalogs(folder, catalogs, originals) == []
+
+
+def test_run_evicts_translation_memory_down_to_its_cap():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        cache_dir = os.path.join(tmpdir, "cache")
+        args = make_args(folder, cache_dir)
+        args.backend = "fake"
+        args.cache_max_mb = 0
+        assert localize.run(args) == 0
+
+        memory = TranslationMemory(cache_dir, localize.DEFAULT_MODEL)
+        assert memory.stats()["entries"] == 0
+        memory.close(persist=False)
+
+
+def test_manifest_skips_unchanged_catalogs():
+    """After a successful run, unchanged catalogs aren't parsed and unchanged keys aren't scanned."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        cache_dir = os.path.join(tmpdir, "cache")
+        path = os.path.join(folder, "Localizable.xcstrings")
+
+        # Make the sample complete so the run needs no translations
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for string_data in data["strings"].values():
+            for lang in LANGUAGES:
+                string_data["localizations"][lang] = json.loads(json.dumps(string_data["localizations"]["en"]))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        assert localize.run(make_args(folder, cache_dir)) == 0
+
+        manifest = RunManifest(cache_dir, LANGUAGES)
+        catalogs, _, skipped = localize.load_catalogs(folder, manifest)
+        assert catalogs == {}
+        assert skipped == ["Localizable.xcstrings"]
+
+        # Add a new string: the catalog is parsed again, but only the new key is missing
+        data["strings"]["New string"] = {"localizations": {"en": {"stringUnit": {"state": "translated", "value": "New"}}}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        manifest = RunManifest(cache_dir, LANGUAGES)
+        catalogs, _, skipped = localize.load_catalogs(folder, manifest)
+        assert skipped == []
+        missing = localize.find_missing(catalogs, LANGUAGES, manifest)
+        assert list(missing["Localizable.xcstrings"]) == ["New string"]
+
+
+def test_resume_applies_finished_batches():
+    """Finished batches of an interrupted job are applied without translating them again."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        job_dir = os.path.join(tmpdir, "job")
+
+        task = {"translations": {
+            "Localizable.xcstrings:Hello, World!": {"en": "Hello, World!", "missing_translations": {"ar": "", "de": ""}},
+            "Localizable.xcstrings:Welcome": {"en": "Welcome (old text)", "missing_translations": {"de": ""}},
+        }}
+        result = {
+            "Localizable.xcstrings:Hello, World!": {"en": "Hello, World!", "missing_translations": {"ar": "مرحبا بالعالم", "de": "Hallo, Welt!"}},
+            "Localizable.xcstrings:Welcome": {"en": "Welcome (old text)", "missing_translations": {"de": "Willkommen"}},
+        }
+        journal = JobJournal(job_dir, {"folder": folder, "languages": LANGUAGES, "model": localize.DEFAULT_MODEL})
+        journal.add_batch("batch_0001", task)
+        journal.mark_in_flight("batch_0001")
+        journal.mark_done("batch_0001", {"attempts": 1, "prompt_tokens": 10, "output_tokens": 20}, result)
+
+        catalogs, _, _ = localize.load_catalogs(folder)
+        assert localize.resume_job(JobJournal(job_dir), catalogs) == []
+
+        localizations = catalogs["Localizable.xcstrings"]["strings"]["Hello, World!"]["localizations"]
+        assert localizations["de"]["stringUnit"]["value"] == "Hallo, Welt!"
+        # The English text changed since that batch was translated, so its result is dropped
+        assert "de" not in catalogs["Localizable.xcstrings"]["strings"]["Welcome"]["localizations"]
+        assert JobJournal(job_dir).batches["batch_0001"]["usage"] == {"prompt_tokens": 10, "output_tokens": 20}
+
+
+def test_resume_retranslates_strings_whose_english_changed():
+    """Unfinished batches of a failed job don't send English that changed before the resume."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_args(folder, os.path.join(tmpdir, "cache"))
+        args.backend = "fake:bad_request_rate=1"
+        args.job_dir = os.path.join(tmpdir, "job")
+        assert localize.run(args) == 1
+        assert JobJournal(args.job_dir).unfinished() == ["batch_0001"]
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["strings"]["Hello, World!"]["localizations"]["en"]["stringUnit"]["value"] = "Goodbye"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        args.backend = "fake"
+        args.resume = True
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            localizations = json.load(f)["strings"]["Hello, World!"]["localizations"]
+        assert localizations["de"]["stringUnit"]["value"] == "[de] Goodbye"
+        assert localizations["ar"]["stringUnit"]["value"] == "[ar] Goodbye"
+
+        # The translations are recorded for the English they were made from
+        args.resume = False
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+        assert localize.run(args) == 0
+        with open(args.metrics_file, encoding="utf-8") as f:
+            assert json.load(f)["counters"]["strings_missing"] == 0
+
+
+def test_resumed_batch_keeps_duplicates_that_differ_only_in_normalization():
+    """A duplicate grouped by its NFC form still matches its representative when a job resumes."""
+    composed, decomposed = "Caf\u00e9", "Cafe\u0301"
+
+    def catalog(value):
+        return {"strings": {value: {"localizations": {"en": {"stringUnit": {"state": "translated", "value": value}}}}}}
+
+    catalogs = {"A.xcstrings": catalog(composed), "B.xcstrings": catalog(decomposed)}
+    task_data = {
+        "translations": {f"A.xcstrings:{composed}": {"en": composed, "missing_translations": {"de": ""}}},
+        "duplicates": {f"A.xcstrings:{composed}": [f"B.xcstrings:{decomposed}"]},
+    }
+
+    task = localize.current_task(catalogs, task_data)
+    assert task["duplicates"] == {f"A.xcstrings:{composed}": [f"B.xcstrings:{decomposed}"]}
+
+
+def test_run_with_fake_backend_writes_metrics():
+    """A run against the fake backend translates everything and reports tokens, batches and timings."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        args = make_args(folder, os.path.join(tmpdir, "cache"))
+        args.backend = "fake"
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+
+        assert localize.run(args) == 0
+
+        catalogs, _, _ = localize.load_catalogs(folder)
+        assert localize.find_missing(catalogs, LANGUAGES) == {}
+
+        with open(args.metrics_file, encoding="utf-8") as f:
+            metrics = json.load(f)
+        assert metrics["status"] == "success"
+        assert metrics["counters"]["strings_translated"] == metrics["counters"]["strings_missing"] > 0
+        assert metrics["tokens"]["prompt"] > 0 and metrics["tokens"]["estimated_cost_usd"] > 0
+        assert metrics["batch_totals"]["count"] == metrics["counters"]["batches_planned"]
+        assert {"load", "scan", "plan", "translate", "write"} <= set(metrics["stages"])
+        assert "scan_seconds" in metrics["catalogs"]["Localizable.xcstrings"]
+
+
+def test_run_that_drops_every_string_is_reported_incomplete(monkeypatch):
+    """Strings that keep failing are left missing, and the run says so instead of reporting success."""
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        output_path = os.path.join(tmpdir, "github_output")
+        monkeypatch.setenv("GITHUB_OUTPUT", output_path)
+        args = make_args(folder, os.path.join(tmpdir, "cache"))
+        args.backend = "fake:invalid_rate=1"
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+
+        assert localize.run(args) == 0
+
+        with open(args.metrics_file, encoding="utf-8") as f:
+            metrics = json.load(f)
+        missing = metrics["counters"]["strings_missing"]
+        assert metrics["status"] == "incomplete"
+        assert metrics["batch_totals"]["dropped"] == missing > 0
+        assert metrics["counters"].get("strings_translated", 0) == 0
+        with open(output_path, encoding="utf-8") as f:
+            outputs = f.read().splitlines()
+        assert "status=incomplete" in outputs and f"strings-dropped={missing}" in outputs
+
+        # Nothing was recorded as translated, so the next run asks for every string again
+        args.backend = "fake"
+        assert localize.run(args) == 0
+        with open(args.metrics_file, encoding="utf-8") as f:
+            metrics = json.load(f)
+        assert metrics["status"] == "success" and metrics["counters"]["strings_translated"] == missing
+
+
+def test_shards_merge_to_the_same_catalogs_as_one_run():
+    """Shards by language and by string each write an artifact; merging them matches a single full run."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        expected_folder = os.path.join(tmpdir, "expected")
+        shutil.copytree(SAMPLE_FOLDER, expected_folder)
+        args = make_args(expected_folder, None)
+        args.backend = "fake"
+        assert localize.run(args) == 0
+        expected, _, _ = localize.load_catalogs(expected_folder)
+
+        for shard_by in ("language", "key"):
+            folder = os.path.join(tmpdir, shard_by)
+            shutil.copytree(SAMPLE_FOLDER, folder)
+            artifacts = []
+            for index in (1, 2):
+                args = make_args(folder, None)
+                args.backend = "fake"
+                args.shard, args.shard_by = f"{index}/2", shard_by
+                args.shard_output = os.path.join(tmpdir, f"{shard_by}-{index}.json")
+                assert localize.run(args) == 0
+                artifacts.append(args.shard_output)
+
+            # Shards leave the catalogs alone
+            catalogs, _, _ = localize.load_catalogs(folder)
+            assert localize.find_missing(catalogs, LANGUAGES) != {}
+
+            merge_args = argparse.Namespace(folder=folder, include=None, exclude=None, artifacts=artifacts,
+                                            languages=",".join(LANGUAGES), variants=None, cache_dir=None)
+            assert localize.merge(merge_args) == 0
+            merged, _, _ = localize.load_catalogs(folder)
+            assert merged == expected
+
+
+def test_partial_merge_keeps_the_cache_state_of_other_catalogs():
+    """A merge narrowed with --include only prunes cache state for catalogs that were deleted."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        shutil.copy(os.path.join(folder, "Localizable.xcstrings"), os.path.join(folder, "Other.xcstrings"))
+        cache_dir = os.path.join(tmpdir, "cache")
+        args = make_args(folder, cache_dir)
+        args.backend = "fake"
+        assert localize.run(args) == 0
+
+        def cached_catalogs():
+            with open(os.path.join(cache_dir, "sources.json"), encoding="utf-8") as f:
+                sources = set(json.load(f)["catalogs"])
+            return set(RunManifest(cache_dir, LANGUAGES).catalogs), sources
+
+        merge_args = argparse.Namespace(folder=folder, include=["Localizable.xcstrings"], exclude=None, artifacts=[],
+                                        languages=",".join(LANGUAGES), variants=None, cache_dir=cache_dir)
+        assert localize.merge(merge_args) == 0
+        both = {"Localizable.xcstrings", "Other.xcstrings"}
+        assert cached_catalogs() == (both, both)
+
+        os.remove(os.path.join(folder, "Other.xcstrings"))
+        assert localize.merge(merge_args) == 0
+        assert cached_catalogs() == ({"Localizable.xcstrings"}, {"Localizable.xcstrings"})
+
+
+def test_changed_english_retranslates_only_that_key():
+    """Translations whose English source changed are redone; everything else is left alone."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        args = make_args(folder, os.path.join(tmpdir, "cache"))
+        args.backend = "fake"
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        welcome_ar = data["strings"]["Welcome"]["localizations"]["ar"]
+        data["strings"]["Hello, World!"]["localizations"]["en"]["stringUnit"]["value"] = "Hello, everyone!"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        assert data["strings"]["Hello, World!"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Hello, everyone!"
+        assert data["strings"]["Welcome"]["localizations"]["ar"] == welcome_ar
+        with open(args.metrics_file, encoding="utf-8") as f:
+            counters = json.load(f)["counters"]
+        assert counters["strings_missing"] == 1 and counters["translations_stale"] == 2
+
+        # Once redone, the translations are current again
+        assert localize.run(args) == 0
+        with open(args.metrics_file, encoding="utf-8") as f:
+            assert json.load(f)["counters"]["strings_missing"] == 0
+
+
+def test_changed_english_is_retranslated_after_fingerprints_are_introduced():
+    """A cache with a manifest but no sources.json still notices English that changed."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        cache_dir = os.path.join(tmpdir, "cache")
+        args = make_args(folder, cache_dir)
+        args.backend = "fake"
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+        assert localize.run(args) == 0
+
+        # A cache written before source fingerprints existed
+        os.remove(os.path.join(cache_dir, "sources.json"))
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["strings"]["Hello, World!"]["localizations"]["en"]["stringUnit"]["value"] = "Hello, everyone!"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        assert data["strings"]["Hello, World!"]["localizations"]["de"]["stringUnit"]["value"] == "[de] Hello, everyone!"
+        with open(args.metrics_file, encoding="utf-8") as f:
+            assert json.load(f)["counters"]["translations_stale"] == 2
+
+
+def test_variants_follow_changed_strings_and_keep_hand_edits():
+    """Only changed strings get their variants updated; variants edited by hand are kept."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        path = os.path.join(folder, "Localizable.xcstrings")
+        variants_file = os.path.join(tmpdir, "variants.json")
+        with open(variants_file, "w", encoding="utf-8") as f:
+            json.dump({"en": ["en-AU", "en-GB"], "de": ["de-AT"]}, f)
+        args = make_args(folder, os.path.join(tmpdir, "cache"))
+        args.backend = "fake"
+        args.variants = variants_file
+        args.metrics_file = os.path.join(tmpdir, "metrics.json")
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        localizations = data["strings"]["Hello, World!"]["localizations"]
+        assert localizations["de-AT"]["stringUnit"]["value"] == "[de] Hello, World!"
+        assert "en-IN" not in localizations
+
+        # Change the English of one string, and hand-edit a variant of it and of another one
+        localizations["en"]["stringUnit"]["value"] = "Hello, everyone!"
+        localizations["en-GB"]["stringUnit"]["value"] = "Hello, everyone, cheers!"
+        data["strings"]["Welcome"]["localizations"]["en-AU"]["stringUnit"]["value"] = "G'day"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        assert localize.run(args) == 0
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        localizations = data["strings"]["Hello, World!"]["localizations"]
+        assert localizations["en-AU"]["stringUnit"]["value"] == "Hello, everyone!"
+        assert localizations["en-GB"]["stringUnit"]["value"] == "Hello, everyone, cheers!"
+        assert localizations["de-AT"]["stringUnit"]["value"] == "[de] Hello, everyone!"
+        assert data["strings"]["Welcome"]["localizations"]["en-AU"]["stringUnit"]["value"] == "G'day"
+        with open(args.metrics_file, encoding="utf-8") as f:
+            counters = json.load(f)["counters"]
+        assert counters["variants_updated"] == 2 and counters["variants_kept"] == 1
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for routing batches to models and falling back along the chain.
+"""
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translate_with_llm
+from model_router import ModelRouter, create_router
+from telemetry import Telemetry
+from translation_backends import FakeBackend
+from test_translate_with_llm import make_batches, run_batches
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+RULES = [{"model": "lite", "max_chars": 20, "plurals": False}]
+
+
+def test_short_strings_are_planned_for_the_routed_model():
+    missing = {"A.xcstrings": {
+        "ok": {"en": "OK", "missing_langs": ["de"]},
+        "cancel": {"en": "Cancel", "missing_langs": ["de"]},
+        "intro": {"en": "Welcome! Sync your tasks across all of your devices.", "missing_langs": ["de"]},
+        "files": {"en": {"one": "%lld file", "other": "%lld files"}, "missing_langs": ["de"]},
+    }}
+    router = ModelRouter(lambda model: FakeBackend(model=model), "main", RULES)
+
+    schemas = enforce.create_llm_schemas(missing, ["de"], route=router.choose)
+
+    models = {entry_id: schema["model"] for schema in schemas for entry_id in schema["translations"]}
+    assert models == {"A.xcstrings:ok": "lite", "A.xcstrings:cancel": "lite",
+                      "A.xcstrings:intro": "main", "A.xcstrings:files": "main"}
+
+
+def test_max_entries_rule_caps_the_batches_it_routes():
+    missing = {"A.xcstrings": {f"key{i}": {"en": f"String number {i}", "missing_langs": ["de"]} for i in range(30)}}
+    router = ModelRouter(lambda model: FakeBackend(model=model), "main", [{"model": "lite", "max_entries": 10}])
+
+    schemas = enforce.create_llm_schemas(missing, ["de"], route=router.choose, group=router.group)
+
+    assert [len(schema["translations"]) for schema in schemas] == [10, 10, 10]
+    assert {schema["model"] for schema in schemas} == {"lite"}
+
+
+def test_enforce_cli_plans_batches_by_routing_file():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        routing_path = os.path.join(tmpdir, "routing.json")
+        with open(routing_path, "w", encoding="utf-8") as f:
+            json.dump({"rules": [{"model": "lite", "plurals": False, "max_entries": 1}]}, f)
+
+        subprocess.run([sys.executable, os.path.join(project_root, "enforce_100%_translation.py"),
+                        "--folder", os.path.join(project_root, "tests", "sample_xcstrings"),
+                        "--languages", "ar,de", "--model", "main", "--routing", routing_path],
+                       cwd=tmpdir, check=True, capture_output=True)
+
+        schemas = []
+        for name in sorted(os.listdir(tmpdir)):
+            if name.startswith("llm_translation_task_"):
+                with open(os.path.join(tmpdir, name), encoding="utf-8") as f:
+                    schemas.append(json.load(f))
+        lite = [schema for schema in schemas if schema["model"] == "lite"]
+        assert lite and all(len(schema["translations"]) == 1 for schema in lite)
+        assert all(not isinstance(entry["en"], dict) for schema in lite for entry in schema["translations"].values())
+
+
+def test_failing_and_rate_limited_models_fall_back(monkeypatch):
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+    backends = {
+        "main": FakeBackend(server_error_rate=1, model="main"),
+        "busy": FakeBackend(rate_limit_rate=1, retry_after=0, model="busy"),
+        "backup": FakeBackend(model="backup"),
+    }
+    router = ModelRouter(backends.__getitem__, "main", fallbacks=["busy", "backup"])
+    telemetry = Telemetry("main")
+
+    results, failures = run_batches(router, make_batches(2, 3), telemetry=telemetry)
+
+    assert failures == {}
+    assert {entry["model"] for result in results.values() for entry in result.values()} == {"backup"}
+    assert backends["main"].counts["requests"] == 2 * translate_with_llm.MAX_RETRIES
+    assert backends["busy"].counts["requests"] == 2 * translate_with_llm.FALLBACK_RATE_LIMIT_RETRIES
+    report = telemetry.report()
+    assert report["batch_totals"]["fallbacks"] == 4
+    assert report["models"]["backup"]["batches"] == 2
+
+
+def test_routing_file_rules_and_fallbacks():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "routing.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"rules": RULES, "fallbacks": ["backup"]}, f)
+
+        router = create_router("fake", None, "main", path, ["last-resort"])
+
+    assert router.chain(router.choose({"translations": {"A:ok": {"en": "OK", "missing_translations": {"de": ""}}}})) == \
+        ["lite", "backup", "last-resort", "main"]
+    assert router.backend("lite").model == "lite"
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for caching the shared prompt prefix (instructions and glossary) with the fake backend.
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translate_with_llm
+from batch_planner import heuristic_token_count
+from glossary import glossary_text, load_glossary, memory_prompt_version, select_glossary
+from model_router import ModelRouter
+from telemetry import Telemetry
+from translation_backends import FakeBackend
+
+GLOSSARY = {
+    "terms": {"Streak": "A run of consecutive days with a completed habit", "Focus Mode": {"de": "Fokusmodus", "fr": "Mode concentration"}},
+    "style": {"*": "Short, friendly UI text.", "de": "Address the user informally (du).", "fr": "Vouvoyez l'utilisateur."},
+}
+
+
+def make_batches(count, size, glossary):
+    batches = []
+    for number in range(count):
+        translations = {f"A.xcstrings:key{number}.{i}": {"en": f"Keep your streak {number}.{i}",
+                                                          "missing_translations": {"de": "", "ja": ""}}
+                        for i in range(size)}
+        batches.append((f"batch_{number:04d}", {"instructions": "Translate.", "translations": translations,
+                                                "glossary": glossary}))
+    return batches
+
+
+def translate(router, batches):
+    results = {}
+    telemetry = Telemetry("fake")
+
+    def on_result(name, task_data, translated_data):
+        results.update(translated_data)
+
+    failures = translate_with_llm.translate_batches(router, batches, 1, on_result, telemetry=telemetry)
+    assert failures == {}
+    return results, telemetry.report()
+
+
+def test_prefix_is_cached_once_and_batches_send_only_their_payload():
+    glossary = select_glossary(GLOSSARY, ["de", "ja"])
+    assert "fr" not in glossary["style"] and glossary["terms"]["Focus Mode"] == {"de": "Fokusmodus"}
+    batches = make_batches(4, 10, glossary)
+    prefix, prompt, _ = translate_with_llm.build_prompt(batches[0][1])
+    assert glossary_text(glossary) in prefix and prompt.startswith("Input:\n")
+
+    cached = FakeBackend(cache_min_tokens=0)
+    results, report = translate(ModelRouter(lambda model: cached, "fake"), batches)
+    uncached = FakeBackend(cache_min_tokens=0)
+    uncached_results, uncached_report = translate(ModelRouter(lambda model: uncached, "fake", prompt_cache=False), batches)
+
+    assert results == uncached_results
+    prefix_tokens = heuristic_token_count(prefix)
+    assert cached.counts["caches_created"] == 1
+    assert cached.counts["cached_tokens"] == 4 * prefix_tokens
+    assert cached.counts["uncached_tokens"] < uncached.counts["uncached_tokens"] - 3 * prefix_tokens
+    assert uncached.counts["cached_tokens"] == 0 and uncached_report["tokens"]["cached"] == 0
+    assert report["tokens"]["cached"] == cached.counts["cached_tokens"]
+    assert report["models"]["fake"]["cached_tokens"] == cached.counts["cached_tokens"]
+
+
+def test_prefix_stays_registered_until_the_router_is_released():
+    glossary = select_glossary(GLOSSARY, ["de", "ja"])
+    backend = FakeBackend(cache_min_tokens=0)
+    router = ModelRouter(lambda model: backend, "fake")
+
+    # Like watch mode: every save translates a few batches with the same router
+    translate(router, make_batches(2, 3, glossary))
+    translate(router, make_batches(2, 3, glossary))
+    assert backend.counts["caches_created"] == 1 and len(backend._caches) == 1
+
+    router.release_prefix_caches()
+    assert backend._caches == {}
+
+
+def test_full_prompt_is_sent_when_caching_is_unavailable_or_the_cache_expired():
+    glossary = select_glossary(GLOSSARY, ["de", "ja"])
+    batches = make_batches(3, 5, glossary)
+
+    unsupported = FakeBackend(caching=False, cache_min_tokens=0)
+    results, report = translate(ModelRouter(lambda model: unsupported, "fake"), batches)
+    assert len(results) == 15 and report["tokens"]["cached"] == 0
+    assert unsupported.counts["requests"] == 3
+
+    # Prefixes below the model's caching minimum aren't registered at all
+    short = FakeBackend()
+    translate(ModelRouter(lambda model: short, "fake"), batches)
+    assert short.counts["caches_created"] == 0 and short.counts["requests"] == 3
+
+    backend = FakeBackend(cache_min_tokens=0)
+    router = ModelRouter(lambda model: backend, "fake")
+    prefix, _, _ = translate_with_llm.build_prompt(batches[0][1])
+    backend.drop_cache(router.prefix_cache("fake", prefix))
+    results, report = translate(router, batches)
+    # The first batch is resent in full, the next ones use a newly registered prefix
+    assert len(results) == 15
+    assert backend.counts["caches_created"] == 2
+    assert backend.counts["requests"] == 4
+    assert report["tokens"]["cached"] == backend.counts["cached_tokens"] == 2 * heuristic_token_count(prefix)
+
+
+def test_glossary_file_is_validated_and_keys_translation_memory():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "glossary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(GLOSSARY, f)
+        assert load_glossary(path) == GLOSSARY
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"terms": {"Streak": ["Serie"]}}, f)
+        with pytest.raises(ValueError):
+            load_glossary(path)
+
+    assert memory_prompt_version(None) != memory_prompt_version(select_glossary(GLOSSARY, ["de"]))
+    assert memory_prompt_version(select_glossary(GLOSSARY, ["de"])) != memory_prompt_version(select_glossary(GLOSSARY, ["fr"]))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared rate limiter and the error-classified retry policy.
+"""
+
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translate_with_llm
+from rate_limiter import (BAD_REQUEST, PARSE_ERROR, RATE_LIMIT, SERVER_ERROR, MalformedResponse, RateLimiter,
+                          classify_error, retry_after)
+from translation_backends import FakeAPIError, create_backend
+from test_translate_with_llm import make_batches, run_batches
+
+
+def test_errors_are_classified_and_retry_hints_read():
+    quota = FakeAPIError(429, 'RESOURCE_EXHAUSTED', "Quota exceeded. Please retry in 1.5s.",
+                         [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "12s"}])
+    assert classify_error(quota) == RATE_LIMIT
+    assert retry_after(quota) == 12.0
+    assert retry_after(Exception("429 Too Many Requests, retry in 250ms")) == 0.25
+
+    http_error = Exception("Too Many Requests")
+    http_error.response = SimpleNamespace(status_code=429, headers={"Retry-After": "3"})
+    assert classify_error(http_error) == RATE_LIMIT
+    assert retry_after(http_error) == 3.0
+
+    assert classify_error(FakeAPIError(503, 'UNAVAILABLE', "The model is overloaded.")) == SERVER_ERROR
+    assert classify_error(FakeAPIError(400, 'INVALID_ARGUMENT', "Bad schema.")) == BAD_REQUEST
+    assert classify_error(json.JSONDecodeError("Expecting value", "", 0)) == PARSE_ERROR
+    assert classify_error(MalformedResponse("Response is not a dictionary")) == PARSE_ERROR
+    assert classify_error(ValueError("1 validation error for GenerateContentConfig")) != PARSE_ERROR
+    assert retry_after(FakeAPIError(500, 'INTERNAL', "An internal error has occurred.")) is None
+
+
+def test_token_budgets_pace_requests():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=600)  # buckets of 60 each
+
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire(10)
+    assert time.monotonic() - start < 0.1  # a full bucket allows a burst
+
+    limiter.settle(10, 15)  # the last request was bigger than estimated: 5 of 60 tokens left
+    start = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - start >= 0.4  # the 10 tokens/s refill covers the other 5
+
+
+def test_quota_rate_limits_are_waited_out_and_bad_requests_not_retried(monkeypatch):
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+
+    backend = create_backend("fake:rate_limit_rate=0.5,retry_after=0.01,seed=3")
+    results, failures = run_batches(backend, make_batches(6, 5), limiter=RateLimiter())
+    assert failures == {}
+    assert len(results) == 6
+    assert backend.counts["rate_limited"] > 0
+
+    backend = create_backend("fake:bad_request_rate=1")
+    results, failures = run_batches(backend, make_batches(1, 1))
+    assert list(failures) == ["batch_0000"]
+    assert backend.counts["requests"] == 1
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the plan command: predicting a run without calling the API.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import localize
+from run_planner import load_calibration, simulate_wall_time
+
+SAMPLE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_xcstrings")
+LANGUAGES = "ar,de,fr,ja"
+
+
+def make_run_args(folder, cache_dir, metrics_file):
+    return argparse.Namespace(
+        folder=folder, include=None, exclude=None, languages=LANGUAGES, api_key=None,
+        backend="fake:latency=0.02,seconds_per_token=0.001", routing=None, variants=None, glossary=None,
+        no_prompt_cache=False, fallback_model=None, model=localize.DEFAULT_MODEL, concurrency=1, cache_dir=cache_dir,
+        cache_max_mb=50, full_scan=False, job_dir=None, resume=False, stream=False, max_tokens=200, max_output_tokens=32000,
+        tokenizer="heuristic", metrics_file=metrics_file, rpm=None, tpm=None, shard=None, shard_by="language",
+        shard_output=None,
+    )
+
+
+def make_plan_args(folder, cache_dir=None, metrics=None):
+    return argparse.Namespace(
+        folder=folder, include=None, exclude=None, languages=LANGUAGES, model=localize.DEFAULT_MODEL, routing=None,
+        glossary=None, concurrency=1, rpm=None, tpm=None, cache_dir=cache_dir, full_scan=False, metrics=metrics,
+        max_tokens=200, max_output_tokens=32000, tokenizer="heuristic", shard=None, shard_by="language",
+        languages_only=False, json=True,
+    )
+
+
+def plan(args, capsys):
+    assert localize.plan(args) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_plan_predicts_the_batches_and_tokens_of_the_run(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        uncalibrated = plan(make_plan_args(folder), capsys)
+        assert uncalibrated["calibration"]["runs"] == 0
+        assert uncalibrated["languages"] == {"ar": 2, "de": 3, "fr": 3, "ja": 3}
+        assert uncalibrated["catalogs"]["Localizable.xcstrings"] == {"strings": 3, "translations": 11}
+
+        metrics_file = os.path.join(tmpdir, "metrics.json")
+        assert localize.run(make_run_args(folder, None, metrics_file)) == 0
+        capsys.readouterr()
+        with open(metrics_file, encoding="utf-8") as f:
+            metrics = json.load(f)
+
+        # Planned on the untranslated catalogs again, calibrated with the run's metrics
+        shutil.rmtree(folder)
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        report = plan(make_plan_args(folder, metrics=[metrics_file]), capsys)
+        assert report["batches"] == metrics["counters"]["batches_planned"] > 1
+        assert report["tokens"]["estimated_input"] == metrics["counters"]["estimated_input_tokens"]
+        assert abs(report["tokens"]["predicted_input"] - metrics["tokens"]["prompt"]) <= report["batches"]
+        assert abs(report["tokens"]["predicted_output"] - metrics["tokens"]["output"]) <= report["batches"]
+        assert report["calibration"]["runs"] == 1 and report["calibration"]["batches"] == report["batches"]
+        # The fitted latency predicts the recorded translate time within reason
+        batch_seconds = sum(batch["seconds"] for batch in metrics["batches"].values())
+        assert 0.5 * batch_seconds < report["wall_seconds"] < 2 * batch_seconds
+
+
+def test_plan_only_reads_the_cache(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = os.path.join(tmpdir, "xcstrings")
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        cache_dir = os.path.join(tmpdir, "cache")
+        assert localize.run(make_run_args(folder, cache_dir, os.path.join(cache_dir, "metrics.json"))) == 0
+        capsys.readouterr()
+
+        shutil.rmtree(folder)
+        shutil.copytree(SAMPLE_FOLDER, folder)
+        before = {name: open(os.path.join(cache_dir, name), "rb").read() for name in os.listdir(cache_dir)
+                  if os.path.isfile(os.path.join(cache_dir, name))}
+        report = plan(make_plan_args(folder, cache_dir), capsys)
+
+        # Everything was translated before, so a run would only use translation memory
+        assert report["from_memory"] == 3 and report["batches"] == 0
+        assert report["calibration"]["runs"] == 1
+        after = {name: open(os.path.join(cache_dir, name), "rb").read() for name in before}
+        assert after == before
+        assert sorted(os.listdir(cache_dir)) == sorted(before)
+
+
+def test_wall_time_follows_concurrency_and_rate_limits():
+    batches = [("model", 1000, 10.0)] * 8
+    assert simulate_wall_time(batches, 1) == 80.0
+    assert simulate_wall_time(batches, 4) == 20.0
+    # Two requests a minute: one every 30 seconds, however many workers there are
+    assert simulate_wall_time(batches, 4, rpm=2) == 220.0
+    # Budgets are per model
+    assert simulate_wall_time([("a", 1000, 10.0), ("b", 1000, 10.0)], 2, rpm=2) == 10.0
+    assert load_calibration([os.path.join(SAMPLE_FOLDER, "missing.json")])["runs"] == 0
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for detecting translations whose English source changed.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source_fingerprints import SourceFingerprints
+
+
+def test_partly_redone_translations_stay_stale_per_language():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fingerprints = SourceFingerprints(tmpdir)
+        stale_languages = fingerprints.stale_languages("A.xcstrings")
+
+        # Unknown keys are adopted with their current source
+        assert stale_languages("greeting", "Hello", ["de", "fr", "ja"]) == []
+        assert stale_languages("greeting", "Hi", ["de", "fr", "ja"]) == ["de", "fr", "ja"]
+
+        # Only German was redone (e.g. the other shards never merged)
+        fingerprints.record("A.xcstrings", "greeting", "Hi", ["de"])
+        fingerprints.save()
+
+        fingerprints = SourceFingerprints(tmpdir)
+        stale_languages = fingerprints.stale_languages("A.xcstrings")
+        assert stale_languages("greeting", "Hi", ["de", "fr", "ja"]) == ["fr", "ja"]
+
+        fingerprints.record("A.xcstrings", "greeting", "Hi", ["fr", "ja"])
+        assert stale_languages("greeting", "Hi", ["de", "fr", "ja"]) == []
+        # Every translation is current again, so the record collapses to one fingerprint
+        assert isinstance(fingerprints.catalogs["A.xcstrings"]["greeting"], str)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Tests for the translate stage against the local fake backend.
+"""
+
+import os
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translate_with_llm
+from model_router import ModelChain, ModelRouter
+from telemetry import Telemetry
+from translation_backends import FakeBackend, create_backend
+from validation import validate_entry
+
+LANGUAGES = ["de", "ja"]
+
+
+def make_batches(count, size):
+    batches = []
+    for number in range(count):
+        translations = {}
+        for i in range(size):
+            en = {"one": f"%lld file {i}", "other": f"%lld files {i}"} if i % 5 == 0 else f"String {number}.{i}"
+            translations[f"A.xcstrings:key{number}.{i}"] = {"en": en, "missing_translations": {lang: "" for lang in LANGUAGES}}
+        batches.append((f"batch_{number:04d}", {"instructions": "Translate.", "translations": translations}))
+    return batches
+
+
+def run_batches(backend, batches, **kwargs):
+    results = {}
+
+    def on_result(name, task_data, translated_data):
+        results[name] = translated_data
+        return translated_data
+
+    failures = translate_with_llm.translate_batches(backend, batches, 4, on_result, **kwargs)
+    return results, failures
+
+
+class ScriptedBackend:
+    """Answers each request with respond(items), items being {short id: English} of the compact payload."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def answer(self, prompt):
+        payload = json.loads(prompt.rsplit("\n", 1)[-1])
+        items = {short_id: en for group in payload["groups"] for short_id, en in group["items"].items()}
+        langs = {short_id: group["langs"] for group in payload["groups"] for short_id in group["items"]}
+        self.requests.append(sorted(items.values(), key=str))
+        answer = self.respond(items)
+        if isinstance(answer, str):
+            return answer
+        return json.dumps({short_id: {lang: f"[{lang}] {items[short_id]}" for lang in langs[short_id]}
+                           for short_id in answer})
+
+    def generate(self, prompt, response_schema, cache=None):
+        return SimpleNamespace(text=self.answer(prompt), usage_metadata=None)
+
+    def generate_stream(self, prompt, response_schema, cache=None):
+        text = self.answer(prompt)
+        for start in range(0, len(text), 16):
+            yield SimpleNamespace(text=text[start:start + 16], usage_metadata=None)
+
+
+def scripted_entries(*texts):
+    return {"instructions": "Translate.",
+            "translations": {f"A.xcstrings:{text}": {"en": text, "missing_translations": {"de": ""}} for text in texts}}
+
+
+def translate_scripted(respond, task_data, stream=False):
+    backend = ScriptedBackend(respond)
+    chain = ModelChain(ModelRouter(lambda model: backend, "scripted", prompt_cache=False), ["scripted"])
+    stats = {}
+    translated = translate_with_llm.translate_entries(chain, task_data, stats, stream=stream)
+    return translated, stats, backend.requests
+
+
+def test_wire_format_round_trip():
+    translations = {
+        "A.xcstrings:ok": {"en": "OK", "missing_translations": {"de": "", "ja": ""}},
+        "A.xcstrings:files": {"en": {"one": "%lld file", "other": "%lld files"}, "missing_translations": {"de": "", "ja": ""}},
+        "B.xcstrings:ok": {"en": "OK", "missing_translations": {"fr": ""}},
+    }
+    payload, ids = translate_with_llm.encode_batch(translations)
+
+    # Short ids, and each language set is sent once for its group
+    assert payload == {"groups": [
+        {"langs": ["de", "ja"], "items": {"1": "OK", "2": {"one": "%lld file", "other": "%lld files"}}},
+        {"langs": ["fr"], "items": {"3": "OK"}},
+    ]}
+    assert ids == {"1": "A.xcstrings:ok", "2": "A.xcstrings:files", "3": "B.xcstrings:ok"}
+
+    answer = {
+        "1": {"de": "OK", "ja": "OK"},
+        "2": {"de": {"one": "%lld Datei", "other": "%lld Dateien"}, "ja": {"other": "%lld ファイル"}},
+        "3": {"fr": "D'accord"},
+        # Ids that weren't sent are ignored
+        "9": {"de": "Unbekannt"},
+    }
+    chain = ModelChain(ModelRouter(lambda model: ScriptedBackend(lambda items: json.dumps(answer)), "scripted",
+                                   prompt_cache=False), ["scripted"])
+    translated = translate_with_llm.request_translations(chain, {"instructions": "Translate.", "translations": translations},
+                                                         {}, retry_parse_errors=False)
+
+    assert sorted(translated) == sorted(translations)
+    assert translated["A.xcstrings:files"] == {"en": {"one": "%lld file", "other": "%lld files"},
+                                               "missing_translations": answer["2"], "model": "scripted"}
+    assert translated["B.xcstrings:ok"]["missing_translations"] == {"fr": "D'accord"}
+    assert translate_with_llm.decode_entry(translations, "A.xcstrings:ok", answer["1"]) == \
+        {"en": "OK", "missing_translations": {"de": "OK", "ja": "OK"}}
+
+
+def test_malformed_response_is_split_in_halves(monkeypatch):
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+    # Anything over two strings comes back malformed
+    respond = lambda items: "{not json" if len(items) > 2 else list(items)
+    translated, stats, requests = translate_scripted(respond, scripted_entries("a", "b", "c", "d"))
+
+    assert sorted(translated) == ["A.xcstrings:a", "A.xcstrings:b", "A.xcstrings:c", "A.xcstrings:d"]
+    assert requests == [["a", "b", "c", "d"], ["a", "b"], ["c", "d"]]
+    assert stats["splits"] == 1 and "dropped" not in stats
+
+
+def test_incomplete_response_keeps_its_complete_entries():
+    for stream in (False, True):
+        # The first answer stops after two strings; in a stream it is cut off mid-entry
+        def respond(items):
+            if len(items) < 4:
+                return list(items)
+            text = json.dumps({"1": {"de": "[de] a"}, "2": {"de": "[de] b"}, "3": {"de": "[de] c"}})
+            return text[:-12] if stream else list(items)[:2]
+
+        translated, stats, requests = translate_scripted(respond, scripted_entries("a", "b", "c", "d"), stream)
+
+        assert translated["A.xcstrings:a"]["missing_translations"] == {"de": "[de] a"}
+        assert len(translated) == 4
+        # Only the missing strings are asked for again, in one follow-up
+        assert requests == [["a", "b", "c", "d"], ["c", "d"]]
+        assert stats["follow_ups"] == 1 and "splits" not in stats
+
+
+def test_entry_that_keeps_failing_is_dropped(monkeypatch):
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+    # Any request containing "bad" comes back malformed
+    respond = lambda items: "{not json" if "bad" in items.values() else list(items)
+    translated, stats, requests = translate_scripted(respond, scripted_entries("a", "bad", "c"))
+
+    assert sorted(translated) == ["A.xcstrings:a", "A.xcstrings:c"]
+    assert stats["dropped"] == 1
+    # A single entry is retried before it is given up on
+    assert requests.count(["bad"]) == translate_with_llm.MAX_RETRIES
+
+
+def test_other_value_errors_fail_the_batch_instead_of_splitting_it(monkeypatch):
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+
+    def respond(items):
+        raise ValueError("1 validation error for GenerateContentConfig")
+
+    with pytest.raises(ValueError, match="GenerateContentConfig"):
+        translate_scripted(respond, scripted_entries("a", "b", "c", "d"))
+
+
+def test_fake_backend_translates_every_batch():
+    backend = FakeBackend(latency=0.01, latency_dist="lognormal")
+    batches = make_batches(6, 20)
+    results, failures = run_batches(backend, batches)
+
+    assert failures == {}
+    assert sorted(results) == [name for name, _ in batches]
+    entry = results["batch_0002"]["A.xcstrings:key2.5"]
+    assert entry["missing_translations"]["ja"] == {"one": "[ja] %lld file 5", "other": "[ja] %lld files 5"}
+    assert backend.counts["requests"] == 6
+
+
+def test_truncated_and_fenced_responses_are_recovered(monkeypatch):
+    """Truncated responses are bisected, fenced ones parsed, and injected API errors retried."""
+    monkeypatch.setattr(translate_with_llm, "RETRY_DELAY", 0)
+    backend = create_backend("fake:truncate_rate=0.3,fence_rate=0.5,server_error_rate=0.2,seed=7")
+    batches = make_batches(4, 16)
+
+    for stream in (False, True):
+        streamed = []
+        results, failures = run_batches(backend, batches, stream=stream,
+                                        on_entry=lambda name, entry_id, entry: streamed.append(entry_id))
+        assert failures == {}
+        for name, task_data in batches:
+            assert set(results[name]) == set(task_data["translations"])
+        assert len(streamed) == (64 if stream else 0)
+
+    assert backend.counts["truncated"] and backend.counts["fenced"] and backend.counts["server_errors"]
+
+
+def test_only_invalid_entries_are_requested_again():
+    """Entries failing validation are re-requested in a small follow-up batch, the valid ones are kept."""
+    backend = FakeBackend(invalid_rate=0.2, seed=2)
+    batches = make_batches(3, 20)
+    telemetry = Telemetry("fake")
+
+    results, failures = run_batches(backend, batches, telemetry=telemetry)
+
+    assert failures == {}
+    for name, task_data in batches:
+        for entry_id, entry in task_data["translations"].items():
+            assert validate_entry(entry, results[name][entry_id]) == []
+    totals = telemetry.report()["batch_totals"]
+    assert totals["rejected"] == backend.counts["invalid_entries"] > 0
+    assert totals["follow_ups"] >= 3 and totals["splits"] == 0
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent translation memory.
+"""
+
+import os
+import sys
+import importlib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_memory import TranslationMemory
+
+enforce = importlib.import_module('enforce_100%_translation')
+
+
+def test_lookup_and_store():
+    """Translations are keyed by source, language and model."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        memory = TranslationMemory(tmpdir, 'model-a')
+        assert memory.lookup("Cancel", "de") is None
+
+        memory.store("Cancel", "de", "Abbrechen")
+        memory.store({"one": "%lld item", "other": "%lld items"}, "de",
+                     {"one": "%lld Element", "other": "%lld Elemente"})
+        memory.close()
+
+        memory = TranslationMemory(tmpdir, 'model-a')
+        assert memory.lookup("Cancel", "de") == "Abbrechen"
+        assert memory.lookup("Cancel", "fr") is None
+        assert memory.lookup({"other": "%lld items", "one": "%lld item"}, "de")["one"] == "%lld Element"
+        assert memory.stats()["hits"] == 2
+        assert memory.stats()["misses"] == 1
+        memory.close()
+
+        # A different model never sees another model's translations
+        memory = TranslationMemory(tmpdir, 'model-b')
+        assert memory.lookup("Cancel", "de") is None
+        memory.close()
+
+
+def test_size_based_eviction():
+    """The least recently used entries are evicted once the size limit is exceeded."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        memory = TranslationMemory(tmpdir, 'model-a', max_bytes=300)
+        for i in range(10):
+            memory.store(f"String {i}", "de", f"Zeichenkette {i}")
+        memory.lookup("String 0", "de")
+
+        assert memory.evict() > 0
+        assert memory.total_size() <= 300
+        assert memory.lookup("String 0", "de") == "Zeichenkette 0"
+        assert memory.lookup("String 1", "de") is None
+        memory.close()
+
+
+def test_resolve_from_memory():
+    """Hits are split out of the missing translations before batching."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        memory = TranslationMemory(tmpdir, 'model-a')
+        memory.store("Cancel", "de", "Abbrechen")
+
+        missing = {"A.xcstrings": {"cancel": {"en": "Cancel", "missing_langs": ["de", "fr"]}}}
+        remaining, resolved = enforce.resolve_from_memory(missing, memory)
+        memory.close()
+
+        assert remaining == {"A.xcstrings": {"cancel": {"en": "Cancel", "missing_langs": ["fr"]}}}
+        assert resolved == {"A.xcstrings:cancel": {"en": "Cancel", "missing_translations": {"de": "Abbrechen"}}}
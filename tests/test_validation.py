@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for validating translated entries against their English source.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation import format_specifiers, validate_entry
+
+
+def answer(**translations):
+    return {"missing_translations": translations}
+
+
+def test_format_specifiers_ignore_positions_and_literal_percent():
+    assert format_specifiers("%1$@ has %lld items (100%% done, 50% off)") == {"@": 1, "lld": 1}
+    assert format_specifiers("%.2f of %2$@") == format_specifiers("%2$@: %.2f")
+
+
+def test_entries_are_checked_for_coverage_plurals_and_specifiers():
+    entry = {"en": "%@ shared %lld files", "missing_translations": {"de": "", "fr": ""}}
+    assert validate_entry(entry, answer(de="%@ hat %lld Dateien geteilt", fr="%2$lld fichiers partagés par %1$@")) == []
+    assert validate_entry(entry, answer(de="%@ hat %d Dateien geteilt", fr="")) == \
+        ["de: missing %lld", "fr: missing"]
+    assert validate_entry(entry, None) == ["not returned"]
+
+    plural = {"en": {"one": "One file", "other": "%lld files"}, "missing_translations": {"de": "", "ja": ""}}
+    # "one" may add the count English leaves out, but "other" must keep it
+    assert validate_entry(plural, answer(de={"one": "%lld Datei", "other": "%lld Dateien"},
+                                         ja={"one": "1 ファイル", "other": "%lld ファイル"})) == []
+    assert validate_entry(plural, answer(de={"one": "Eine Datei"}, ja={"one": "%@", "other": "ファイル"})) == \
+        ["de: missing plural form 'other'", "ja (one): unexpected %@", "ja (other): missing %lld"]
@@ -2,6 +2,7 @@
 """
 Translate missing localization strings using Google Gemini AI.
 Reads llm_translation_task_*.json files and populates translations.
+The model API is reached through a backend (see translation_backends.py).
 """
 
 import json
@@ -10,113 +11,563 @@ import os
 import sys
 import time
 import argparse
-from google import genai
-from google.genai import types
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from glossary import glossary_text, memory_prompt_version
+from incremental_json import ObjectStreamParser
+from job_journal import DONE, SCRIPT_JOB_DIR, JobJournal
+from model_router import ModelChain, ModelRouter, create_router, describe_routing
+from rate_limiter import (BAD_REQUEST, MAX_BACKOFF, PARSE_ERROR, RATE_LIMIT, MalformedResponse, backoff_delay,
+                          classify_error, retry_after)
+from telemetry import Telemetry
+from translation_backends import DEFAULT_MODEL
+from translation_memory import DEFAULT_MAX_BYTES, TranslationMemory
+from validation import validate_entry
 
-def translate_batch(client, translation_data, batch_number, total_batches):
+# Attempts per request, attempts while rate limited (fewer when there is a
+# fallback model to move on to), and the base backoff delay in seconds
+# (doubled after each failure, with jitter)
+MAX_RETRIES = 3
+MAX_RATE_LIMIT_RETRIES = 6
+FALLBACK_RATE_LIMIT_RETRIES = 2
+RETRY_DELAY = 2
+
+# Sent with a follow-up batch for entries that failed validation
+FOLLOW_UP_NOTE = ("Some earlier translations were rejected: keep every format specifier of the English text "
+                  "(such as %@, %lld or %1$@) and return every plural form that the English text has.")
+
+
+def record_usage(stats, response, model=None):
+    """Add the token usage reported with a response to a stats dict (and to its model's usage)."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+    cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+    output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+    stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + prompt_tokens
+    stats['cached_tokens'] = stats.get('cached_tokens', 0) + cached_tokens
+    stats['output_tokens'] = stats.get('output_tokens', 0) + output_tokens
+    if model is not None:
+        model_stats = stats.setdefault('models', {}).setdefault(model, {})
+        model_stats['prompt_tokens'] = model_stats.get('prompt_tokens', 0) + prompt_tokens
+        model_stats['cached_tokens'] = model_stats.get('cached_tokens', 0) + cached_tokens
+        model_stats['output_tokens'] = model_stats.get('output_tokens', 0) + output_tokens
+
+
+# Structured output: {item id: {language: translation}}, where a plural
+# translation is an object of {plural form: value}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "additionalProperties": {
+            "anyOf": [
+                {"type": "string"},
+                {"type": "object", "additionalProperties": {"type": "string"}}
+            ]
+        }
+    }
+}
+
+
+def encode_batch(translations):
+    """
+    Encode task entries into the compact wire format sent to the model.
+
+    Entries get short numeric ids and are grouped by their set of missing
+    languages, so each language list is sent once per group instead of as a
+    {lang: ""} scaffold per entry.
+
+    Returns:
+        Tuple of (payload, ids) where ids maps each short id to its "file:key" entry id
+    """
+    groups = {}
+    ids = {}
+    for entry_id, entry in translations.items():
+        langs = tuple(entry['missing_translations'])
+        short_id = str(len(ids) + 1)
+        ids[short_id] = entry_id
+        groups.setdefault(langs, {})[short_id] = entry['en']
+
+    payload = {"groups": [{"langs": list(langs), "items": items} for langs, items in groups.items()]}
+    return payload, ids
+
+
+def decode_entry(translations, entry_id, value):
+    """Expand a compact {lang: translation} answer back into a task entry."""
+    return {"en": translations[entry_id]['en'], "missing_translations": value}
+
+
+def build_prompt(translation_data):
+    """
+    Build the Gemini prompt for a batch of strings.
+
+    The prompt is split into a prefix that is the same for every batch of a
+    run (instructions, rules and the glossary), which can be cached by the
+    provider, and the batch's own part: a follow-up note, if any, and the
+    compact payload on the last line. Without caching, both are sent as
+    f"{prefix}\n\n{prompt}".
+
+    Returns:
+        Tuple of (prefix, prompt, ids) where ids maps the short ids used in the
+        prompt back to "file:key" entry ids
+    """
+    payload, ids = encode_batch(translation_data['translations'])
+    prefix = f"""{translation_data['instructions']}
+
+Translate every English string in "items" into each language listed in its group's "langs". A string given as an object holds plural forms: translate each form following the target language's plural rules and return an object with the same forms.
+
+Return ONLY a JSON object mapping each item id to an object of {{language code: translation}}, with no additional text or explanation."""
+    glossary = glossary_text(translation_data.get('glossary'))
+    if glossary:
+        prefix = f"{prefix}\n\n{glossary}"
+
+    prompt = f"Input:\n{json.dumps(payload, ensure_ascii=False, separators=(',', ':'))}"
+    if translation_data.get('note'):
+        prompt = f"{translation_data['note']}\n\n{prompt}"
+    return prefix, prompt, ids
+
+
+def parse_response(response_text):
+    """
+    Parse a model response into a dictionary.
+
+    Raises:
+        json.JSONDecodeError: The response is not valid (e.g. truncated) JSON
+        MalformedResponse: The response is not a JSON object
+    """
+    response_text = response_text.strip()
+
+    # Remove markdown code blocks if present
+    if response_text.startswith('```'):
+        # Find the actual JSON content
+        lines = response_text.split('\n')
+        json_lines = []
+        in_code_block = False
+
+        for line in lines:
+            if line.startswith('```'):
+                in_code_block = not in_code_block
+                continue
+            if in_code_block or not line.startswith('```'):
+                json_lines.append(line)
+
+        response_text = '\n'.join(json_lines).strip()
+
+    # Parse JSON response
+    translated_data = json.loads(response_text)
+
+    # Validate the response has the expected structure
+    if not isinstance(translated_data, dict):
+        raise MalformedResponse("Response is not a dictionary")
+
+    return translated_data
+
+
+def stream_translations(chain, prompt, ids, entries, stats, on_entry, cache=None):
+    """
+    Stream a response, parsing entries incrementally as their objects close.
+
+    Complete entries are handed to on_entry(entry_id, entry) right away. If
+    the stream is cut off after some entries arrived, those are returned.
+
+    Returns:
+        Dictionary of {entry_id: task entry} decoded from the response (possibly partial)
+
+    Raises:
+        json.JSONDecodeError: Nothing usable arrived before the response ended
+    """
+    parser = ObjectStreamParser()
+    translated_data = {}
+    last_chunk = None
+
+    try:
+        for chunk in chain.backend.generate_stream(prompt, RESPONSE_SCHEMA, cache=cache):
+            last_chunk = chunk
+            for short_id, value in parser.feed(chunk.text or ''):
+                if short_id not in ids:
+                    continue
+                entry_id = ids[short_id]
+                translated_entry = decode_entry(entries, entry_id, value)
+                translated_data[entry_id] = translated_entry
+                if on_entry is not None and not validate_entry(entries[entry_id], translated_entry):
+                    on_entry(entry_id, translated_entry)
+    except Exception as e:
+        if not translated_data:
+            raise
+        print(f"  ⚠️  Stream interrupted after {len(translated_data)} entries: {e}")
+    finally:
+        # Usage metadata is cumulative, the last chunk carries the totals
+        if last_chunk is not None:
+            record_usage(stats, last_chunk, chain.model)
+
+    if not parser.closed and not translated_data:
+        raise json.JSONDecodeError("Response ended before any entry was complete", parser.buffer, parser.pos)
+    return translated_data
+
+
+def request_translations(chain, translation_data, stats, retry_parse_errors, stream=False, on_entry=None):
+    """
+    Send one request for a batch, retrying failures according to their kind.
+
+    Rate limits wait for the server's retry hint (or a jittered backoff) and
+    have their own, larger retry budget; server errors back off with jitter;
+    bad requests are not retried, since resending them can't succeed. When a
+    model runs out of retries for rate limits or API errors, the request
+    falls back to the next model of the chain.
+
+    The prompt prefix is registered once per model with the provider's
+    context caching (see ModelRouter.prefix_cache), so only the batch's own
+    part is sent. If a request with the cached prefix is rejected (e.g. the
+    cache expired), it is resent with the full prompt and the prefix is
+    registered again for the next batch.
+
+    Args:
+        chain: ModelChain with the batch's models in fallback order
+        translation_data: Dictionary containing instructions and translations
+        stats: Dict receiving attempts and token usage
+        retry_parse_errors: Also retry malformed responses. Multi-entry batches
+            don't: resending the same prompt usually truncates the same way, so
+            the caller splits the batch instead.
+        stream: Consume the response as a stream and parse it incrementally
+        on_entry: With stream, called as on_entry(entry_id, entry) for every
+            complete entry as soon as it arrives
+
+    Returns:
+        Dictionary of {entry_id: task entry} decoded from the response, each
+        entry recording the model that translated it
+    """
+    prefix, prompt, ids = build_prompt(translation_data)
+    entries = translation_data['translations']
+    failures = 0
+    rate_limits = 0
+    use_cache = True
+
+    while True:
+        stats['attempts'] = stats.get('attempts', 0) + 1
+        response_text = ''
+        cache = None
+        try:
+            cache = chain.router.prefix_cache(chain.model, prefix) if use_cache else None
+            request = prompt if cache is not None else f"{prefix}\n\n{prompt}"
+            if stream:
+                translated_data = stream_translations(chain, request, ids, entries, stats, on_entry, cache)
+            else:
+                response = chain.backend.generate(request, RESPONSE_SCHEMA, cache=cache)
+                record_usage(stats, response, chain.model)
+
+                response_text = response.text or ''
+                translated_data = {
+                    ids[short_id]: decode_entry(entries, ids[short_id], value)
+                    for short_id, value in parse_response(response_text).items()
+                    if short_id in ids
+                }
+            for translated_entry in translated_data.values():
+                translated_entry['model'] = chain.model
+            return translated_data
+
+        except Exception as e:
+            kind = classify_error(e)
+
+            if cache is not None and kind == BAD_REQUEST:
+                print(f"  ⚠️  Cached prompt prefix rejected, sending the full prompt: {e}")
+                chain.router.forget_prefix_cache(chain.model, prefix)
+                use_cache = False
+                continue
+
+            if kind == RATE_LIMIT:
+                rate_limits += 1
+                stats['rate_limited'] = stats.get('rate_limited', 0) + 1
+                budget = FALLBACK_RATE_LIMIT_RETRIES if chain.can_fall_back() else MAX_RATE_LIMIT_RETRIES
+                if rate_limits >= budget:
+                    if fall_back(chain, stats, f"rate limited {rate_limits} times"):
+                        failures = rate_limits = 0
+                        continue
+                    print(f"  ❌ Still rate limited after {rate_limits} attempts: {e}")
+                    raise
+                hint = retry_after(e)
+                delay = min(hint, MAX_BACKOFF) if hint is not None else backoff_delay(rate_limits - 1, RETRY_DELAY)
+                print(f"  ⏳ Rate limited, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            failures += 1
+            if kind == PARSE_ERROR:
+                print(f"  ⚠️  JSON parsing error (attempt {failures}/{MAX_RETRIES}): {e}")
+                if not retry_parse_errors or failures >= MAX_RETRIES:
+                    if response_text:
+                        print(f"  Response was: {response_text[:200]}...")
+                    raise
+            elif kind == BAD_REQUEST:
+                print(f"  ❌ Request rejected, not retrying: {e}")
+                raise
+            else:
+                print(f"  ⚠️  API error (attempt {failures}/{MAX_RETRIES}): {e}")
+                if failures >= MAX_RETRIES:
+                    if fall_back(chain, stats, f"failed {failures} times"):
+                        failures = rate_limits = 0
+                        continue
+                    print(f"  ❌ Failed after {MAX_RETRIES} attempts")
+                    raise
+
+            time.sleep(backoff_delay(failures - 1, RETRY_DELAY))
+
+
+def fall_back(chain, stats, reason):
+    """Move a batch to its next model, returning whether there was one."""
+    model = chain.model
+    if not chain.fall_back():
+        return False
+    stats['fallbacks'] = stats.get('fallbacks', 0) + 1
+    print(f"  🔀 {model} {reason}, falling back to {chain.model}")
+    return True
+
+
+def translate_entries(chain, translation_data, stats, stream=False, on_entry=None, follow_up=False):
+    """
+    Translate a batch, re-requesting only the entries that fail validation.
+
+    Every returned entry is validated against its source (see validation.py).
+    Valid entries are kept; the failing ones are re-queued together as one
+    small follow-up batch, with a reminder of the rules they broke. When a
+    request makes no progress at all (e.g. the response was malformed), the
+    entries are split in half instead, recursing down to single entries. A
+    single entry that still fails is dropped (and counted in stats['dropped'])
+    so it is picked up again by the next run instead of failing the whole batch.
+
+    Returns:
+        Dictionary of {entry_id: translated entry} for the valid entries
+    """
+    entries = translation_data['translations']
+    single = len(entries) == 1
+
+    try:
+        translated_data = request_translations(chain, translation_data, stats, retry_parse_errors=single,
+                                               stream=stream, on_entry=on_entry)
+    except (json.JSONDecodeError, MalformedResponse):
+        translated_data = {}
+
+    complete = {}
+    rejected = {}
+    for entry_id, entry in entries.items():
+        problems = validate_entry(entry, translated_data.get(entry_id))
+        if not problems:
+            complete[entry_id] = translated_data[entry_id]
+        elif entry_id in translated_data:
+            rejected[entry_id] = problems
+    if rejected:
+        stats['rejected'] = stats.get('rejected', 0) + len(rejected)
+        for entry_id, problems in list(rejected.items())[:3]:
+            print(f"  🔎 Rejected '{entry_id}': {'; '.join(problems)}")
+    unfinished = [entry_id for entry_id in entries if entry_id not in complete]
+    if not unfinished:
+        return complete
+
+    if complete or (rejected and not follow_up):
+        # The model answered: ask again for just the failing entries
+        print(f"  🔁 Re-requesting {len(unfinished)} of {len(entries)} entries")
+        stats['follow_ups'] = stats.get('follow_ups', 0) + 1
+        parts = [unfinished]
+    elif single:
+        print(f"  ❌ Could not translate '{unfinished[0]}', leaving it for the next run")
+        stats['dropped'] = stats.get('dropped', 0) + 1
+        return complete
+    else:
+        half = len(unfinished) // 2
+        print(f"  ✂️  {len(unfinished)} of {len(entries)} entries unfinished, retrying them in halves")
+        stats['splits'] = stats.get('splits', 0) + 1
+        parts = [unfinished[:half], unfinished[half:]]
+
+    # The note goes with the batch's own part of the prompt, so the cached prefix still applies
+    note = FOLLOW_UP_NOTE if rejected else translation_data.get('note')
+    for part in parts:
+        sub_batch = dict(translation_data, note=note,
+                         translations={entry_id: entries[entry_id] for entry_id in part})
+        complete.update(translate_entries(chain, sub_batch, stats, stream, on_entry, follow_up=True))
+
+    return complete
+
+
+def translate_batch(chain, translation_data, batch_number, total_batches, stats=None, stream=False, on_entry=None):
     """
     Translate a single batch of strings using Gemini.
     
     Args:
-        client: Configured Gemini client
+        chain: ModelChain with the batch's models in fallback order
         translation_data: Dictionary containing instructions and translations
         batch_number: Current batch number (for logging)
         total_batches: Total number of batches
+        stats: Optional dict that receives the number of attempts, the
+            prompt/output token usage reported by the API (also per model),
+            how often the batch was split, fell back, re-requested entries
+            that failed validation or dropped entries, and the model it
+            finished with
+        stream: Stream the response and parse entries as they arrive
+        on_entry: With stream, called as on_entry(entry_id, entry) from the
+            worker thread for every complete entry as soon as it arrives
     
     Returns:
         Dictionary with completed translations
     """
-    print(f"  Processing batch {batch_number}/{total_batches}...")
-    
-    # Create the prompt
-    prompt = f"""{translation_data['instructions']}
+    print(f"  Processing batch {batch_number}/{total_batches} with {chain.model}...")
+    if stats is None:
+        stats = {}
 
-Please translate the following strings. Return ONLY a valid JSON object with the same structure, where each "missing_translations" object is filled with the appropriate translations.
+    try:
+        translated_data = translate_entries(chain, translation_data, stats, stream, on_entry)
+    finally:
+        stats['model'] = chain.model
 
-For plural forms (when "en" is an object with "one" and "other" keys), provide translations for both forms in the target language's plural rules.
+    if stats.get('dropped'):
+        print(f"  ⚠️  Batch {batch_number}/{total_batches} completed without {stats['dropped']} entr(ies)")
+    else:
+        print(f"  ✅ Batch {batch_number}/{total_batches} completed")
+    return translated_data
 
-Input:
-{json.dumps(translation_data['translations'], indent=2, ensure_ascii=False)}
 
-Return only the JSON object with completed translations, no additional text or explanation."""
+def remember_translations(memory, task_data, translated_data):
+    """Store every completed translation of a batch in the translation memory."""
+    for entry_id, entry in task_data['translations'].items():
+        translated_entry = translated_data.get(entry_id)
+        if not isinstance(translated_entry, dict):
+            continue
+        for lang, translation in translated_entry.get('missing_translations', {}).items():
+            memory.store(entry['en'], lang, translation)
 
-    max_retries = 3
-    retry_delay = 2
-    
-    for attempt in range(max_retries):
+
+def translate_batches(backend, batches, concurrency, on_result, journal=None, stream=False, on_entry=None,
+                      telemetry=None, limiter=None):
+    """
+    Translate batches concurrently against one shared backend.
+
+    Args:
+        backend: Translation backend (shared between workers), or a
+            ModelRouter choosing each batch's model and fallback chain. A
+            batch planned for a model (task_data['model']) keeps it.
+        batches: List of (name, task_data) tuples
+        concurrency: Number of batches to keep in flight
+        on_result: Called as on_result(name, task_data, translated_data) in the
+            calling thread as soon as each batch finishes. Its return value is
+            stored as the batch's result payload in the journal.
+        journal: Optional JobJournal checkpointing each batch's status
+        stream: Stream responses and parse entries as they arrive
+        on_entry: With stream, called as on_entry(name, entry_id, entry) from
+            the worker threads for every complete entry as soon as it arrives
+        telemetry: Optional Telemetry receiving each batch's latency, attempts
+            and token usage
+        limiter: Optional RateLimiter every request to a plain backend waits
+            on; workers share its budgets and all pause together after a
+            rate-limit response (a ModelRouter has one limiter per model)
+
+    Returns:
+        Dictionary of {name: exception} for the batches that failed. After the
+        first failure, batches that haven't started yet are cancelled and stay
+        pending in the journal. Prompt prefixes a ModelRouter cached for these
+        batches stay registered for its next batches; release them with
+        router.release_prefix_caches() once it's no longer used.
+    """
+    total_batches = len(batches)
+    failures = {}
+    router = backend
+    if not isinstance(router, ModelRouter):
+        router = ModelRouter(lambda model: backend, getattr(backend, 'model', DEFAULT_MODEL))
+        if limiter is not None:
+            router.limiters[router.model] = limiter
+
+    def work(name, task_data, batch_number, stats):
+        if journal is not None:
+            journal.mark_in_flight(name)
+        entry_callback = None
+        if on_entry is not None:
+            entry_callback = lambda entry_id, entry: on_entry(name, entry_id, entry)
+        start = time.perf_counter()
         try:
-            # Call Gemini API using new SDK
-            response = client.models.generate_content(
-                model='gemini-3-flash-preview',
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.3,
-                    top_p=0.95,
-                    top_k=40,
-                )
-            )
-            
-            # Extract and parse the response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```'):
-                # Find the actual JSON content
-                lines = response_text.split('\n')
-                json_lines = []
-                in_code_block = False
-                
-                for line in lines:
-                    if line.startswith('```'):
-                        in_code_block = not in_code_block
-                        continue
-                    if in_code_block or not line.startswith('```'):
-                        json_lines.append(line)
-                
-                response_text = '\n'.join(json_lines).strip()
-            
-            # Parse JSON response
-            translated_data = json.loads(response_text)
-            
-            # Validate the response has the expected structure
-            if not isinstance(translated_data, dict):
-                raise ValueError("Response is not a dictionary")
-            
-            print(f"  ✅ Batch {batch_number}/{total_batches} completed")
-            return translated_data
-            
-        except json.JSONDecodeError as e:
-            print(f"  ⚠️  JSON parsing error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                print(f"  ❌ Failed to parse response after {max_retries} attempts")
-                print(f"  Response was: {response_text[:200]}...")
-                raise
-                
-        except Exception as e:
-            print(f"  ⚠️  API error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                retry_delay *= 2
-            else:
-                print(f"  ❌ Failed after {max_retries} attempts")
-                raise
+            chain = ModelChain(router, router.chain(task_data.get('model') or router.choose(task_data)))
+            return translate_batch(chain, task_data, batch_number, total_batches, stats, stream, entry_callback)
+        finally:
+            stats['seconds'] = time.perf_counter() - start
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {}
+            for i, (name, task_data) in enumerate(batches, 1):
+                stats = {}
+                futures[executor.submit(work, name, task_data, i, stats)] = (name, task_data, stats)
+
+            for future in as_completed(futures):
+                name, task_data, stats = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    translated_data = future.result()
+                except Exception as e:
+                    print(f"\n❌ Error processing {name}: {e}")
+                    failures[name] = e
+                    if journal is not None:
+                        journal.mark_failed(name, e, stats)
+                    if telemetry is not None:
+                        telemetry.record_batch(name, 'failed', stats, len(task_data['translations']))
+                    # Fail fast: don't start batches that are still queued
+                    for pending in futures:
+                        pending.cancel()
+                    continue
+
+                payload = on_result(name, task_data, translated_data)
+                if journal is not None:
+                    journal.mark_done(name, stats, payload)
+                if telemetry is not None:
+                    telemetry.record_batch(name, 'done', stats, len(task_data['translations']))
+    finally:
+        # A router made here only lives for these batches, and registered
+        # prompt prefixes are billed while they exist
+        if router is not backend:
+            router.release_prefix_caches()
+
+    if telemetry is not None:
+        telemetry.count('rate_limit_wait_seconds', round(router.rate_limit_wait(), 3))
+    return failures
 
 
 def main():
     parser = argparse.ArgumentParser(description='Translate localization strings using Google Gemini AI')
-    parser.add_argument('--api-key', required=True, help='Google Gemini API key')
-    parser.add_argument('--model', default='gemini-3-flash-preview', help='Gemini model to use (default: gemini-3-flash-preview)')
+    parser.add_argument('--api-key', help='Google Gemini API key (required for the gemini backend)')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Gemini model to use (default: {DEFAULT_MODEL})')
+    parser.add_argument('--backend', default='gemini', help='Translation backend: gemini, or fake[:key=value,...] for offline testing (default: gemini)')
+    parser.add_argument('--routing', help='JSON file with rules routing batches to models and a fallback chain')
+    parser.add_argument('--fallback-model', action='append', help='Model to fall back to when a batch keeps failing or is rate limited, repeatable')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of batches to keep in flight (default: 4)')
+    parser.add_argument('--cache-dir', help='Translation memory directory to record translations in (disabled when omitted)')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help='Maximum translation memory size in MB; older entries are evicted past it (default: 50)')
+    parser.add_argument('--job-dir', default=SCRIPT_JOB_DIR, help=f'Directory for the per-batch job journal (default: {SCRIPT_JOB_DIR})')
+    parser.add_argument('--resume', action='store_true', help='Only translate batches the job journal does not list as done')
+    parser.add_argument('--stream', action='store_true', help='Stream responses and parse entries incrementally')
+    parser.add_argument('--metrics-file', help='Write per-batch latency, retries, token usage and estimated cost to this JSON file')
+    parser.add_argument('--rpm', type=int, help='Requests-per-minute budget shared by all workers (default: unlimited)')
+    parser.add_argument('--tpm', type=int, help='Input tokens-per-minute budget shared by all workers (default: unlimited)')
+    parser.add_argument('--no-prompt-cache', action='store_true', help="Send the full prompt with every batch instead of caching its shared prefix")
     
     args = parser.parse_args()
+
+    if args.concurrency < 1:
+        print("❌ Error: --concurrency must be at least 1")
+        sys.exit(1)
+
+    if (args.rpm is not None and args.rpm < 1) or (args.tpm is not None and args.tpm < 1):
+        print("❌ Error: --rpm and --tpm must be at least 1")
+        sys.exit(1)
     
-    # Configure Gemini client with new SDK
     print("🤖 Configuring Gemini AI...")
-    client = genai.Client(api_key=args.api_key)
-    print(f"✅ Using model: {args.model}")
+    try:
+        router = create_router(args.backend, args.api_key, args.model, args.routing, args.fallback_model,
+                               args.rpm, args.tpm, prompt_cache=not args.no_prompt_cache)
+        router.backend(args.model)
+    except (ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    print(f"✅ Using model: {args.model} ({args.backend.split(':')[0]} backend)")
+    for line in describe_routing(router):
+        print(line)
     
     # Find all translation task files
     translation_files = sorted(glob.glob('llm_translation_task_*.json'))
@@ -126,40 +577,69 @@ def main():
         sys.exit(1)
     
     print(f"\n📋 Found {len(translation_files)} translation task file(s)")
+    print(f"⚡ Concurrency: {args.concurrency}")
+
+    journal = JobJournal(args.job_dir)
+    if not args.resume:
+        journal.reset()
+
+    batches = []
+    for filename in translation_files:
+        if journal.status(filename) == DONE:
+            print(f"⏭️  Skipping {filename} (already translated)")
+            continue
+        with open(filename, 'r', encoding='utf-8') as f:
+            batches.append((filename, json.load(f)))
+        journal.add_batch(filename)
     
-    total_batches = len(translation_files)
-    
-    # Process each file
-    for i, filename in enumerate(translation_files, 1):
-        print(f"\n🔄 Processing {filename}...")
-        
-        try:
-            # Load the translation task
-            with open(filename, 'r', encoding='utf-8') as f:
-                task_data = json.load(f)
-            
-            # Translate the batch
-            translated_data = translate_batch(client, task_data, i, total_batches)
-            
-            # Update the file with translations
-            task_data['translations'] = translated_data
-            
-            # Save the updated file
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(task_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"  💾 Saved translations to {filename}")
-            
-            # Small delay between batches to avoid rate limiting
-            if i < total_batches:
-                time.sleep(1)
-                
-        except Exception as e:
-            print(f"\n❌ Error processing {filename}: {e}")
-            print("Translation workflow failed.")
-            sys.exit(1)
-    
-    print(f"\n✅ Successfully translated all {total_batches} batch(es)!")
+    memory = None
+    if args.cache_dir:
+        # Every task file of a run was planned with the same glossary
+        glossary = batches[0][1].get('glossary') if batches else None
+        memory = TranslationMemory(args.cache_dir, args.model, memory_prompt_version(glossary),
+                                   max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    telemetry = Telemetry(args.model)
+
+    def save_result(filename, task_data, translated_data):
+        telemetry.count('strings_translated', len(translated_data))
+        if memory is not None:
+            remember_translations(memory, task_data, translated_data)
+
+        # Update the file with translations as soon as its batch finishes
+        task_data['translations'] = translated_data
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(task_data, f, indent=2, ensure_ascii=False)
+
+        print(f"  💾 Saved translations to {filename}")
+
+    try:
+        with telemetry.stage('translate'):
+            failures = translate_batches(router, batches, args.concurrency, save_result, journal, stream=args.stream,
+                                         telemetry=telemetry)
+    finally:
+        router.release_prefix_caches()
+
+    if memory is not None:
+        # Keep whatever completed, even when other batches failed
+        memory.close()
+        print(f"\n🧠 Recorded {memory.stored} translation(s) in translation memory")
+
+    if failures:
+        # Report in file order so the output doesn't depend on completion order
+        print("\nFailed batches:")
+        for filename in sorted(failures):
+            print(f"  - {filename}: {failures[filename]}")
+        print("Translation workflow failed. Completed batches are kept; rerun with --resume to translate the rest.")
+        telemetry.write(args.metrics_file, 'failed')
+        sys.exit(1)
+
+    dropped = telemetry.dropped()
+    telemetry.write(args.metrics_file, 'incomplete' if dropped else 'success')
+
+    print(f"\n✅ Successfully translated all {len(batches)} batch(es)!")
+    if dropped:
+        print(f"⚠️  {dropped} string(s) kept failing and were left untranslated; they stay missing in the catalogs")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,362 @@
+"""
+Translation backends: the model API a batch prompt is sent to.
+
+A backend has two methods, mirroring the Gemini SDK calls the translator
+makes:
+
+    generate(prompt, response_schema, cache=None) -> response
+    generate_stream(prompt, response_schema, cache=None) -> iterator of response chunks
+
+Backends that support context caching also have cache_prefix(prefix), which
+registers the stable start of every prompt once and returns a handle to pass
+as cache (the prompt is then only the rest), drop_cache(handle) and
+min_cached_tokens, the smallest prefix worth registering.
+
+Responses (and chunks) have a .text and a .usage_metadata with
+prompt_token_count (including cached tokens), cached_content_token_count and
+candidates_token_count; in a stream the usage is cumulative.
+
+GeminiBackend calls the real API. FakeBackend answers locally and
+deterministically, with configurable latency, an optional requests-per-minute
+quota, injected 429/500/400 errors, invalid entries and truncated or fenced
+responses, so the translate stage can be load-tested and its retry behavior
+exercised without network access.
+
+Backends are selected with a spec string: "gemini", or "fake" optionally
+followed by options, e.g. "fake:latency=0.5,latency_dist=lognormal,rate_limit_rate=0.1".
+"""
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from batch_planner import heuristic_token_count
+
+DEFAULT_MODEL = 'gemini-3-flash-preview'
+
+# How long a registered prompt prefix lives (it is deleted when the run ends)
+# and the smallest prefix the API accepts for context caching
+CACHE_TTL_SECONDS = 3600
+MIN_CACHED_TOKENS = 1024
+
+
+class GeminiBackend:
+    """Google Gemini through the google-genai SDK, shared by all workers."""
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        # Only load the SDK when the real API is used
+        from google import genai
+        from google.genai import types
+
+        self.client = genai.Client(api_key=api_key)
+        self.types = types
+        self.model = model
+
+    min_cached_tokens = MIN_CACHED_TOKENS
+
+    def config(self, response_schema, cache=None):
+        return self.types.GenerateContentConfig(
+            temperature=0.3,
+            top_p=0.95,
+            top_k=40,
+            response_mime_type='application/json',
+            response_json_schema=response_schema,
+            cached_content=cache,
+        )
+
+    def cache_prefix(self, prefix):
+        """Register a prompt prefix with context caching, returning the cache's name."""
+        cache = self.client.caches.create(model=self.model, config=self.types.CreateCachedContentConfig(
+            display_name='localization-prompt-prefix',
+            system_instruction=prefix,
+            ttl=f"{CACHE_TTL_SECONDS}s",
+        ))
+        return cache.name
+
+    def drop_cache(self, cache):
+        self.client.caches.delete(name=cache)
+
+    def generate(self, prompt, response_schema=None, cache=None):
+        return self.client.models.generate_content(model=self.model, contents=prompt,
+                                                   config=self.config(response_schema, cache))
+
+    def generate_stream(self, prompt, response_schema=None, cache=None):
+        return self.client.models.generate_content_stream(model=self.model, contents=prompt,
+                                                          config=self.config(response_schema, cache))
+
+
+class FakeAPIError(Exception):
+    """Injected API failure, shaped like the SDK's errors (code and status)."""
+
+    def __init__(self, code, status, message, details=None):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.details = details
+
+
+def fake_response(text, prompt_tokens, output_tokens, cached_tokens=0):
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt_tokens, cached_content_token_count=cached_tokens,
+        candidates_token_count=output_tokens))
+
+
+class FakeBackend:
+    """
+    Local stand-in for the Gemini API.
+
+    Every item of the compact payload (the JSON on the prompt's last line) is
+    answered as "[lang] English text", per plural form for plural strings.
+    Random choices (latency, errors, truncation) are seeded from the prompt
+    and how often it was sent, so a run is reproducible regardless of thread
+    scheduling and a retried request can succeed where the first one failed.
+
+    Registered prompt prefixes are kept in memory; counts records how many
+    prompt tokens were served from them (cached_tokens) and how many were
+    sent with each request (uncached_tokens).
+    """
+
+    LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+    def __init__(self, latency=0.0, latency_dist='constant', latency_spread=0.5, rate_limit_rate=0.0,
+                 server_error_rate=0.0, bad_request_rate=0.0, invalid_rate=0.0, truncate_rate=0.0, fence_rate=0.0,
+                 chunk_size=64, seconds_per_token=0.0, quota_rpm=None, retry_after=None, caching=True,
+                 cache_min_tokens=MIN_CACHED_TOKENS, seed=0, model=DEFAULT_MODEL):
+        """
+        Args:
+            latency: Median seconds before a response (or its first chunk)
+            latency_dist: 'constant', 'uniform' (latency +/- spread), 'exponential'
+                (mean latency) or 'lognormal' (median latency, sigma spread)
+            latency_spread: Spread parameter of the distribution
+            rate_limit_rate: Share of requests failing with 429 RESOURCE_EXHAUSTED
+            server_error_rate: Share of requests failing with 500 INTERNAL
+            bad_request_rate: Share of requests failing with 400 INVALID_ARGUMENT
+            invalid_rate: Share of entries answered invalidly (a plural form
+                dropped, format specifiers lost or an empty translation)
+            truncate_rate: Share of responses cut off halfway
+            fence_rate: Share of responses wrapped in a ```json fence
+            chunk_size: Characters per streamed chunk
+            seconds_per_token: Extra generation time per output token
+            quota_rpm: Requests accepted per sliding minute; requests over the
+                quota fail with 429 and a retry hint for when a slot frees up
+            retry_after: Retry hint in seconds attached to injected 429s
+                (RetryInfo details and "Please retry in Xs"), none by default
+            caching: Accept prompt prefixes for context caching (otherwise
+                registering one fails with 400)
+            cache_min_tokens: Smallest prefix accepted for context caching
+            seed: Seed for every random choice
+            model: Model name reported in errors
+        """
+        if latency_dist not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_dist}'")
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.bad_request_rate = bad_request_rate
+        self.invalid_rate = invalid_rate
+        self.truncate_rate = truncate_rate
+        self.fence_rate = fence_rate
+        self.chunk_size = max(1, chunk_size)
+        self.seconds_per_token = seconds_per_token
+        self.quota_rpm = quota_rpm
+        self.retry_after = retry_after
+        self.caching = caching
+        self.min_cached_tokens = cache_min_tokens
+        self.seed = seed
+        self.model = model
+
+        self._lock = threading.Lock()
+        self._sent = {}
+        self._accepted = deque()
+        self._caches = {}
+        self._created = 0
+        self.counts = {"requests": 0, "rate_limited": 0, "server_errors": 0, "bad_requests": 0,
+                       "invalid_entries": 0, "truncated": 0, "fenced": 0, "caches_created": 0,
+                       "cached_tokens": 0, "uncached_tokens": 0}
+
+    def _rng(self, prompt):
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            attempt = self._sent.get(digest, 0)
+            self._sent[digest] = attempt + 1
+            self.counts["requests"] += 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _rate_limited(self, retry_after):
+        self._count("rate_limited")
+        details = None
+        message = f"Quota exceeded for {self.model}."
+        if retry_after is not None:
+            details = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_after:.3f}s"}]
+            message += f" Please retry in {retry_after:.3f}s."
+        return FakeAPIError(429, 'RESOURCE_EXHAUSTED', message, details)
+
+    def _check_quota(self):
+        """Seconds until the quota has room again, after admitting the request if it has room now (0.0)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._accepted and now - self._accepted[0] >= 60:
+                self._accepted.popleft()
+            if len(self._accepted) < self.quota_rpm:
+                self._accepted.append(now)
+                return 0.0
+            return 60 - (now - self._accepted[0])
+
+    def _latency(self, rng):
+        if self.latency_dist == 'uniform':
+            return max(0.0, rng.uniform(self.latency - self.latency_spread, self.latency + self.latency_spread))
+        if self.latency_dist == 'exponential':
+            return rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.latency_dist == 'lognormal':
+            return rng.lognormvariate(math.log(self.latency), self.latency_spread) if self.latency > 0 else 0.0
+        return self.latency
+
+    def answer(self, prompt, rng=None):
+        """The response text for a prompt: well-formed, unless rng picks entries to answer invalidly."""
+        payload = json.loads(prompt.rsplit('\n', 1)[-1])
+        answer = {}
+        for group in payload['groups']:
+            for item_id, en in group['items'].items():
+                answer[item_id] = {
+                    lang: ({form: f"[{lang}] {value}" for form, value in en.items()}
+                           if isinstance(en, dict) else f"[{lang}] {en}")
+                    for lang in group['langs']
+                }
+                if rng is not None and rng.random() < self.invalid_rate:
+                    self._count("invalid_entries")
+                    self._corrupt(answer[item_id], group['langs'][0])
+        return json.dumps(answer, ensure_ascii=False)
+
+    @staticmethod
+    def _corrupt(translations, lang):
+        value = translations[lang]
+        if isinstance(value, dict):
+            value.pop('other', None)
+        elif '%' in value:
+            translations[lang] = value.replace('%', '')
+        else:
+            translations[lang] = ''
+
+    def cache_prefix(self, prefix):
+        tokens = heuristic_token_count(prefix)
+        if not self.caching:
+            raise FakeAPIError(400, 'INVALID_ARGUMENT', f"Context caching is not supported for {self.model}.")
+        if tokens < self.min_cached_tokens:
+            raise FakeAPIError(400, 'INVALID_ARGUMENT', f"Cached content is too small. total_token_count={tokens}, "
+                                                        f"min_total_token_count={self.min_cached_tokens}")
+        with self._lock:
+            self._created += 1
+            cache = f"cachedContents/fake-{self._created}"
+            self._caches[cache] = tokens
+            self.counts["caches_created"] += 1
+        return cache
+
+    def drop_cache(self, cache):
+        with self._lock:
+            self._caches.pop(cache, None)
+
+    def _respond(self, prompt, cache=None):
+        """Wait out the latency, maybe fail, and return (text, prompt tokens, output tokens, cached tokens)."""
+        rng = self._rng(prompt)
+        cached_tokens = 0
+        if cache is not None:
+            with self._lock:
+                cached_tokens = self._caches.get(cache)
+            if cached_tokens is None:
+                raise FakeAPIError(404, 'NOT_FOUND', f"CachedContent {cache} not found (it may have expired).")
+        if self.quota_rpm:
+            wait = self._check_quota()
+            if wait:
+                raise self._rate_limited(wait)
+        time.sleep(self._latency(rng))
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            raise self._rate_limited(self.retry_after)
+        roll -= self.rate_limit_rate
+        if roll < self.server_error_rate:
+            self._count("server_errors")
+            raise FakeAPIError(500, 'INTERNAL', "An internal error has occurred.")
+        roll -= self.server_error_rate
+        if roll < self.bad_request_rate:
+            self._count("bad_requests")
+            raise FakeAPIError(400, 'INVALID_ARGUMENT', "Request contains an invalid argument.")
+
+        text = self.answer(prompt, rng)
+        output_tokens = heuristic_token_count(text)
+        time.sleep(output_tokens * self.seconds_per_token)
+
+        if rng.random() < self.truncate_rate:
+            self._count("truncated")
+            text = text[:len(text) // 2]
+        if rng.random() < self.fence_rate:
+            self._count("fenced")
+            text = f"```json\n{text}\n```"
+
+        uncached_tokens = heuristic_token_count(prompt)
+        with self._lock:
+            self.counts["cached_tokens"] += cached_tokens
+            self.counts["uncached_tokens"] += uncached_tokens
+        return text, uncached_tokens + cached_tokens, output_tokens, cached_tokens
+
+    def generate(self, prompt, response_schema=None, cache=None):
+        text, prompt_tokens, output_tokens, cached_tokens = self._respond(prompt, cache)
+        return fake_response(text, prompt_tokens, output_tokens, cached_tokens)
+
+    def generate_stream(self, prompt, response_schema=None, cache=None):
+        text, prompt_tokens, output_tokens, cached_tokens = self._respond(prompt, cache)
+        for start in range(0, len(text), self.chunk_size):
+            end = min(start + self.chunk_size, len(text))
+            yield fake_response(text[start:end], prompt_tokens, output_tokens * end // len(text), cached_tokens)
+
+
+def parse_backend_spec(spec):
+    """
+    Split a backend spec into its name and options.
+
+    "fake:latency=0.5,seed=3" -> ("fake", {"latency": 0.5, "seed": 3})
+    """
+    name, _, option_text = spec.partition(':')
+    options = {}
+    for option in filter(None, option_text.split(',')):
+        key, separator, value = option.partition('=')
+        if not separator:
+            raise ValueError(f"Backend option '{option}' must be key=value")
+        try:
+            options[key.strip()] = json.loads(value)
+        except json.JSONDecodeError:
+            options[key.strip()] = value.strip()
+    return name.strip(), options
+
+
+def create_backend(spec='gemini', api_key=None, model=DEFAULT_MODEL):
+    """
+    Create the backend described by spec.
+
+    Raises:
+        ValueError: Unknown backend or options, or no API key for Gemini
+    """
+    name, options = parse_backend_spec(spec)
+    if name == 'gemini':
+        if options:
+            raise ValueError("The gemini backend takes no options")
+        if not api_key:
+            raise ValueError("A Gemini API key is required (--api-key)")
+        return GeminiBackend(api_key, model)
+    if name == 'fake':
+        try:
+            return FakeBackend(model=model, **options)
+        except TypeError as e:
+            raise ValueError(f"Invalid fake backend option: {e}") from e
+    raise ValueError(f"Unknown backend '{name}' (expected gemini or fake)")
@@ -0,0 +1,162 @@
+"""
+Persistent translation memory for previously translated strings.
+
+Translations are stored in a small SQLite database inside a cache directory
+(restore it between runs with actions/cache), keyed by the English source
+value, the target language, the model and the prompt version. Strings that
+were translated before are resolved locally instead of being sent to Gemini.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Bump whenever the translation prompt changes in a way that should
+# invalidate translations produced by the previous prompt.
+PROMPT_VERSION = 1
+
+DEFAULT_CACHE_DIR = '.localization-cache'
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DATABASE_NAME = 'translation_memory.sqlite3'
+
+# Translations resolved from memory, written next to the llm_translation_task_*.json
+# files in the same format so apply_translations.py can merge them.
+MEMORY_HITS_FILE = 'llm_translation_memory_hits.json'
+
+
+def memory_key(source, lang, model, prompt_version=PROMPT_VERSION):
+    """
+    Build the lookup key for a source value (string or plural dict).
+
+    Args:
+        source: English value, either a string or a {form: value} dict
+        lang: Target language code
+        model: Model that produced (or will produce) the translation
+        prompt_version: Version of the translation prompt
+
+    Returns:
+        Hex digest identifying the translation
+    """
+    payload = json.dumps([source, lang, model, prompt_version], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """SQLite-backed translation memory with LRU size-based eviction."""
+
+    def __init__(self, cache_dir, model, prompt_version=PROMPT_VERSION, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, DATABASE_NAME)
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def lookup(self, source, lang):
+        """Return the remembered translation for source/lang, or None."""
+        key = memory_key(source, lang, self.model, self.prompt_version)
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM memory WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE memory SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def store(self, source, lang, translation):
+        """Remember a translation for source/lang. Empty translations are ignored."""
+        if not translation:
+            return
+        if isinstance(translation, dict) and not all(translation.values()):
+            return
+        key = memory_key(source, lang, self.model, self.prompt_version)
+        value = json.dumps(translation, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memory (key, translation, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(key) + len(value.encode('utf-8')), time.time())
+            )
+            self.stored += 1
+
+    def total_size(self):
+        """Total stored size in bytes (keys plus serialized translations)."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM memory").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the store fits in max_bytes."""
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        with self._lock:
+            rows = self._conn.execute("SELECT key, size FROM memory ORDER BY last_used ASC").fetchall()
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self._conn.executemany("DELETE FROM memory WHERE key = ?", doomed)
+            removed = len(doomed)
+            self.evicted += removed
+        return removed
+
+    def stats(self):
+        """Hit/miss statistics for this session."""
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "entries": entries,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🧠 Translation memory: {stats['hits']} hit(s), {stats['misses']} miss(es) "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['stored']} stored, "
+              f"{stats['evicted']} evicted, {stats['entries']} entries")
+
+    def commit(self):
+        """Persist what was stored so far, for long-running processes like watch mode."""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self, persist=True):
+        """
+        Evict down to the size limit, then persist and close the database.
+
+        With persist=False nothing from this session is kept (not even the
+        last-used times of lookups), e.g. after a dry run.
+        """
+        if not persist:
+            with self._lock:
+                self._conn.rollback()
+                self._conn.close()
+            return
+        self.evict()
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
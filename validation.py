@@ -0,0 +1,89 @@
+"""
+Validation of translated entries against their English source.
+
+A returned entry is accepted only if it has a translation for every missing
+language, every plural form of the English source (non-empty), and the same
+format specifiers (%@, %lld, %1$@, ...) as the English text, so nothing
+that would break at runtime or in apply_translations reaches a catalog.
+"""
+
+import re
+from collections import Counter
+
+# printf-style specifiers as used by Foundation: optional position, flags,
+# width, precision and length modifier, then the conversion
+FORMAT_SPECIFIER = re.compile(
+    r'%(?:(\d+)\$)?[-+0#\']*(?:\d+|\*)?(?:\.(?:\d+|\*))?(hh|h|ll|l|q|L|z|t|j)?([@dDiuUxXoOfFeEgGcCsSpaA%])'
+)
+
+
+def format_specifiers(text):
+    """
+    The format specifiers of a string as a Counter of (length modifier + conversion).
+
+    Positions are ignored so that a translation may reorder arguments
+    ("%@ of %@" -> "%2$@ de %1$@"); "%%" is a literal percent sign.
+    """
+    return Counter(
+        (match.group(2) or '') + match.group(3)
+        for match in FORMAT_SPECIFIER.finditer(text)
+        if match.group(3) != '%'
+    )
+
+
+def check_specifiers(source, translation, upper=None):
+    """
+    Problem with a translation's format specifiers, or None.
+
+    Args:
+        source: English text the translation must keep every specifier of
+        upper: English text bounding the specifiers the translation may use
+            (plural forms like "one" may add the count that English leaves out)
+    """
+    expected = format_specifiers(source)
+    found = format_specifiers(translation)
+    allowed = format_specifiers(upper) if upper is not None else expected
+    if expected - found:
+        return f"missing {', '.join(sorted('%' + spec for spec in (expected - found).elements()))}"
+    if found - (expected | allowed):
+        return f"unexpected {', '.join(sorted('%' + spec for spec in (found - (expected | allowed)).elements()))}"
+    return None
+
+
+def validate_entry(entry, translated_entry):
+    """
+    Check a returned entry against the task entry it answers.
+
+    Returns:
+        List of problems, e.g. ["de: missing plural form 'other'", "ja: missing %lld"];
+        empty when the entry is valid
+    """
+    if not isinstance(translated_entry, dict):
+        return ["not returned"]
+    translations = translated_entry.get('missing_translations')
+    if not isinstance(translations, dict):
+        return ["no translations"]
+
+    en = entry['en']
+    problems = []
+    for lang in entry['missing_translations']:
+        value = translations.get(lang)
+        if isinstance(en, dict):
+            if not isinstance(value, dict):
+                problems.append(f"{lang}: expected plural forms")
+                continue
+            for form, source in en.items():
+                translation = value.get(form)
+                if not translation or not isinstance(translation, str):
+                    problems.append(f"{lang}: missing plural form '{form}'")
+                    continue
+                problem = check_specifiers(source, translation, upper=en.get('other'))
+                if problem:
+                    problems.append(f"{lang} ({form}): {problem}")
+        elif not value or not isinstance(value, str):
+            problems.append(f"{lang}: missing")
+        else:
+            problem = check_specifiers(en, value)
+            if problem:
+                problems.append(f"{lang}: {problem}")
+    return problems